@@ -0,0 +1,298 @@
+"""异步服务模式：与 server.py 提供相同的接口
+
+提问（/api/ask、/api/ask/stream）和同步导入（/api/libraries/<name>/add）这类长时间等待网络的接口
+在事件循环中执行，模型调用使用 genai 的异步客户端，检索使用 httpx 异步客户端，等待期间不占用线程；
+其余接口原样交给 server.py 中的 Flask 应用在线程中处理。需要额外安装 quart（自带 hypercorn）：
+
+    pip install quart
+    hypercorn async_server:app --bind 0.0.0.0:5000
+"""
+import os
+import time
+import uuid
+import asyncio
+import contextvars
+
+from quart import Quart, Response, g, request
+from hypercorn.middleware import AsyncioWSGIMiddleware
+from werkzeug.exceptions import HTTPException
+from werkzeug.utils import secure_filename
+
+import server
+from server import (
+    LIBRARY_ROOT,
+    reader,
+    scheduler,
+    blob_store,
+    arxiv_metadata,
+    search_cache,
+    readme_cache,
+    title_index,
+    import_manifest,
+    import_result,
+    job_manager,
+    JOB_STOP_TIMEOUT,
+    format_sse,
+    paper_error,
+    prepare_paper_question,
+    finish_paper_question,
+    get_ask_library_path,
+    select_ask_papers,
+    get_ask_pool_size,
+    create_session,
+    save_session_metadata,
+    submit_ask_job,
+    finish_import,
+    BULK_UPLOAD_MAX_TOTAL_MB,
+)
+from monitoring import metrics
+from monitoring.metrics import timed
+from retrieval import async_main
+from retrieval.async_http_client import AsyncHTTPClient
+
+# 交给 Flask 处理的请求体大小上限，默认与批量上传的总大小上限一致，否则大的压缩包在到达 Flask 之前就被拒绝
+ASYNC_MAX_BODY_MB = int(os.getenv('ASYNC_MAX_BODY_MB', BULK_UPLOAD_MAX_TOTAL_MB))
+
+quart_app = Quart(__name__)
+# 提问可能持续数分钟，不使用 Quart 默认的 60 秒超时
+quart_app.config['RESPONSE_TIMEOUT'] = None
+quart_app.config['BODY_TIMEOUT'] = None
+http_client = None
+
+@quart_app.before_serving
+async def start_http_client():
+    global http_client
+    http_client = AsyncHTTPClient()
+
+@quart_app.before_serving
+async def start_jobs():
+    await asyncio.to_thread(job_manager.start)
+
+@quart_app.after_serving
+async def close_http_client():
+    await http_client.aclose()
+
+@quart_app.after_serving
+async def stop_jobs():
+    await asyncio.to_thread(job_manager.stop, JOB_STOP_TIMEOUT)
+
+@quart_app.before_request
+async def start_request_metrics():
+    g.request_start = time.perf_counter()
+    g.trace, g.trace_token = server.start_request_trace(
+        request.method, request.path, request.headers
+    )
+
+@quart_app.after_request
+async def finish_request_metrics(response):
+    # 与 Flask 端的 flask_cors 默认配置一致
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Access-Control-Expose-Headers'] = 'X-Total-Count, X-Next-Cursor, X-Trace-Id'
+    trace = g.trace
+    if trace is not None:
+        response.headers['X-Trace-Id'] = trace.id
+        metrics.end_trace(g.trace_token)
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    server.record_request(g.request_start, request.method, endpoint, response.status_code, trace)
+    return response
+
+async def aask_single_paper(question, library_path, folder_name, session_folder, options, on_chunk=None):
+    """server.ask_single_paper 的异步版本，读写本地文件的步骤在线程中执行"""
+    try:
+        context, error = await asyncio.to_thread(
+            prepare_paper_question, question, library_path, folder_name, session_folder, options
+        )
+        if error:
+            return error
+        response = context['response']
+        passages = context['passages']
+        pdf_path = context['pdf_path']
+        if response is not None:
+            if on_chunk is not None:
+                on_chunk(response)
+        else:
+            with timed('ask.wait_slot'):
+                slot_token = await scheduler.acquire_async(context['session'], context['cost'])
+            try:
+                with timed('ask.model'):
+                    if passages is not None:
+                        response = await reader.aask_text(question, passages)
+                        if on_chunk is not None:
+                            on_chunk(response)
+                    elif on_chunk is None:
+                        response = await reader.aask_pdf(question, pdf_path)
+                    else:
+                        parts = []
+                        async for text in reader.aask_pdf_stream(question, pdf_path):
+                            parts.append(text)
+                            on_chunk(text)
+                        response = ''.join(parts)
+            finally:
+                scheduler.release(slot_token)
+        return await asyncio.to_thread(finish_paper_question, context, response)
+    except Exception as e:
+        return paper_error(folder_name, str(e))
+
+@quart_app.route('/api/ask', methods=['POST'])
+async def ask_papers():
+    data = await request.get_json()
+    question = data.get('question')
+    library_name = data.get('library')
+
+    library_path, error = get_ask_library_path(data)
+    if error:
+        return error
+    paper_folders = await asyncio.to_thread(select_ask_papers, data)
+    if data.get('async'):
+        return submit_ask_job(data, paper_folders)
+
+    session_id, session_folder = await asyncio.to_thread(create_session, library_name, question)
+    limit = asyncio.Semaphore(get_ask_pool_size(data, len(paper_folders)))
+
+    async def ask_one(folder_name):
+        async with limit:
+            return await aask_single_paper(question, library_path, folder_name, session_folder, data)
+
+    responses = list(await asyncio.gather(*(ask_one(f) for f in paper_folders)))
+    metadata = await asyncio.to_thread(
+        save_session_metadata, session_id, session_folder, question, library_name, paper_folders, responses
+    )
+    return {
+        'session_id': session_id,
+        'responses': responses,
+        'metadata': metadata
+    }
+
+@quart_app.route('/api/ask/stream', methods=['POST'])
+async def ask_papers_stream():
+    data = await request.get_json()
+    question = data.get('question')
+    library_name = data.get('library')
+
+    library_path, error = get_ask_library_path(data)
+    if error:
+        return error
+    paper_folders = await asyncio.to_thread(select_ask_papers, data)
+
+    session_id, session_folder = await asyncio.to_thread(create_session, library_name, question)
+    limit = asyncio.Semaphore(get_ask_pool_size(data, len(paper_folders)))
+    # 响应体在视图返回后才生成，创建任务时显式带上本次请求的上下文（trace）
+    context = contextvars.copy_context()
+
+    async def generate():
+        events = asyncio.Queue()
+
+        async def ask_and_report(index, folder_name):
+            def on_chunk(text):
+                events.put_nowait(('chunk', {'index': index, 'folder': folder_name, 'text': text}))
+            async with limit:
+                result = await aask_single_paper(
+                    question, library_path, folder_name, session_folder, data, on_chunk
+                )
+            events.put_nowait(('paper', {'index': index, 'folder': folder_name, **result}))
+            return result
+
+        yield format_sse('session', {'session_id': session_id, 'papers': paper_folders})
+
+        tasks = [
+            asyncio.create_task(ask_and_report(index, folder_name), context=context.copy())
+            for index, folder_name in enumerate(paper_folders)
+        ]
+        try:
+            finished = 0
+            while finished < len(tasks):
+                event, payload = await events.get()
+                if event == 'paper':
+                    finished += 1
+                yield format_sse(event, payload)
+        finally:
+            # 客户端中途断开时取消还没完成的论文
+            for task in tasks:
+                task.cancel()
+
+        responses = [task.result() for task in tasks]
+        metadata = await asyncio.to_thread(
+            save_session_metadata, session_id, session_folder, question, library_name, paper_folders, responses
+        )
+        yield format_sse('done', {'session_id': session_id, 'metadata': metadata})
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+@quart_app.route('/api/libraries/<library_name>/add', methods=['POST'])
+async def add_paper(library_name):
+    data = await request.get_json()
+    library_name = secure_filename(library_name)
+    library_path = os.path.join(LIBRARY_ROOT, library_name)
+
+    paper_descs = data.get('paper_descs', [])
+    if not paper_descs:
+        return {'error': 'Paper descs is required'}, 400
+    if not os.path.exists(library_path):
+        return {'error': 'Library not found'}, 404
+
+    if data.get('async'):
+        job = job_manager.submit('import', {
+            'library': library_name,
+            'paper_descs': paper_descs,
+        })
+        return {'job_id': job['id'], 'status': job['status']}, 202
+
+    import_id = data.get('import_id') or str(uuid.uuid4())
+    try:
+        downloaded_papers = await async_main.import_papers(
+            http_client, paper_descs, library_path, blob_store,
+            arxiv_metadata, search_cache, readme_cache, title_index,
+            import_manifest, import_id,
+        )
+    except Exception:
+        await asyncio.to_thread(import_manifest.finish, import_id, 'failed')
+        raise
+    await asyncio.to_thread(import_manifest.finish, import_id)
+    await asyncio.to_thread(finish_import, library_name, downloaded_papers)
+    return await asyncio.to_thread(import_result, import_id, downloaded_papers)
+
+def wsgi_app(environ, start_response):
+    # hypercorn 的 WSGI 适配只在收到第一段响应体时发送响应头，
+    # 空响应（如 CORS 预检）至少产出一段空内容，否则客户端收到的是 500
+    body = server.app(environ, start_response)
+    try:
+        empty = True
+        for chunk in body:
+            empty = False
+            yield chunk
+        if empty:
+            yield b''
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+
+flask_app = AsyncioWSGIMiddleware(wsgi_app, max_body_size=ASYNC_MAX_BODY_MB * 1024 * 1024)
+_async_routes = quart_app.url_map.bind('')
+
+def is_async_route(scope):
+    # CORS 预检请求仍由 flask_cors 处理
+    if scope['method'] == 'OPTIONS':
+        return False
+    try:
+        _async_routes.match(scope['path'], method=scope['method'])
+    except HTTPException:
+        return False
+    return True
+
+async def app(scope, receive, send):
+    """ASGI 入口：异步实现的接口交给 Quart，其余交给 Flask"""
+    if scope['type'] == 'lifespan' or (scope['type'] == 'http' and is_async_route(scope)):
+        await quart_app(scope, receive, send)
+    else:
+        await flask_app(scope, receive, send)
+
+if __name__ == '__main__':
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    config = Config()
+    config.bind = ['0.0.0.0:5000']
+    asyncio.run(serve(app, config))
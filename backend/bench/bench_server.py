@@ -0,0 +1,276 @@
+"""服务端压测：用 fake 阅读器驱动提问、文献库列表和历史记录接口
+
+默认在进程内启动服务（自动设置 READER_BACKEND=fake 和临时的 DATA_ROOT），
+也可以用 --url 压测一个已经以 fake 阅读器启动的服务。结果保存在 bench/results/ 下，
+用 --compare 与之前的结果对比。
+
+    python bench/bench_server.py --papers 5,20 --concurrency 1,4,16
+    python bench/bench_server.py --compare bench/results/20260101-120000.json
+"""
+import os
+import sys
+import io
+import json
+import time
+import uuid
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_FOLDER = os.path.join(BACKEND_DIR, 'bench', 'results')
+
+
+def make_pdf(text):
+    """生成只有一页文字的最小 PDF"""
+    stream = f"BT /F1 10 Tf 40 800 Td ({text}) Tj ET"
+    objs = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [4 0 R] /Count 1 >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+        "/Resources << /Font << /F1 3 0 R >> >> /Contents 5 0 R >>",
+        f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream",
+    ]
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for i, obj in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{obj}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{o:010d} 00000 n \n".encode() for o in offsets)
+    out += f"trailer << /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF".encode()
+    return out
+
+
+class InProcessClient:
+    """通过 Flask test client 调用，每个线程一个 client"""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def _client(self):
+        if not hasattr(self._local, 'client'):
+            self._local.client = self.app.test_client()
+        return self._local.client
+
+    def get(self, path):
+        response = self._client().get(path)
+        return response.status_code, response.get_json(silent=True)
+
+    def post(self, path, payload):
+        response = self._client().post(path, json=payload)
+        return response.status_code, response.get_json(silent=True)
+
+    def upload(self, path, filename, content):
+        response = self._client().post(
+            path, data={'file': (io.BytesIO(content), filename)},
+            content_type='multipart/form-data',
+        )
+        return response.status_code, response.get_json(silent=True)
+
+
+class HTTPClient:
+    """通过 HTTP 调用已经启动的服务"""
+
+    def __init__(self, base_url):
+        import requests
+        self.base_url = base_url.rstrip('/')
+        self._requests = requests
+        self._local = threading.local()
+
+    def _session(self):
+        if not hasattr(self._local, 'session'):
+            self._local.session = self._requests.Session()
+        return self._local.session
+
+    def _result(self, response):
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            return response.status_code, None
+
+    def get(self, path):
+        return self._result(self._session().get(self.base_url + path))
+
+    def post(self, path, payload):
+        return self._result(self._session().post(self.base_url + path, json=payload))
+
+    def upload(self, path, filename, content):
+        files = {'file': (filename, content, 'application/pdf')}
+        return self._result(self._session().post(self.base_url + path, files=files))
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def run_scenario(name, call, requests_count, concurrency):
+    """并发执行 call 共 requests_count 次，统计吞吐和延迟（毫秒）"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        start = time.perf_counter()
+        ok = call(i)
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests_count)))
+    wall = time.perf_counter() - start
+    result = {
+        'name': name,
+        'concurrency': concurrency,
+        'requests': requests_count,
+        'errors': errors,
+        'throughput': requests_count / wall if wall > 0 else None,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+    }
+    print(f"{name:<32} c={concurrency:<3} n={requests_count:<4} err={errors:<3} "
+          f"{result['throughput']:8.2f} req/s  p50={result['p50_ms']:8.1f}  "
+          f"p95={result['p95_ms']:8.1f}  p99={result['p99_ms']:8.1f} ms")
+    return result
+
+
+def prepare_library(client, library, paper_count):
+    status, body = client.post('/api/libraries', {'name': library})
+    if status != 200:
+        raise RuntimeError(f"创建文献库失败: {body}")
+    folders = []
+    for i in range(paper_count):
+        filename = f"bench_paper_{i:04d}.pdf"
+        status, body = client.upload(f'/api/libraries/{library}/upload', filename,
+                                     make_pdf(f"benchmark paper {i} about topic {i % 7}"))
+        if status != 200:
+            raise RuntimeError(f"上传论文失败: {body}")
+        folders.append(os.path.splitext(filename)[0])
+    return folders
+
+
+def run_benchmark(client, paper_counts, concurrencies, requests_count):
+    results = []
+    for paper_count in paper_counts:
+        library = f"bench_{paper_count}_{uuid.uuid4().hex[:6]}"
+        folders = prepare_library(client, library, paper_count)
+
+        def ask(i):
+            # no_cache 保证每次都真正走一遍阅读器
+            status, body = client.post('/api/ask', {
+                'question': f"benchmark question {i}",
+                'library': library,
+                'papers': folders,
+                'no_cache': True,
+            })
+            return status == 200 and all(r.get('success') for r in body['responses'])
+
+        def list_libraries(i):
+            return client.get('/api/libraries')[0] == 200
+
+        def list_papers(i):
+            return client.get(f'/api/libraries/{library}/papers')[0] == 200
+
+        def list_history(i):
+            return client.get(f'/api/history?library={library}&limit=50')[0] == 200
+
+        for concurrency in concurrencies:
+            for name, call in (
+                ('ask', ask),
+                ('libraries', list_libraries),
+                ('library_papers', list_papers),
+                ('history', list_history),
+            ):
+                result = run_scenario(f"{name}[papers={paper_count}]", call,
+                                      requests_count, concurrency)
+                result['papers'] = paper_count
+                results.append(result)
+    return results
+
+
+def compare(results, baseline_path):
+    """按场景对比吞吐和 p95，列出变化"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    old = {(r['name'], r['concurrency']): r for r in baseline['results']}
+    print(f"\n与 {baseline_path} 对比:")
+    for r in results:
+        b = old.get((r['name'], r['concurrency']))
+        if not b or not b['throughput'] or not b['p95_ms']:
+            continue
+        throughput_change = (r['throughput'] / b['throughput'] - 1) * 100
+        p95_change = (r['p95_ms'] / b['p95_ms'] - 1) * 100
+        print(f"{r['name']:<32} c={r['concurrency']:<3} "
+              f"throughput {throughput_change:+7.1f}%  p95 {p95_change:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='压测已启动的服务（需以 READER_BACKEND=fake 启动）')
+    parser.add_argument('--papers', default='5,20', help='每个文献库的论文数，逗号分隔')
+    parser.add_argument('--concurrency', default='1,4,16', help='并发数，逗号分隔')
+    parser.add_argument('--requests', type=int, default=32, help='每个场景的请求数')
+    parser.add_argument('--latency', type=float, default=0.05, help='fake 阅读器每次调用的耗时（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fake 阅读器的失败概率')
+    parser.add_argument('--output-size', type=int, default=2000, help='fake 阅读器的回答长度')
+    parser.add_argument('--compare', help='与之前保存的结果文件对比')
+    parser.add_argument('--no-save', action='store_true', help='不保存结果')
+    args = parser.parse_args()
+
+    if args.url:
+        client = HTTPClient(args.url)
+    else:
+        os.environ['READER_BACKEND'] = 'fake'
+        os.environ['FAKE_READER_LATENCY'] = str(args.latency)
+        os.environ['FAKE_READER_ERROR_RATE'] = str(args.error_rate)
+        os.environ['FAKE_READER_OUTPUT_SIZE'] = str(args.output_size)
+        os.environ.setdefault('DATA_ROOT', tempfile.mkdtemp(prefix='askpapers-bench-'))
+        sys.path.insert(0, BACKEND_DIR)
+        import server
+        client = InProcessClient(server.app)
+
+    paper_counts = [int(n) for n in args.papers.split(',')]
+    concurrencies = [int(n) for n in args.concurrency.split(',')]
+    results = run_benchmark(client, paper_counts, concurrencies, args.requests)
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'target': args.url or 'in-process',
+        'config': {
+            'papers': paper_counts,
+            'concurrency': concurrencies,
+            'requests': args.requests,
+            'latency': args.latency,
+            'error_rate': args.error_rate,
+            'output_size': args.output_size,
+        },
+        'results': results,
+    }
+    if not args.no_save:
+        os.makedirs(RESULTS_FOLDER, exist_ok=True)
+        out = os.path.join(RESULTS_FOLDER, time.strftime('%Y%m%d-%H%M%S') + '.json')
+        with open(out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {out}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
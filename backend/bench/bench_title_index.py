@@ -0,0 +1,155 @@
+"""本地 arXiv 标题索引的建立速度和查找吞吐
+
+默认生成一份合成快照（标题混合少数常用词和大量少见词，接近真实标题的词频），
+也可以用 --snapshot 指定真实的 arXiv 元数据快照。查询分为四类：原样标题、
+大小写和标点不同的标题、带一个拼写错误的标题，以及索引中不存在的标题。
+
+    python bench/bench_title_index.py --papers 200000 --queries 2000
+    python bench/bench_title_index.py --snapshot arxiv-metadata-oai-snapshot.json --db /tmp/titles.db
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from bench_server import percentile
+from storage.title_index import ArxivTitleIndex
+
+
+def make_vocabulary(rng, size):
+    syllables = ["ar", "ba", "co", "de", "en", "fi", "ga", "hy", "in", "jo", "ka", "lo",
+                 "mi", "ne", "or", "pa", "qu", "ra", "si", "te", "ul", "ve", "wa", "xe", "zo"]
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def make_title(rng, vocabulary):
+    # 约三成的词按 Zipf 分布取自少数常用词（类似 learning、neural），其余从整个词表中均匀抽取
+    words = []
+    for _ in range(rng.randint(5, 12)):
+        if rng.random() < 0.3:
+            words.append(vocabulary[min(int(rng.paretovariate(1.1)) - 1, 199)])
+        else:
+            words.append(rng.choice(vocabulary))
+    return " ".join(w.capitalize() for w in words)
+
+
+def write_snapshot(path, rng, paper_count, vocabulary):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(paper_count):
+            record = {
+                "id": f"{2000 + i // 100000:04d}.{i % 100000:05d}",
+                "title": make_title(rng, vocabulary),
+                "update_date": "2024-01-01",
+            }
+            f.write(json.dumps(record) + "\n")
+
+
+def sample_titles(path, rng, count):
+    """从快照中均匀抽取 count 个 (arxiv_id, 标题)"""
+    sample = []
+    with open(path, "r", encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            record = json.loads(line)
+            item = (record["id"], " ".join(record["title"].split()))
+            if len(sample) < count:
+                sample.append(item)
+            else:
+                j = rng.randint(0, i)
+                if j < count:
+                    sample[j] = item
+    return sample
+
+
+def restyle(rng, title):
+    """改变大小写并在一处加入标点"""
+    words = title.upper().split() if rng.random() < 0.5 else title.lower().split()
+    i = rng.randrange(len(words))
+    words[i] = words[i] + rng.choice([":", ",", "-", "?"])
+    return " ".join(words)
+
+
+def misspell(rng, title):
+    """在最长的词中替换一个字母"""
+    words = title.split()
+    i = max(range(len(words)), key=lambda k: len(words[k]))
+    word = words[i]
+    j = rng.randrange(len(word))
+    words[i] = word[:j] + ("x" if word[j] != "x" else "y") + word[j + 1:]
+    return " ".join(words)
+
+
+def run_queries(index, name, queries):
+    """逐个查找，统计吞吐、延迟（微秒）和命中正确论文的比例"""
+    latencies = []
+    correct = 0
+    start = time.perf_counter()
+    for expected, title in queries:
+        t = time.perf_counter()
+        match = index.lookup(title)
+        latencies.append((time.perf_counter() - t) * 1e6)
+        found = match["arxiv_id"] if match else None
+        correct += found == expected
+    wall = time.perf_counter() - start
+    result = {
+        "name": name,
+        "queries": len(queries),
+        "accuracy": correct / len(queries) if queries else None,
+        "throughput": len(queries) / wall if wall > 0 else None,
+        "p50_us": percentile(latencies, 50),
+        "p99_us": percentile(latencies, 99),
+    }
+    print(f"{name:<10} n={len(queries):<6} accuracy={result['accuracy']:6.1%}  "
+          f"{result['throughput']:10.0f} lookups/s  p50={result['p50_us']:9.1f}  "
+          f"p99={result['p99_us']:9.1f} us")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--snapshot", help="arXiv 元数据快照（JSON Lines），默认生成合成快照")
+    parser.add_argument("--papers", type=int, default=200000, help="合成快照的论文数")
+    parser.add_argument("--queries", type=int, default=2000, help="每类查询的数量")
+    parser.add_argument("--db", help="索引文件，已存在时跳过建立；默认使用临时文件")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix="askpapers-titles-")
+    vocabulary = make_vocabulary(rng, 20000)
+    snapshot = args.snapshot
+    if snapshot is None:
+        snapshot = os.path.join(workdir, "snapshot.jsonl")
+        write_snapshot(snapshot, rng, args.papers, vocabulary)
+    db_path = args.db or os.path.join(workdir, "titles.db")
+
+    build_needed = not os.path.exists(db_path)
+    index = ArxivTitleIndex(db_path)
+    if build_needed:
+        start = time.perf_counter()
+        loaded = index.load_snapshot(snapshot)
+        elapsed = time.perf_counter() - start
+        print(f"Built index of {loaded} papers in {elapsed:.1f}s "
+              f"({loaded / elapsed:.0f} papers/s, {os.path.getsize(db_path) / 1024 / 1024:.1f} MiB)")
+
+    sample = sample_titles(snapshot, rng, args.queries)
+    results = [
+        run_queries(index, "exact", sample),
+        run_queries(index, "restyled", [(i, restyle(rng, t)) for i, t in sample]),
+        run_queries(index, "misspelled", [(i, misspell(rng, t)) for i, t in sample]),
+        run_queries(index, "missing", [(None, make_title(rng, vocabulary[::-1]) + " Zzyzx")
+                                       for _ in range(args.queries)]),
+    ]
+    print(json.dumps({"index": index.stats(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+import os
+import json
+import glob
+import uuid
+import queue
+import threading
+import traceback
+from datetime import datetime
+
+# 任务状态
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = {SUCCEEDED, FAILED, CANCELLED}
+
+
+class JobCancelled(Exception):
+    """处理函数在检查到取消请求时抛出，任务会被标记为 cancelled"""
+
+
+class JobInterrupted(Exception):
+    """JobManager 停止时由 check_cancelled 抛出，任务回到排队状态，下次 start() 时从断点继续"""
+
+
+class Job:
+    """交给处理函数的任务句柄，用于汇报进度、保存断点和检查取消"""
+
+    def __init__(self, manager, record):
+        self._manager = manager
+        self._record = record
+
+    @property
+    def id(self):
+        return self._record["id"]
+
+    @property
+    def params(self):
+        return self._record["params"]
+
+    @property
+    def state(self):
+        """处理函数自己的断点数据，重启后原样交还，用于跳过已完成的部分"""
+        return self._record["state"]
+
+    @property
+    def cancelled(self):
+        return self._manager._is_cancel_requested(self.id)
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled()
+        if self._manager._stopping.is_set():
+            raise JobInterrupted()
+
+    def checkpoint(self, done=None, total=None, **state):
+        """合并并持久化断点数据，同时可更新进度 (已完成数, 总数)"""
+        self._manager._append(self.id, {"state": state, "progress": _progress(done, total)})
+
+    def add_item(self, field, key, value, done=None, **state):
+        """把一个条目的结果保存到断点 state[field][key]，只追加这一条记录，不重写已有的结果"""
+        self._manager._append(
+            self.id, {"state": state, "item": [field, key, value], "progress": _progress(done, None)}
+        )
+
+
+def _progress(done, total):
+    progress = {}
+    if done is not None:
+        progress["done"] = done
+    if total is not None:
+        progress["total"] = total
+    return progress
+
+
+def _apply_change(record, change):
+    record["state"].update(change["state"])
+    if "item" in change:
+        field, key, value = change["item"]
+        record["state"].setdefault(field, {})[key] = value
+    record["progress"].update(change["progress"])
+    record["updated"] = change["updated"]
+
+
+class JobManager:
+    """持久化的后台任务队列
+
+    每个任务保存为 jobs_folder 下的一个 JSON 文件，运行中保存的断点追加到同名的 .log 文件，
+    状态变化时再合并回 JSON 文件，保存断点的开销不随已完成的条目数增长；
+    start() 时会把上次未完成的排队中和运行中任务重新放回队列，处理函数根据 job.state 从断点继续。
+    创建时不启动工作线程，由服务入口调用 start()，退出前调用 stop()。
+    """
+
+    def __init__(self, jobs_folder, workers=2):
+        self.jobs_folder = jobs_folder
+        self.workers = workers
+        self._handlers = {}
+        self._jobs = {}
+        self._cancel_requested = set()
+        self._lock = threading.RLock()
+        self._queue = queue.Queue()
+        self._threads = []
+        self._stopping = threading.Event()
+        os.makedirs(jobs_folder, exist_ok=True)
+
+    def register(self, kind, handler):
+        """注册任务类型，handler(job) 的返回值会作为任务结果保存"""
+        self._handlers[kind] = handler
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            # 上次 stop() 后留在队列中的任务会从文件重新加载
+            self._queue = queue.Queue()
+            for record in self._load_all():
+                self._jobs[record["id"]] = record
+            # 按创建顺序恢复未完成的任务
+            pending = sorted(
+                (r for r in self._jobs.values() if r["status"] in (QUEUED, RUNNING)),
+                key=lambda r: r["created"],
+            )
+            for record in pending:
+                record["status"] = QUEUED
+                self._save(record)
+                self._queue.put(record["id"])
+            for index in range(self.workers):
+                thread = threading.Thread(
+                    target=self._work, args=(self._queue,), name=f"job-worker-{index}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        """停止工作线程：运行中的任务在下一次 check_cancelled 时回到排队状态，未开始的任务留到下次 start()"""
+        with self._lock:
+            threads, self._threads = self._threads, []
+            self._stopping.set()
+            for _ in threads:
+                self._queue.put(None)
+        for thread in threads:
+            thread.join(timeout)
+
+    def submit(self, kind, params):
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        now = datetime.now().isoformat()
+        record = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "params": params,
+            "status": QUEUED,
+            "progress": {"done": 0, "total": None},
+            "state": {},
+            "result": None,
+            "error": None,
+            "created": now,
+            "updated": now,
+        }
+        with self._lock:
+            self._jobs[record["id"]] = record
+            self._save(record)
+        self._queue.put(record["id"])
+        return self.get(record["id"])
+
+    def get(self, job_id):
+        with self._lock:
+            record = self._jobs.get(job_id)
+            return json.loads(json.dumps(record)) if record else None
+
+    def list(self):
+        with self._lock:
+            records = [self._summary(r) for r in self._jobs.values()]
+        records.sort(key=lambda r: r["created"], reverse=True)
+        return records
+
+    def cancel(self, job_id):
+        """取消任务：排队中的直接取消，运行中的在处理函数下一次检查时停止"""
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is None:
+                return None
+            if record["status"] == QUEUED:
+                self._finish(record, CANCELLED)
+            elif record["status"] == RUNNING:
+                self._cancel_requested.add(job_id)
+            return self._summary(record)
+
+    @staticmethod
+    def _summary(record):
+        return {k: v for k, v in record.items() if k not in ("state", "result")}
+
+    def _is_cancel_requested(self, job_id):
+        with self._lock:
+            return job_id in self._cancel_requested
+
+    def _job_file(self, job_id):
+        return os.path.join(self.jobs_folder, f"{job_id}.json")
+
+    def _log_file(self, job_id):
+        return os.path.join(self.jobs_folder, f"{job_id}.log")
+
+    def _load_all(self):
+        records = []
+        for job_file in glob.glob(os.path.join(self.jobs_folder, "*.json")):
+            try:
+                with open(job_file, "r", encoding="utf-8") as f:
+                    record = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Skipping broken job file {job_file}: {e}")
+                continue
+            self._replay_log(record)
+            records.append(record)
+        return records
+
+    def _replay_log(self, record):
+        """把上次运行追加的断点合并到任务记录中"""
+        try:
+            with open(self._log_file(record["id"]), "r", encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+        for line in lines:
+            try:
+                change = json.loads(line)
+            except ValueError:
+                # 写到一半时进程退出，最后一行不完整
+                break
+            _apply_change(record, change)
+
+    def _save(self, record):
+        # 调用方需持有 self._lock
+        record["updated"] = datetime.now().isoformat()
+        job_file = self._job_file(record["id"])
+        tmp_file = job_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, job_file)
+        # 断点已经合并进 JSON 文件；在这之前退出时重放日志的结果相同
+        try:
+            os.remove(self._log_file(record["id"]))
+        except FileNotFoundError:
+            pass
+
+    def _append(self, job_id, change):
+        change["updated"] = datetime.now().isoformat()
+        line = json.dumps(change, ensure_ascii=False) + "\n"
+        with self._lock:
+            _apply_change(self._jobs[job_id], change)
+            with open(self._log_file(job_id), "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def _finish(self, record, status, result=None, error=None):
+        record["status"] = status
+        record["result"] = result
+        record["error"] = error
+        self._cancel_requested.discard(record["id"])
+        self._save(record)
+
+    def _work(self, jobs):
+        while True:
+            job_id = jobs.get()
+            if job_id is None:
+                return
+            with self._lock:
+                record = self._jobs.get(job_id)
+                # 排队期间可能已被取消
+                if record is None or record["status"] != QUEUED:
+                    continue
+                record["status"] = RUNNING
+                self._save(record)
+            handler = self._handlers[record["kind"]]
+            try:
+                result = handler(Job(self, record))
+            except JobCancelled:
+                with self._lock:
+                    self._finish(record, CANCELLED)
+            except JobInterrupted:
+                with self._lock:
+                    record["status"] = QUEUED
+                    self._save(record)
+            except Exception as e:
+                traceback.print_exc()
+                with self._lock:
+                    self._finish(record, FAILED, error=str(e))
+            else:
+                with self._lock:
+                    self._finish(record, SUCCEEDED, result=result)
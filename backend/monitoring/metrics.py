@@ -0,0 +1,293 @@
+import json
+import time
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# 耗时直方图的桶（秒），覆盖从本地磁盘操作到长时间的模型生成
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values)) + list(extra or [])
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """只增不减的计数器，按标签值分别计数"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """可增可减的当前值"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """累积桶直方图，按标签值分别统计"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # 标签值 -> [各桶计数, 总和, 总数]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            entry = self._values.get(key)
+            return entry[2] if entry else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (bucket_counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name, documentation, labelnames=()):
+        metric = Gauge(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """导出为 Prometheus 文本格式"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram(
+    "askpapers_stage_seconds", "Time spent in each stage", ["stage"]
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "askpapers_stage_errors_total", "Stages that raised an exception", ["stage"]
+)
+MODEL_TOKENS = REGISTRY.counter(
+    "askpapers_model_tokens_total", "Tokens reported by the model", ["model", "kind"]
+)
+HTTP_REQUESTS = REGISTRY.histogram(
+    "askpapers_http_request_seconds", "HTTP request latency", ["method", "endpoint", "status"]
+)
+
+
+class Trace:
+    """单个请求内各阶段的耗时和 token 用量，请求结束时整体写入日志"""
+
+    def __init__(self, name):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.spans = []
+        self.tokens = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, stage, start, duration, error=None):
+        span = {
+            "stage": stage,
+            "start_ms": round((start - self._start) * 1000, 3),
+            "duration_ms": round(duration * 1000, 3),
+            "thread": threading.current_thread().name,
+        }
+        if error:
+            span["error"] = error
+        with self._lock:
+            self.spans.append(span)
+
+    def add_tokens(self, kind, count):
+        with self._lock:
+            self.tokens[kind] = self.tokens.get(kind, 0) + count
+
+    def to_dict(self, **extra):
+        with self._lock:
+            return {
+                "id": self.id,
+                "name": self.name,
+                "timestamp": self.started,
+                "duration_ms": round((time.perf_counter() - self._start) * 1000, 3),
+                "spans": list(self.spans),
+                "tokens": dict(self.tokens),
+                **extra,
+            }
+
+
+_current_trace = contextvars.ContextVar("askpapers_trace", default=None)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def start_trace(name):
+    """在当前上下文开始记录，返回 (trace, token)，结束时用 token 调用 end_trace"""
+    trace = Trace(name)
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(token):
+    _current_trace.reset(token)
+
+
+def bind(func, trace=None):
+    """让 func 在其他线程中运行时仍然记录到 trace 上，默认为当前请求的 trace"""
+    trace = trace or _current_trace.get()
+
+    def run(*args, **kwargs):
+        token = _current_trace.set(trace)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current_trace.reset(token)
+
+    return run
+
+
+@contextmanager
+def timed(stage):
+    """统计 with 块的耗时，抛出异常时额外计入错误数"""
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_SECONDS.observe(duration, stage=stage)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_span(stage, start, duration, error)
+
+
+def record_usage(model, usage):
+    """记录模型返回的 token 用量，usage 为响应中的 usage_metadata"""
+    if usage is None:
+        return
+    trace = _current_trace.get()
+    for kind, attr in (
+        ("input", "prompt_token_count"),
+        ("output", "candidates_token_count"),
+        ("cached", "cached_content_token_count"),
+    ):
+        count = getattr(usage, attr, None)
+        if not count:
+            continue
+        MODEL_TOKENS.inc(count, model=model, kind=kind)
+        if trace is not None:
+            trace.add_tokens(kind, count)
+
+
+class TraceLog:
+    """把请求 trace 以 JSON Lines 追加写入文件"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
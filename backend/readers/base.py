@@ -0,0 +1,55 @@
+import asyncio
+
+
+class PDFReader:
+    """阅读器接口，服务端只通过这些方法向模型提问
+
+    出错时直接抛出异常。配置了 call_policy（CallPolicy）时，模型调用按其重试、超时、对冲和熔断。
+    """
+
+    model = None
+    call_policy = None
+
+    def _call(self, func, hedge=True):
+        """按 call_policy 执行一次模型调用 func()"""
+        if self.call_policy is None:
+            return func()
+        return self.call_policy.call(func, hedge=hedge)
+
+    async def _acall(self, func, hedge=True):
+        """_call 的异步版本，func() 返回协程"""
+        if self.call_policy is None:
+            return await func()
+        return await self.call_policy.acall(func, hedge=hedge)
+
+    def ask_pdf(self, question, pdf_path, model=None):
+        """针对整篇 PDF 回答问题，返回文本"""
+        raise NotImplementedError
+
+    def ask_pdf_stream(self, question, pdf_path, model=None):
+        """流式回答，逐段产出文本；默认实现一次性产出完整回答"""
+        yield self.ask_pdf(question, pdf_path, model)
+
+    def ask_pdf_batch(self, questions, pdf_path, model=None):
+        """回答同一篇论文的多个问题，返回等长列表，没有得到回答的位置为 None；默认实现逐个提问"""
+        return [self.ask_pdf(question, pdf_path, model) for question in questions]
+
+    def ask_text(self, question, passages, model=None):
+        """只根据检索出的文本片段回答问题"""
+        raise NotImplementedError
+
+    # 异步接口供异步服务使用；默认实现在线程中调用同步接口，子类可以换成原生的异步客户端
+
+    async def aask_pdf(self, question, pdf_path, model=None):
+        return await asyncio.to_thread(self.ask_pdf, question, pdf_path, model)
+
+    async def aask_pdf_stream(self, question, pdf_path, model=None):
+        yield await self.aask_pdf(question, pdf_path, model)
+
+    async def aask_text(self, question, passages, model=None):
+        return await asyncio.to_thread(self.ask_text, question, passages, model)
+
+    def dump_response(self, response, out_path):
+        # 一般是markdown格式
+        with open(out_path, "w", encoding="utf-8") as f:
+            f.write(response)
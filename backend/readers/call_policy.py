@@ -0,0 +1,382 @@
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from monitoring import metrics
+from readers.scheduler import current_call
+
+logger = logging.getLogger(__name__)
+
+MODEL_CALL_RETRIES = metrics.REGISTRY.counter(
+    "askpapers_model_call_retries_total", "Model call attempts retried after an error", ["error"]
+)
+MODEL_CALL_HEDGES = metrics.REGISTRY.counter(
+    "askpapers_model_call_hedges_total", "Hedged duplicate model calls", ["outcome"]
+)
+MODEL_CALL_ABANDONED = metrics.REGISTRY.gauge(
+    "askpapers_model_call_abandoned", "Timed-out or losing model call attempts still running in threads"
+)
+CIRCUIT_REJECTIONS = metrics.REGISTRY.counter(
+    "askpapers_circuit_rejections_total", "Model calls rejected while the circuit breaker was open"
+)
+
+
+class TransientError(Exception):
+    """可以重试的临时性错误（限流、服务端错误、网络中断等）"""
+
+
+class CallDeadlineExceeded(TimeoutError):
+    """单次调用或整次调用（含重试）超过了时限"""
+
+
+class CircuitOpenError(RuntimeError):
+    """后端持续失败，熔断期间直接拒绝调用"""
+
+
+def is_transient(exc):
+    return isinstance(exc, (TransientError, TimeoutError, ConnectionError))
+
+
+class LatencyTracker:
+    """最近若干次成功调用的耗时，用于估计对冲请求的等待时间"""
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._samples)
+
+    def quantile(self, q):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class CircuitBreaker:
+    """连续失败 threshold 次后熔断 cooldown 秒，之后放行一次试探调用，成功则恢复"""
+
+    def __init__(self, threshold=5, cooldown=30, clock=time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self.clock() - self._opened_at >= self.cooldown:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self.clock() - self._opened_at < self.cooldown or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def release_probe(self):
+        """试探调用以与后端健康无关的错误结束：不改变熔断状态，允许下一次调用重新试探"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or (self.threshold and self._failures >= self.threshold):
+                self._opened_at = self.clock()
+                self._probing = False
+
+
+class CallPolicy:
+    """模型调用的重试、超时、对冲和熔断
+
+    每次尝试在独立线程中执行，超过 attempt_timeout 即视为失败（原线程不会被中断，结果被丢弃）；
+    临时性错误按带抖动的指数退避重试，最多 retries 次，且总耗时不超过 deadline。
+    hedge 为真时，一次尝试的耗时超过近期成功调用的 p95 后再并发发出一个相同请求，取先完成的结果。
+    异步版本 acall 在事件循环中执行，超时或落后的请求会被取消。
+
+    提供 scheduler（ModelScheduler）时，重试和对冲请求也计入调度（会话和 token 数取自调用方
+    当前持有的名额）：对冲请求、以及上一次尝试超时后仍在运行时的重试，各自占用一个名额，在请求
+    真正结束时才归还，没有空闲名额就不发；其余重试由调用方的名额覆盖，只计入 RPM/TPM 用量。
+    超时后仍在线程中运行的尝试超过 max_abandoned 个时不再重试和对冲。
+    """
+
+    def __init__(self, retries=3, backoff=1.0, max_backoff=30.0, attempt_timeout=120.0,
+                 deadline=300.0, hedge=False, hedge_quantile=0.95, hedge_min_samples=20,
+                 breaker=None, classify=is_transient, workers=64, scheduler=None, max_abandoned=16,
+                 sleep=time.sleep, clock=time.monotonic, rng=None):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker or CircuitBreaker()
+        self.classify = classify
+        self.sleep = sleep
+        self.clock = clock
+        self.latencies = LatencyTracker()
+        self.scheduler = scheduler
+        self.max_abandoned = max_abandoned
+        self._rng = rng or random.Random()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="model-call")
+        self._abandoned = 0
+        self._abandoned_lock = threading.Lock()
+
+    def backoff_delay(self, attempt):
+        """第 attempt 次重试前的等待时间（full jitter）"""
+        return self._rng.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def hedge_delay(self):
+        if not self.hedge or len(self.latencies) < self.hedge_min_samples:
+            return None
+        return self.latencies.quantile(self.hedge_quantile)
+
+    def _timed(self, func):
+        start = self.clock()
+        result = func()
+        self.latencies.add(self.clock() - start)
+        return result
+
+    def _abandon(self, futures):
+        """记录超时或落后后仍在运行的尝试，线程结束时自动减去"""
+        for future in futures:
+            with self._abandoned_lock:
+                self._abandoned += 1
+                MODEL_CALL_ABANDONED.set(self._abandoned)
+            future.add_done_callback(self._abandoned_done)
+
+    def _abandoned_done(self, future):
+        with self._abandoned_lock:
+            self._abandoned -= 1
+            MODEL_CALL_ABANDONED.set(self._abandoned)
+
+    def _can_add_attempt(self):
+        with self._abandoned_lock:
+            return self.max_abandoned is None or self._abandoned < self.max_abandoned
+
+    def _reserve_slot(self):
+        """为额外的并发请求（对冲、前一次尝试仍在运行时的重试）申请名额，不等待
+
+        返回 True 表示占用了名额，False 表示没有空闲名额，
+        None 表示没有调度器或调用方没有持有名额，不需要申请。
+        """
+        if not self._can_add_attempt():
+            return False
+        call = current_call() if self.scheduler is not None else None
+        if call is None:
+            return None
+        return self.scheduler.try_acquire(*call)
+
+    def _charge_retry(self):
+        """上一次尝试已经结束的重试仍是一次新请求，计入 RPM/TPM 用量"""
+        call = current_call() if self.scheduler is not None else None
+        if call is not None:
+            self.scheduler.charge(*call)
+
+    def _submit(self, task, func, charged):
+        future = self._pool.submit(task, func)
+        if charged:
+            # 名额在请求真正结束时归还，而不是在调用方放弃等待时
+            future.add_done_callback(lambda _: self.scheduler.release())
+        return future
+
+    def _attempt(self, func, timeout, hedge, charged=False, left_running=None):
+        """执行一次尝试（可能带一个对冲请求），返回结果；所有请求都失败时抛出第一个请求的异常
+
+        超时后仍在运行的请求追加到 left_running 中。
+        """
+        task = metrics.bind(self._timed)
+        futures = [self._submit(task, func, charged)]
+        pending = set(futures)
+        start = self.clock()
+        hedge_delay = self.hedge_delay() if hedge else None
+        try:
+            while True:
+                remaining = timeout - (self.clock() - start)
+                if remaining <= 0:
+                    raise CallDeadlineExceeded(f"Model call exceeded {timeout:.1f}s")
+                wait_for = remaining
+                if hedge_delay is not None and len(futures) == 1:
+                    wait_for = min(remaining, max(0.0, hedge_delay - (self.clock() - start)))
+                # 只等待仍在运行的请求，已失败的请求不会让 wait 立即返回
+                done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+                for future in futures:
+                    if future.done() and future.exception() is None:
+                        if len(futures) > 1:
+                            MODEL_CALL_HEDGES.inc(outcome="won" if future is futures[1] else "lost")
+                        return future.result()
+                if not pending:
+                    raise futures[0].exception()
+                if hedge_delay is not None and len(futures) == 1 and not done:
+                    # 只尝试一次：名额已满或积压过多时放弃对冲，继续等待第一个请求
+                    hedge_delay = None
+                    hedge_charged = self._reserve_slot()
+                    if hedge_charged is not False:
+                        hedge_future = self._submit(task, func, bool(hedge_charged))
+                        futures.append(hedge_future)
+                        pending.add(hedge_future)
+                        MODEL_CALL_HEDGES.inc(outcome="sent")
+        finally:
+            running = [future for future in futures if not future.done()]
+            self._abandon(running)
+            if left_running is not None:
+                left_running.extend(running)
+
+    def call(self, func, hedge=True):
+        """按策略调用 func()，返回结果；重试耗尽或遇到不可重试的错误时抛出最后一个异常"""
+        start = self.clock()
+        attempt = 0
+        # 本次尝试是否占用了额外的名额；第一次尝试由调用方持有的名额覆盖
+        charged = False
+        while True:
+            if not self.breaker.allow():
+                CIRCUIT_REJECTIONS.inc()
+                raise CircuitOpenError("Model backend is failing, circuit breaker is open")
+            remaining = self.deadline - (self.clock() - start)
+            timeout = min(self.attempt_timeout, remaining)
+            left_running = []
+            try:
+                result = self._attempt(func, timeout, hedge, charged, left_running)
+            except Exception as e:
+                transient = self.classify(e)
+                if transient:
+                    self.breaker.record_failure()
+                else:
+                    # 参数错误等与后端健康无关的错误既不计入失败，也不能作为后端恢复的证据
+                    self.breaker.release_probe()
+                if not transient or attempt >= self.retries:
+                    raise
+                delay = self.backoff_delay(attempt)
+                if self.clock() - start + delay >= self.deadline:
+                    raise
+                if left_running:
+                    # 超时的请求仍占着调用方的名额，重试需要另一个名额，没有空闲名额时不再重试
+                    charged = self._reserve_slot()
+                    if charged is False:
+                        raise
+                    charged = bool(charged)
+                else:
+                    self._charge_retry()
+                    charged = False
+                MODEL_CALL_RETRIES.inc(error=type(e).__name__)
+                logger.warning(f"Retrying model call after {type(e).__name__}: {e}")
+                self.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def _attempt_async(self, func, timeout, hedge):
+        """_attempt 的异步版本，func() 返回协程"""
+        tasks = [self._start_task(func, False)]
+        pending = set(tasks)
+        hedge_delay = self.hedge_delay() if hedge else None
+        start = self.clock()
+        try:
+            while True:
+                remaining = timeout - (self.clock() - start)
+                if remaining <= 0:
+                    raise CallDeadlineExceeded(f"Model call exceeded {timeout:.1f}s")
+                wait_for = remaining
+                if hedge_delay is not None and len(tasks) == 1:
+                    wait_for = min(remaining, max(0.0, hedge_delay - (self.clock() - start)))
+                done, pending = await asyncio.wait(
+                    pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in tasks:
+                    if task.done() and task.exception() is None:
+                        if len(tasks) > 1:
+                            MODEL_CALL_HEDGES.inc(outcome="won" if task is tasks[1] else "lost")
+                        return task.result()
+                if not pending:
+                    raise tasks[0].exception()
+                if hedge_delay is not None and len(tasks) == 1 and not done:
+                    hedge_delay = None
+                    hedge_charged = self._reserve_slot()
+                    if hedge_charged is not False:
+                        hedge_task = self._start_task(func, bool(hedge_charged))
+                        tasks.append(hedge_task)
+                        pending.add(hedge_task)
+                        MODEL_CALL_HEDGES.inc(outcome="sent")
+        finally:
+            # 协程可以取消，不必像线程那样任其跑完；取消时名额随之归还
+            for task in tasks:
+                task.cancel()
+
+    def _start_task(self, func, charged):
+        task = asyncio.ensure_future(self._timed_async(func))
+        if charged:
+            # 任务在开始执行前就被取消时协程内的 finally 不会运行，用回调归还名额
+            task.add_done_callback(lambda _: self.scheduler.release())
+        return task
+
+    async def _timed_async(self, func):
+        start = self.clock()
+        result = await func()
+        self.latencies.add(self.clock() - start)
+        return result
+
+    async def acall(self, func, hedge=True):
+        """call 的异步版本：func() 返回协程，等待期间不占用线程"""
+        start = self.clock()
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                CIRCUIT_REJECTIONS.inc()
+                raise CircuitOpenError("Model backend is failing, circuit breaker is open")
+            remaining = self.deadline - (self.clock() - start)
+            timeout = min(self.attempt_timeout, remaining)
+            try:
+                result = await self._attempt_async(func, timeout, hedge)
+            except Exception as e:
+                transient = self.classify(e)
+                if transient:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.release_probe()
+                if not transient or attempt >= self.retries:
+                    raise
+                delay = self.backoff_delay(attempt)
+                if self.clock() - start + delay >= self.deadline:
+                    raise
+                # 上一次尝试已被取消，重试由调用方的名额覆盖，只计入 RPM/TPM 用量
+                self._charge_retry()
+                MODEL_CALL_RETRIES.inc(error=type(e).__name__)
+                logger.warning(f"Retrying model call after {type(e).__name__}: {e}")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,226 @@
+import time
+import uuid
+import threading
+
+from google.genai import types, errors
+
+from storage.hashing import file_sha256
+from monitoring.metrics import timed, record_usage
+
+
+# 缓存过期或被删除后，服务端会以这些状态码拒绝引用
+MISSING_CACHE_CODES = {403, 404}
+# 同时创建缓存的论文数通常很少，按哈希分到固定数量的锁上，避免锁表无限增长
+KEY_LOCK_STRIPES = 64
+
+
+class ContextCacheUnavailable(Exception):
+    """无法为论文创建上下文缓存（例如内容太短不满足缓存条件），调用方应退回普通请求"""
+
+
+class ContextCacheBackend:
+    """服务端上下文缓存的接口，时间均为 Unix 时间戳（秒）"""
+
+    def create(self, model, file_ref, ttl):
+        """为文件创建缓存，返回 (缓存名, 过期时间)"""
+        raise NotImplementedError
+
+    def refresh(self, name, ttl):
+        """延长缓存有效期，返回新的过期时间"""
+        raise NotImplementedError
+
+    def delete(self, name):
+        raise NotImplementedError
+
+    def generate(self, model, name, question):
+        """基于缓存的上下文回答问题，返回文本"""
+        raise NotImplementedError
+
+    def is_missing(self, exc):
+        """exc 是否表示缓存已过期或不存在（此时应重建缓存，而不是重试）"""
+        return False
+
+
+class GeminiContextCacheBackend(ContextCacheBackend):
+    def __init__(self, client):
+        self.client = client
+
+    @staticmethod
+    def _timestamp(expire_time, ttl):
+        return expire_time.timestamp() if expire_time is not None else time.time() + ttl
+
+    def create(self, model, file_ref, ttl):
+        try:
+            with timed("gemini.cache_create"):
+                cache = self.client.caches.create(
+                    model=model,
+                    config=types.CreateCachedContentConfig(contents=[file_ref], ttl=f"{int(ttl)}s"),
+                )
+        except Exception as e:
+            raise ContextCacheUnavailable(str(e)) from e
+        return cache.name, self._timestamp(cache.expire_time, ttl)
+
+    def refresh(self, name, ttl):
+        cache = self.client.caches.update(
+            name=name, config=types.UpdateCachedContentConfig(ttl=f"{int(ttl)}s")
+        )
+        return self._timestamp(cache.expire_time, ttl)
+
+    def delete(self, name):
+        self.client.caches.delete(name=name)
+
+    def is_missing(self, exc):
+        return isinstance(exc, errors.ClientError) and exc.code in MISSING_CACHE_CODES
+
+    def generate(self, model, name, question):
+        with timed("gemini.generate"):
+            response = self.client.models.generate_content(
+                model=model,
+                contents=question,
+                config=types.GenerateContentConfig(cached_content=name),
+            )
+        record_usage(model, response.usage_metadata)
+        return response.text
+
+
+class FakeContextCacheBackend(ContextCacheBackend):
+    """本地内存实现，行为与服务端一致（过期的缓存不可用），用于离线测试"""
+
+    def __init__(self, answer=None, clock=time.time, min_size=0):
+        self.answer = answer or (lambda question, file_ref: f"{question} ({file_ref})")
+        self.clock = clock
+        self.min_size = min_size
+        self.caches = {}
+        self.created = 0
+        self.create_attempts = 0
+
+    def create(self, model, file_ref, ttl):
+        self.create_attempts += 1
+        if len(str(file_ref)) < self.min_size:
+            raise ContextCacheUnavailable("Content too small to cache")
+        name = f"cachedContents/{uuid.uuid4().hex}"
+        expire_time = self.clock() + ttl
+        self.caches[name] = [file_ref, expire_time]
+        self.created += 1
+        return name, expire_time
+
+    def _lookup(self, name):
+        cache = self.caches.get(name)
+        if cache is None or cache[1] <= self.clock():
+            self.caches.pop(name, None)
+            raise KeyError(f"Cached content not found: {name}")
+        return cache
+
+    def refresh(self, name, ttl):
+        cache = self._lookup(name)
+        cache[1] = self.clock() + ttl
+        return cache[1]
+
+    def delete(self, name):
+        self.caches.pop(name, None)
+
+    def is_missing(self, exc):
+        return isinstance(exc, KeyError)
+
+    def generate(self, model, name, question):
+        return self.answer(question, self._lookup(name)[0])
+
+
+class ContextCacheManager:
+    """按 (PDF 内容哈希, 模型) 复用服务端上下文缓存
+
+    在本地记录每个缓存的过期时间：已过期的直接丢弃并重建，临近过期且仍在使用的会被续期，
+    这样与同一篇论文的多轮问答只需处理一次完整的 PDF 输入。
+    无法缓存的论文在 unavailable_ttl 秒内不再尝试创建，直接退回普通请求。
+    """
+
+    def __init__(self, backend, ttl=600, refresh_margin=60, unavailable_ttl=None, clock=time.time):
+        self.backend = backend
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.unavailable_ttl = ttl if unavailable_ttl is None else unavailable_ttl
+        self.clock = clock
+        self._entries = {}
+        # 创建缓存失败的 {key: (原因, 到期时间)}
+        self._unavailable = {}
+        self._lock = threading.Lock()
+        self._key_locks = [threading.Lock() for _ in range(KEY_LOCK_STRIPES)]
+
+    def _key_lock(self, key):
+        return self._key_locks[hash(key) % len(self._key_locks)]
+
+    def _sweep(self):
+        # 调用方需持有 self._lock
+        now = self.clock()
+        for key in [k for k, (_, expire_time) in self._entries.items() if expire_time <= now]:
+            del self._entries[key]
+        for key in [k for k, (_, until) in self._unavailable.items() if until <= now]:
+            del self._unavailable[key]
+
+    def _create(self, key, model, pdf_path, get_file_ref):
+        try:
+            return self.backend.create(model, get_file_ref(pdf_path), self.ttl)
+        except ContextCacheUnavailable as e:
+            with self._lock:
+                self._unavailable[key] = (str(e), self.clock() + self.unavailable_ttl)
+            raise
+
+    def _discard(self, name):
+        """删除不再使用的服务端缓存，失败时等它自然过期"""
+        try:
+            self.backend.delete(name)
+        except Exception as e:
+            print(f"Failed to delete context cache {name}: {e}")
+
+    def _acquire(self, key, model, pdf_path, get_file_ref):
+        """返回可用的缓存名，必要时创建或续期；同一论文同时只有一个线程在创建"""
+        with self._key_lock(key):
+            with self._lock:
+                self._sweep()
+                entry = self._entries.get(key)
+                unavailable = self._unavailable.get(key)
+            if unavailable is not None:
+                raise ContextCacheUnavailable(unavailable[0])
+            if entry is None:
+                name, expire_time = self._create(key, model, pdf_path, get_file_ref)
+            else:
+                name, expire_time = entry
+                if expire_time - self.clock() < self.refresh_margin:
+                    try:
+                        expire_time = self.backend.refresh(name, self.ttl)
+                    except Exception as e:
+                        # 缓存已在服务端失效时直接重建；其他错误下旧缓存可能仍然存在，先删除再重建
+                        with self._lock:
+                            self._entries.pop(key, None)
+                        if not self.backend.is_missing(e):
+                            self._discard(name)
+                        name, expire_time = self._create(key, model, pdf_path, get_file_ref)
+            with self._lock:
+                self._entries[key] = (name, expire_time)
+            return name
+
+    def _invalidate(self, key, name):
+        with self._lock:
+            if self._entries.get(key, (None,))[0] == name:
+                del self._entries[key]
+
+    def generate(self, question, pdf_path, model, get_file_ref):
+        """基于 PDF 的上下文缓存回答问题；无法缓存时抛出 ContextCacheUnavailable"""
+        key = (file_sha256(pdf_path), model)
+        name = self._acquire(key, model, pdf_path, get_file_ref)
+        try:
+            return self.backend.generate(model, name, question)
+        except Exception as e:
+            # 只有缓存已在服务端失效时才重建后再试一次，限流等其他错误交给调用方重试
+            if not self.backend.is_missing(e):
+                raise
+            self._invalidate(key, name)
+            name = self._acquire(key, model, pdf_path, get_file_ref)
+            return self.backend.generate(model, name, question)
+
+    def close(self):
+        """删除所有仍在本地记录中的缓存"""
+        with self._lock:
+            entries, self._entries = list(self._entries.values()), {}
+        for name, _ in entries:
+            self._discard(name)
@@ -0,0 +1,125 @@
+import time
+import asyncio
+import random
+import hashlib
+import threading
+
+from readers.base import PDFReader
+from readers.call_policy import TransientError
+from storage.hashing import file_sha256
+
+_WORDS = (
+    "model method dataset results experiment baseline training evaluation "
+    "attention diffusion benchmark accuracy ablation latency paper approach"
+).split()
+
+
+class FakePDFReader(PDFReader):
+    """不访问网络的确定性阅读器，用于压测和衡量服务端自身的开销
+
+    latency 为每次调用的平均耗时（秒），jitter 为耗时的相对抖动幅度，error_rate 为
+    调用失败（抛出 TransientError）的概率，output_size 为回答的字符数。相同 seed 下的随机序列可复现，
+    相同 (问题, PDF) 总是得到相同的回答。
+    """
+
+    def __init__(self, latency=0.5, jitter=0.2, error_rate=0.0, output_size=2000,
+                 seed=0, model="fake-model", call_policy=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.output_size = output_size
+        self.model = model
+        self.call_policy = call_policy
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+
+    def _draw(self):
+        """返回 (本次耗时, 是否失败)"""
+        with self._random_lock:
+            delay = self.latency * (1 + self._random.uniform(-self.jitter, self.jitter))
+            failed = self._random.random() < self.error_rate
+        return max(0.0, delay), failed
+
+    def _answer(self, question, source):
+        seed = hashlib.sha256(f"{question}\0{source}".encode("utf-8")).digest()
+        rng = random.Random(seed)
+        words = []
+        length = 0
+        while length < self.output_size:
+            word = rng.choice(_WORDS)
+            words.append(word)
+            length += len(word) + 1
+        return " ".join(words)[: self.output_size]
+
+    def _generate(self, question, source):
+        delay, failed = self._draw()
+        time.sleep(delay)
+        if failed:
+            raise TransientError("Fake reader error")
+        return self._answer(question, source)
+
+    def ask_pdf(self, question, pdf_path, model=None):
+        source = file_sha256(pdf_path)
+        return self._call(lambda: self._generate(question, source))
+
+    def ask_pdf_stream(self, question, pdf_path, model=None, chunks=8):
+        def start():
+            delay, failed = self._draw()
+            if failed:
+                time.sleep(delay)
+                raise TransientError("Fake reader error")
+            return delay
+
+        # 只在开始产出之前重试，已经产出的文本无法撤回
+        delay = self._call(start, hedge=False)
+        answer = self._answer(question, file_sha256(pdf_path))
+        step = max(1, len(answer) // chunks)
+        for start in range(0, len(answer), step):
+            time.sleep(delay / chunks)
+            yield answer[start:start + step]
+
+    def ask_pdf_batch(self, questions, pdf_path, model=None):
+        source = file_sha256(pdf_path)
+
+        def generate():
+            delay, failed = self._draw()
+            time.sleep(delay)
+            if failed:
+                raise TransientError("Fake reader error")
+            return [self._answer(question, source) for question in questions]
+
+        return self._call(generate)
+
+    def ask_text(self, question, passages, model=None):
+        source = "|".join(str(p["id"]) for p in passages)
+        return self._call(lambda: self._generate(question, source))
+
+    async def _agenerate(self, question, source):
+        delay, failed = self._draw()
+        await asyncio.sleep(delay)
+        if failed:
+            raise TransientError("Fake reader error")
+        return self._answer(question, source)
+
+    async def aask_pdf(self, question, pdf_path, model=None):
+        source = file_sha256(pdf_path)
+        return await self._acall(lambda: self._agenerate(question, source))
+
+    async def aask_pdf_stream(self, question, pdf_path, model=None, chunks=8):
+        async def start():
+            delay, failed = self._draw()
+            if failed:
+                await asyncio.sleep(delay)
+                raise TransientError("Fake reader error")
+            return delay
+
+        delay = await self._acall(start, hedge=False)
+        answer = self._answer(question, file_sha256(pdf_path))
+        step = max(1, len(answer) // chunks)
+        for start in range(0, len(answer), step):
+            await asyncio.sleep(delay / chunks)
+            yield answer[start:start + step]
+
+    async def aask_text(self, question, passages, model=None):
+        source = "|".join(str(p["id"]) for p in passages)
+        return await self._acall(lambda: self._agenerate(question, source))
@@ -1,26 +1,244 @@
+import json
+import asyncio
+
+import httpx
 from google import genai
+from google.genai import errors, types
+
+from readers.base import PDFReader
+from readers.call_policy import is_transient
+from readers.context_cache import ContextCacheUnavailable
+from monitoring.metrics import timed, record_usage
+
+DEFAULT_MODEL = "gemini-2.0-flash-exp"
+
+# 文件过期或被删除时，服务端会以这些状态码拒绝引用
+REJECTED_FILE_CODES = {403, 404}
+# 超时、限流和服务端错误可以重试
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def is_retryable(exc):
+    """判断模型调用的异常是否值得重试"""
+    if isinstance(exc, errors.APIError):
+        return exc.code in RETRYABLE_CODES
+    return isinstance(exc, (httpx.TimeoutException, httpx.TransportError)) or is_transient(exc)
+
+
+def build_passage_prompt(question, passages):
+    """把检索出的论文片段和问题拼成提示词"""
+    context = "\n\n".join(
+        f"[片段 {i} · 第 {passage['page']} 页]\n{passage['text']}"
+        for i, passage in enumerate(passages, start=1)
+    )
+    return (
+        f"以下是从一篇论文中检索出的相关片段：\n\n{context}\n\n"
+        f"请根据这些片段回答问题，片段中没有的信息请说明无法确定：\n{question}"
+    )
+
+
+def build_batch_prompt(questions):
+    """把多个问题合并成一次请求，要求模型按顺序返回 JSON 字符串数组"""
+    numbered = "\n".join(f"{i}. {question.strip()}" for i, question in enumerate(questions, start=1))
+    return (
+        f"请认真阅读论文，依次回答以下 {len(questions)} 个问题。"
+        f"以 JSON 字符串数组返回，第 i 个元素是第 i 个问题的完整回答（可以使用 markdown）：\n"
+        f"{numbered}"
+    )
 
 
-class GeminiPDFReader:
-    def __init__(self, api_key):
+def parse_batch_answers(text, count):
+    """解析批量回答，返回长度为 count 的列表，缺失或无法解析的位置为 None"""
+    try:
+        answers = json.loads(text)
+    except (TypeError, ValueError):
+        return [None] * count
+    if not isinstance(answers, list):
+        return [None] * count
+    answers = [a if isinstance(a, str) and a.strip() else None for a in answers[:count]]
+    return answers + [None] * (count - len(answers))
+
+
+class GeminiPDFReader(PDFReader):
+    def __init__(self, api_key, upload_cache=None, model=DEFAULT_MODEL, context_cache=None,
+                 call_policy=None):
         self.client = genai.Client(api_key=api_key)
+        self.upload_cache = upload_cache
+        self.model = model
+        # 可选的 ContextCacheManager，对同一篇论文的多次提问复用服务端缓存的上下文
+        self.context_cache = context_cache
+        self.call_policy = call_policy
 
-    def ask_pdf(self, question, pdf_path, model="gemini-2.0-flash-exp"):
-        file_ref = self.client.files.upload(file=pdf_path)
-        try:
+    def upload_pdf(self, pdf_path):
+        with timed("gemini.upload"):
+            return self.client.files.upload(file=pdf_path)
+
+    def _generate(self, model, contents, config=None):
+        """调用 generate_content 并记录耗时和 token 用量"""
+        with timed("gemini.generate"):
             response = self.client.models.generate_content(
+                model=model, contents=contents, config=config
+            )
+        record_usage(model, response.usage_metadata)
+        return response
+
+    async def _agenerate(self, model, contents, config=None):
+        """_generate 的异步版本，使用 genai 的异步客户端"""
+        with timed("gemini.generate"):
+            response = await self.client.aio.models.generate_content(
+                model=model, contents=contents, config=config
+            )
+        record_usage(model, response.usage_metadata)
+        return response
+
+    def get_file_ref(self, pdf_path):
+        """获取 PDF 的文件引用，配置了上传缓存时优先复用已上传的文件"""
+        if self.upload_cache is None:
+            return self.upload_pdf(pdf_path)
+        return self.upload_cache.get_or_upload(pdf_path, self.upload_pdf)
+
+    def _call_with_file_ref(self, pdf_path, call):
+        """用 PDF 的文件引用调用 call(file_ref)，缓存的引用被拒绝时重新上传再试一次"""
+        file_ref = self.get_file_ref(pdf_path)
+        try:
+            return call(file_ref)
+        except errors.ClientError as e:
+            if self.upload_cache is None or e.code not in REJECTED_FILE_CODES:
+                raise
+            self.upload_cache.invalidate(pdf_path)
+            return call(self.get_file_ref(pdf_path))
+
+    async def _acall_with_file_ref(self, pdf_path, call):
+        """_call_with_file_ref 的异步版本
+
+        上传缓存按文件加锁保证同一篇论文只上传一次，这一步仍在线程中执行；命中缓存时不涉及网络。
+        """
+        file_ref = await asyncio.to_thread(self.get_file_ref, pdf_path)
+        try:
+            return await call(file_ref)
+        except errors.ClientError as e:
+            if self.upload_cache is None or e.code not in REJECTED_FILE_CODES:
+                raise
+            self.upload_cache.invalidate(pdf_path)
+            return await call(await asyncio.to_thread(self.get_file_ref, pdf_path))
+
+    def ask_pdf(self, question, pdf_path, model=None):
+        model = model or self.model
+        if self.context_cache is not None:
+            try:
+                return self._call(
+                    lambda: self.context_cache.generate(question, pdf_path, model, self.get_file_ref)
+                )
+            except ContextCacheUnavailable:
+                pass
+        response = self._call(
+            lambda: self._call_with_file_ref(
+                pdf_path,
+                lambda file_ref: self._generate(model, [question, file_ref]),
+            )
+        )
+        return response.text
+
+    def ask_pdf_batch(self, questions, pdf_path, model=None):
+        """在一次结构化生成中回答同一篇论文的多个问题，返回与 questions 等长的回答列表"""
+        model = model or self.model
+        response = self._call(
+            lambda: self._call_with_file_ref(
+                pdf_path,
+                lambda file_ref: self._generate(
+                    model,
+                    [build_batch_prompt(questions), file_ref],
+                    types.GenerateContentConfig(
+                        response_mime_type="application/json",
+                        response_schema=list[str],
+                    ),
+                ),
+            )
+        )
+        return parse_batch_answers(response.text, len(questions))
+
+    def ask_text(self, question, passages, model=None):
+        """只把检索出的文本片段发给模型，而不是整篇 PDF"""
+        model = model or self.model
+        prompt = build_passage_prompt(question, passages)
+        response = self._call(lambda: self._generate(model, [prompt]))
+        return response.text
+
+    def ask_pdf_stream(self, question, pdf_path, model=None):
+        """流式生成回答，逐段产出文本"""
+        model = model or self.model
+
+        def start_stream(file_ref):
+            # 文件引用失效的错误在取第一段时才会抛出，所以在这里预取
+            stream = iter(
+                self.client.models.generate_content_stream(
+                    model=model,
+                    contents=[question, file_ref],
+                )
+            )
+            return next(stream, None), stream
+
+        with timed("gemini.generate_stream"):
+            # 只在取到第一段之前重试，且不发对冲请求（多余的流无法干净地取消）
+            first_chunk, stream = self._call(
+                lambda: self._call_with_file_ref(pdf_path, start_stream), hedge=False
+            )
+            if first_chunk is None:
+                return
+            # 用量随每段返回，最后一段是整次生成的累计值
+            usage = first_chunk.usage_metadata
+            if first_chunk.text:
+                yield first_chunk.text
+            for chunk in stream:
+                usage = chunk.usage_metadata or usage
+                if chunk.text:
+                    yield chunk.text
+        record_usage(model, usage)
+
+    async def aask_pdf(self, question, pdf_path, model=None):
+        if self.context_cache is not None:
+            # 上下文缓存管理器是同步实现，交给线程执行
+            return await super().aask_pdf(question, pdf_path, model)
+        model = model or self.model
+        response = await self._acall(
+            lambda: self._acall_with_file_ref(
+                pdf_path,
+                lambda file_ref: self._agenerate(model, [question, file_ref]),
+            )
+        )
+        return response.text
+
+    async def aask_text(self, question, passages, model=None):
+        model = model or self.model
+        prompt = build_passage_prompt(question, passages)
+        response = await self._acall(lambda: self._agenerate(model, [prompt]))
+        return response.text
+
+    async def aask_pdf_stream(self, question, pdf_path, model=None):
+        model = model or self.model
+
+        async def start_stream(file_ref):
+            stream = await self.client.aio.models.generate_content_stream(
                 model=model,
                 contents=[question, file_ref],
             )
-            return response.text
-        except Exception as e:
-            print(f"An error occurred: {e}")
-            return None
+            stream = aiter(stream)
+            return await anext(stream, None), stream
 
-    def dump_response(self, response, out_path):
-        # 一般是markdown格式
-        with open(out_path, "w", encoding="utf-8") as f:
-            f.write(response)
+        with timed("gemini.generate_stream"):
+            first_chunk, stream = await self._acall(
+                lambda: self._acall_with_file_ref(pdf_path, start_stream), hedge=False
+            )
+            if first_chunk is None:
+                return
+            usage = first_chunk.usage_metadata
+            if first_chunk.text:
+                yield first_chunk.text
+            async for chunk in stream:
+                usage = chunk.usage_metadata or usage
+                if chunk.text:
+                    yield chunk.text
+        record_usage(model, usage)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,112 @@
+import os
+import re
+import json
+
+from retrieval.bm25 import BM25
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # 可选依赖，未安装时退回整篇 PDF 提问
+    PdfReader = None
+
+CHUNKS_FILE = "chunks.json"
+# 每个文本块的目标字符数以及相邻块的重叠字符数
+CHUNK_CHARS = 2000
+CHUNK_OVERLAP = 200
+
+# 涉及图表、公式、版面的问题需要模型看到原始 PDF
+# 中文只匹配完整的词，单独的“图”“表”会误中试图、意图、地图、代表等
+_VISUAL_QUESTION_RE = re.compile(
+    r"\b(fig(ure)?s?|tables?|diagrams?|plots?|charts?|layout|equations?|formulas?|images?)\b|"
+    r"图表|图片|图像|插图|示意图|流程图|架构图|框架图|曲线图|柱状图|折线图|散点图|热力图|"
+    r"第\s*[0-9一二三四五六七八九十]+\s*[张幅个]?\s*[图表]|[图表]\s*[0-9]+|"
+    r"表格|公式|版面|排版",
+    re.IGNORECASE,
+)
+
+
+def needs_full_pdf(question):
+    return bool(_VISUAL_QUESTION_RE.search(question))
+
+
+def extract_pdf_pages(pdf_path):
+    """逐页提取 PDF 文本，未安装 pypdf 时返回 None"""
+    if PdfReader is None:
+        return None
+    reader = PdfReader(pdf_path)
+    return [page.extract_text() or "" for page in reader.pages]
+
+
+def chunk_pages(pages, chunk_chars=CHUNK_CHARS, overlap=CHUNK_OVERLAP):
+    """把各页文本切成带重叠的块，每块记录起始页码（从 1 开始）"""
+    chunks = []
+    for page_number, text in enumerate(pages, start=1):
+        text = re.sub(r"[ \t]+", " ", text).strip()
+        start = 0
+        while start < len(text):
+            end = min(len(text), start + chunk_chars)
+            if end < len(text):
+                # 尽量在段落或句子边界处切开
+                boundary = max(text.rfind("\n", start, end), text.rfind(". ", start, end))
+                if boundary > start + chunk_chars // 2:
+                    end = boundary + 1
+            chunks.append({"id": len(chunks), "page": page_number, "text": text[start:end].strip()})
+            if end >= len(text):
+                break
+            start = max(end - overlap, start + 1)
+    return [chunk for chunk in chunks if chunk["text"]]
+
+
+def build_chunks(paper_folder, pdf_path):
+    """提取并切分论文文本，保存到 info.json 旁边的 chunks.json，返回文本块列表"""
+    pages = extract_pdf_pages(pdf_path)
+    if pages is None:
+        return None
+    chunks = chunk_pages(pages)
+    chunks_file = os.path.join(paper_folder, CHUNKS_FILE)
+    tmp_file = chunks_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump({"pages": len(pages), "chunks": chunks}, f, ensure_ascii=False)
+    os.replace(tmp_file, chunks_file)
+    return chunks
+
+
+def load_chunks(paper_folder):
+    chunks_file = os.path.join(paper_folder, CHUNKS_FILE)
+    if not os.path.exists(chunks_file):
+        return None
+    with open(chunks_file, "r", encoding="utf-8") as f:
+        return json.load(f)["chunks"]
+
+
+def load_page_count(paper_folder):
+    """返回预处理时记录的页数，尚未预处理时返回 None"""
+    chunks_file = os.path.join(paper_folder, CHUNKS_FILE)
+    if not os.path.exists(chunks_file):
+        return None
+    with open(chunks_file, "r", encoding="utf-8") as f:
+        return json.load(f).get("pages")
+
+
+# 排版工具自动填写的无意义标题，例如文件名或 "Microsoft Word - draft.docx"
+_PLACEHOLDER_TITLE_RE = re.compile(
+    r"^(untitled.*|title|microsoft word - .*|.*\.(pdf|dvi|tex|docx?))$", re.IGNORECASE
+)
+
+
+def extract_pdf_metadata(pdf_path):
+    """读取 PDF 文档信息中的标题和页数，未安装 pypdf 时返回 None；没有可用的标题时 title 为 None"""
+    if PdfReader is None:
+        return None
+    reader = PdfReader(pdf_path)
+    title = " ".join(str((reader.metadata and reader.metadata.title) or "").split())
+    if len(title) < 4 or _PLACEHOLDER_TITLE_RE.match(title):
+        title = None
+    return {"title": title, "pages": len(reader.pages)}
+
+
+def select_chunks(question, chunks, top_k):
+    """用 BM25 选出与问题最相关的 top_k 个文本块，按原文顺序返回"""
+    index = BM25([chunk["text"] for chunk in chunks])
+    selected = index.top_k(question, top_k)
+    return [chunks[i] for i in sorted(selected)]
@@ -0,0 +1,271 @@
+import time
+import asyncio
+import itertools
+import threading
+import contextvars
+from collections import deque, defaultdict
+from contextlib import contextmanager, asynccontextmanager
+
+from monitoring import metrics
+
+# Gemini 把 PDF 的每一页按固定的 token 数计费
+TOKENS_PER_PAGE = 258
+# 不知道页数时按文件大小估计页数
+BYTES_PER_PAGE = 60 * 1024
+# 一次回答大致的输出 token 数
+OUTPUT_TOKENS = 1000
+CHARS_PER_TOKEN = 4
+WINDOW = 60
+
+SCHEDULER_QUEUE = metrics.REGISTRY.gauge(
+    "askpapers_scheduler_queue_depth", "Model calls waiting for admission"
+)
+SCHEDULER_RUNNING = metrics.REGISTRY.gauge(
+    "askpapers_scheduler_running", "Model calls currently admitted"
+)
+SCHEDULER_WAIT = metrics.REGISTRY.histogram(
+    "askpapers_scheduler_wait_seconds", "Time model calls spent waiting for admission"
+)
+SCHEDULER_TOKENS = metrics.REGISTRY.counter(
+    "askpapers_scheduler_admitted_tokens_total", "Estimated tokens of admitted model calls"
+)
+
+# 当前线程或协程持有的名额 (会话, token 数)，CallPolicy 据此为重试和对冲请求申请名额
+_current_call = contextvars.ContextVar("scheduler_current_call", default=None)
+
+
+def current_call():
+    return _current_call.get()
+
+
+def estimate_tokens(question, pages=None, pdf_size=None, passages=None):
+    """估计一次提问消耗的 token 数：PDF 按页计，检索模式按片段字符数计，另加问题和回答"""
+    tokens = len(question) // CHARS_PER_TOKEN + OUTPUT_TOKENS
+    if passages is not None:
+        return tokens + sum(len(p["text"]) for p in passages) // CHARS_PER_TOKEN
+    if pages is None and pdf_size is not None:
+        pages = max(1, pdf_size // BYTES_PER_PAGE)
+    return tokens + (pages or 1) * TOKENS_PER_PAGE
+
+
+class _Waiter:
+    __slots__ = ("session", "cost", "seq", "enqueued", "admitted", "wake")
+
+    def __init__(self, session, cost, seq, enqueued, wake=None):
+        self.session = session
+        self.cost = cost
+        self.seq = seq
+        self.enqueued = enqueued
+        self.admitted = False
+        # 异步等待者被放行时的回调，线程等待者通过条件变量唤醒
+        self.wake = wake
+
+
+class ModelScheduler:
+    """进程内所有模型调用的准入控制
+
+    同时进行的调用不超过 max_concurrent，最近 60 秒内准入的请求数和估计 token 数不超过
+    rpm 和 tpm（0 表示不限制）。排队的调用优先放行最近 60 秒内用量最少的会话，
+    同一会话内优先放行估计 token 数少的调用，使每个请求尽快拿到第一批结果。
+    优先的调用超出剩余 TPM 预算时，放得下的较小调用可以先行；它等待超过 max_bypass_wait
+    秒后不再允许插队，窗口腾出的预算都留给它，避免大调用一直排不上。
+    """
+
+    def __init__(self, max_concurrent=16, rpm=0, tpm=0, clock=time.monotonic, max_bypass_wait=WINDOW):
+        self.max_concurrent = max_concurrent
+        self.rpm = rpm
+        self.tpm = tpm
+        self.clock = clock
+        self.max_bypass_wait = max_bypass_wait
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._running = 0
+        # 最近 WINDOW 秒内准入的 (时间, 会话, token 数)
+        self._window = deque()
+        self._window_tokens = 0
+        self._session_tokens = defaultdict(int)
+        self._seq = itertools.count()
+
+    def _expire(self, now):
+        while self._window and now - self._window[0][0] >= WINDOW:
+            _, session, cost = self._window.popleft()
+            self._window_tokens -= cost
+            self._session_tokens[session] -= cost
+            if self._session_tokens[session] <= 0:
+                del self._session_tokens[session]
+
+    def _priority(self, waiter):
+        return (self._session_tokens.get(waiter.session, 0), waiter.cost, waiter.seq)
+
+    def _next_waiter(self, now):
+        """返回按优先级第一个能放行的调用，没有时返回 (None, 需要等待的秒数)"""
+        blocked_for = None
+        for waiter in sorted(self._waiters, key=self._priority):
+            wait_for = self._fits(waiter)
+            if wait_for == 0:
+                return waiter, 0
+            # 并发名额或 RPM 已满时与调用大小无关，其他调用同样无法放行
+            if wait_for is None or (self.rpm and len(self._window) >= self.rpm):
+                return None, wait_for
+            if blocked_for is None:
+                blocked_for = wait_for
+            if now - waiter.enqueued >= self.max_bypass_wait:
+                break
+        return None, blocked_for
+
+    def _fits(self, waiter):
+        """返回 0 表示可以放行，否则返回需要等待的秒数（None 表示等其他调用结束）"""
+        if self._running >= self.max_concurrent:
+            return None
+        if not self._window:
+            # 窗口为空时即使单个调用超出预算也放行，否则它永远无法执行
+            return 0
+        retry_after = self._window[0][0] + WINDOW - self.clock()
+        if self.rpm and len(self._window) >= self.rpm:
+            return max(retry_after, 0.001)
+        if self.tpm and self._window_tokens + waiter.cost > self.tpm:
+            return max(retry_after, 0.001)
+        return 0
+
+    def _record(self, session, cost):
+        self._window.append((self.clock(), session, cost))
+        self._window_tokens += cost
+        self._session_tokens[session] += cost
+        SCHEDULER_TOKENS.inc(cost)
+
+    def _admit_ready(self):
+        """按优先级放行所有能放行的调用，返回下一次需要重新检查的等待秒数"""
+        while self._waiters:
+            now = self.clock()
+            self._expire(now)
+            waiter, wait_for = self._next_waiter(now)
+            if waiter is None:
+                return wait_for
+            self._waiters.remove(waiter)
+            waiter.admitted = True
+            self._running += 1
+            self._record(waiter.session, waiter.cost)
+            if waiter.wake is not None:
+                waiter.wake()
+            self._cond.notify_all()
+        return None
+
+    def acquire(self, session, cost):
+        """排队直到放行，返回的 token 交给 release 以恢复当前名额的上下文"""
+        start = self.clock()
+        with self._cond:
+            waiter = _Waiter(session, cost, next(self._seq), start)
+            self._waiters.append(waiter)
+            SCHEDULER_QUEUE.set(len(self._waiters))
+            try:
+                while not waiter.admitted:
+                    wait_for = self._admit_ready()
+                    if not waiter.admitted:
+                        self._cond.wait(wait_for)
+            finally:
+                if not waiter.admitted:
+                    self._waiters.remove(waiter)
+                SCHEDULER_QUEUE.set(len(self._waiters))
+                SCHEDULER_RUNNING.set(self._running)
+        SCHEDULER_WAIT.observe(self.clock() - start)
+        return _current_call.set((session, cost))
+
+    def try_acquire(self, session, cost):
+        """不排队：没有其他调用在等待且名额和配额都允许时立即占用名额并返回 True，否则返回 False"""
+        with self._cond:
+            if self._waiters:
+                return False
+            self._expire(self.clock())
+            if self._fits(_Waiter(session, cost, next(self._seq), self.clock())) != 0:
+                return False
+            self._running += 1
+            self._record(session, cost)
+            SCHEDULER_RUNNING.set(self._running)
+            return True
+
+    def charge(self, session, cost):
+        """记录一次不占用并发名额的请求（例如由已有名额覆盖的重试）的 RPM/TPM 用量"""
+        with self._cond:
+            self._expire(self.clock())
+            self._record(session, cost)
+
+    async def acquire_async(self, session, cost):
+        """acquire 的异步版本，排队期间不占用线程"""
+        loop = asyncio.get_running_loop()
+        admitted = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: admitted.done() or admitted.set_result(None))
+
+        start = self.clock()
+        with self._cond:
+            waiter = _Waiter(session, cost, next(self._seq), start, wake)
+            self._waiters.append(waiter)
+            SCHEDULER_QUEUE.set(len(self._waiters))
+        try:
+            while True:
+                with self._cond:
+                    wait_for = self._admit_ready()
+                    if waiter.admitted:
+                        break
+                try:
+                    # 配额窗口到期时没有人会唤醒，需要按时重新检查
+                    await asyncio.wait_for(asyncio.shield(admitted), wait_for)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            with self._cond:
+                if waiter.admitted:
+                    self._running -= 1
+                    self._admit_ready()
+                else:
+                    self._waiters.remove(waiter)
+            raise
+        finally:
+            with self._cond:
+                SCHEDULER_QUEUE.set(len(self._waiters))
+                SCHEDULER_RUNNING.set(self._running)
+        SCHEDULER_WAIT.observe(self.clock() - start)
+        return _current_call.set((session, cost))
+
+    def release(self, token=None):
+        if token is not None:
+            _current_call.reset(token)
+        with self._cond:
+            self._running -= 1
+            SCHEDULER_RUNNING.set(self._running)
+            self._admit_ready()
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, session, cost):
+        """在 with 块内占用一次模型调用的名额"""
+        token = self.acquire(session, cost)
+        try:
+            yield
+        finally:
+            self.release(token)
+
+    @asynccontextmanager
+    async def slot_async(self, session, cost):
+        token = await self.acquire_async(session, cost)
+        try:
+            yield
+        finally:
+            self.release(token)
+
+    def stats(self):
+        with self._cond:
+            self._expire(self.clock())
+            now = self.clock()
+            return {
+                "queued": len(self._waiters),
+                "running": self._running,
+                "max_concurrent": self.max_concurrent,
+                "oldest_wait": max((now - w.enqueued for w in self._waiters), default=0),
+                "requests_last_minute": len(self._window),
+                "tokens_last_minute": self._window_tokens,
+                "rpm": self.rpm,
+                "tpm": self.tpm,
+                "sessions": dict(self._session_tokens),
+            }
@@ -0,0 +1,103 @@
+import os
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+
+from google.genai import types
+
+from storage.hashing import file_sha256
+
+# Gemini 上传的文件默认保留 48 小时，拿不到过期时间时按这个估计
+DEFAULT_FILE_TTL = timedelta(hours=47)
+# 快过期的引用不再复用，避免生成到一半文件被删除
+EXPIRY_MARGIN = timedelta(minutes=10)
+
+
+class UploadCache:
+    """按 PDF 内容哈希持久化缓存已上传文件的引用
+
+    同一份 PDF 在引用有效期内只上传一次；并发请求同一文件时只有一个线程真正上传，
+    其余线程等待并复用它的结果。
+    """
+
+    def __init__(self, cache_file):
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._entries = self._load()
+
+    def _load(self):
+        if not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring broken upload cache {self.cache_file}: {e}")
+            return {}
+
+    def _save(self):
+        # 调用方需持有 self._lock；顺便清掉已过期的引用，先写临时文件再替换，避免写坏缓存
+        self._entries = {
+            digest: entry for digest, entry in self._entries.items() if self._is_valid(entry)
+        }
+        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+        tmp_file = self.cache_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.cache_file)
+
+    @staticmethod
+    def _is_valid(entry):
+        expiration_time = datetime.fromisoformat(entry["expiration_time"])
+        return expiration_time - EXPIRY_MARGIN > datetime.now(timezone.utc)
+
+    @staticmethod
+    def _to_entry(file_ref):
+        expiration_time = file_ref.expiration_time
+        if expiration_time is None:
+            expiration_time = datetime.now(timezone.utc) + DEFAULT_FILE_TTL
+        elif expiration_time.tzinfo is None:
+            expiration_time = expiration_time.replace(tzinfo=timezone.utc)
+        return {
+            "name": file_ref.name,
+            "uri": file_ref.uri,
+            "mime_type": file_ref.mime_type,
+            "expiration_time": expiration_time.isoformat(),
+        }
+
+    def get_or_upload(self, pdf_path, upload):
+        """返回 pdf_path 对应的有效文件引用，必要时调用 upload(pdf_path) 上传"""
+        digest = file_sha256(pdf_path)
+        while True:
+            with self._lock:
+                entry = self._entries.get(digest)
+                if entry is not None and self._is_valid(entry):
+                    return types.File(
+                        name=entry["name"],
+                        uri=entry["uri"],
+                        mime_type=entry["mime_type"],
+                    )
+                pending = self._inflight.get(digest)
+                if pending is None:
+                    pending = self._inflight[digest] = threading.Event()
+                    break
+            # 其他线程正在上传同一文件，等它完成后重新查缓存
+            pending.wait()
+
+        try:
+            file_ref = upload(pdf_path)
+            with self._lock:
+                self._entries[digest] = self._to_entry(file_ref)
+                self._save()
+            return file_ref
+        finally:
+            with self._lock:
+                self._inflight.pop(digest).set()
+
+    def invalidate(self, pdf_path):
+        """丢弃 pdf_path 的缓存引用，例如服务端已拒绝该文件"""
+        digest = file_sha256(pdf_path)
+        with self._lock:
+            if self._entries.pop(digest, None) is not None:
+                self._save()
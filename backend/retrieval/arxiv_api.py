@@ -0,0 +1,109 @@
+"""通过 arXiv Atom 接口批量获取论文元数据
+
+一次 id_list 查询最多返回 BATCH_SIZE 篇论文的标题、作者、摘要和版本号，
+结果写入 ArxivMetadataCache，已缓存的论文不再访问网络。
+"""
+import re
+import time
+import logging
+import xml.etree.ElementTree as ET
+from urllib.parse import urlencode
+
+from retrieval import http_client
+from monitoring.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+API_URL = "https://export.arxiv.org/api/query"
+BATCH_SIZE = 100
+# arXiv 要求连续请求之间至少间隔 3 秒
+REQUEST_INTERVAL = 3
+
+NS = {"atom": "http://www.w3.org/2005/Atom"}
+
+
+def build_query_url(arxiv_ids):
+    query = urlencode({"id_list": ",".join(arxiv_ids), "max_results": len(arxiv_ids)})
+    return f"{API_URL}?{query}"
+
+
+def _text(entry, path):
+    node = entry.find(path, NS)
+    if node is None or node.text is None:
+        return None
+    # 标题和摘要中有换行和缩进
+    return re.sub(r"\s+", " ", node.text).strip()
+
+
+def split_version(entry_id):
+    """把 http://arxiv.org/abs/2401.00001v2 拆成 ("2401.00001", "v2")"""
+    paper_id = re.sub(r"^https?://arxiv\.org/abs/", "", entry_id.strip())
+    match = re.match(r"^(.*?)(v\d+)?$", paper_id)
+    return match.group(1), match.group(2)
+
+
+def parse_atom(xml_content):
+    """解析 Atom 接口的响应，返回元数据列表；无效 ID 对应的错误条目会被跳过"""
+    root = ET.fromstring(xml_content)
+    records = []
+    for entry in root.findall("atom:entry", NS):
+        entry_id = _text(entry, "atom:id")
+        title = _text(entry, "atom:title")
+        if not entry_id or not title or "/api/errors" in entry_id:
+            continue
+        arxiv_id, version = split_version(entry_id)
+        records.append({
+            "arxiv_id": arxiv_id,
+            "version": version,
+            "title": title,
+            "authors": [
+                name for name in (_text(a, "atom:name") for a in entry.findall("atom:author", NS)) if name
+            ],
+            "abstract": _text(entry, "atom:summary"),
+            "published": _text(entry, "atom:published"),
+            "updated": _text(entry, "atom:updated"),
+        })
+    return records
+
+
+def lookup_cached(arxiv_ids, cache=None):
+    """返回 (已缓存的元数据, 需要查询的 ID 分批列表)"""
+    arxiv_ids = list(dict.fromkeys(i for i in arxiv_ids if i))
+    records = cache.get_many(arxiv_ids) if cache is not None else {}
+    missing = [i for i in arxiv_ids if i not in records]
+    return records, [missing[i:i + BATCH_SIZE] for i in range(0, len(missing), BATCH_SIZE)]
+
+
+def store_fetched(xml_content, cache=None):
+    """解析一批查询结果并写入缓存，返回 {arxiv_id: 元数据}"""
+    try:
+        fetched = parse_atom(xml_content)
+    except ET.ParseError as e:
+        logger.error(f"Invalid response from arXiv API: {str(e)}")
+        return {}
+    if cache is not None and fetched:
+        cache.put_many(fetched)
+    return {record["arxiv_id"]: record for record in fetched}
+
+
+def resolve_metadata(arxiv_ids, cache=None, get=None):
+    """批量获取论文元数据，返回 {arxiv_id: 元数据}；查询失败的 ID 不在结果中
+
+    get 默认为 http_client.get，可以换成返回录制响应的函数。
+    """
+    get = get or http_client.get
+    records, batches = lookup_cached(arxiv_ids, cache)
+    for i, batch in enumerate(batches):
+        if i:
+            time.sleep(REQUEST_INTERVAL)
+        try:
+            with timed("import.arxiv_api"):
+                response = get(build_query_url(batch))
+        except Exception as e:
+            logger.error(f"Error querying arXiv API: {str(e)}")
+            continue
+        if response.status_code != 200:
+            logger.error(f"arXiv API returned status code {response.status_code}")
+            continue
+        records.update(store_fetched(response.text, cache))
+    return records
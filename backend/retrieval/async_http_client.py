@@ -0,0 +1,52 @@
+import asyncio
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+import httpx
+
+from retrieval.http_client import DEFAULT_TIMEOUT, POOL_SIZE, HOST_LIMITS, DEFAULT_HOST_LIMIT
+
+
+class AsyncHTTPClient:
+    """http_client 的异步版本：共享连接池，每个主机的并发数同样受 HOST_LIMITS 约束
+
+    需要在同一个事件循环中创建和使用，用完后调用 aclose。
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT):
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            # 与 requests 的默认行为一致，arXiv 的 PDF 链接会重定向
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE),
+        )
+        self._host_slots = {}
+
+    def _slot(self, url):
+        host = urlparse(url).netloc.lower()
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(
+                HOST_LIMITS.get(host, DEFAULT_HOST_LIMIT)
+            )
+        return slot
+
+    async def get(self, url, **kwargs):
+        """受主机并发上限约束的 GET 请求"""
+        async with self._slot(url):
+            return await self.client.get(url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, url, **kwargs):
+        """流式 GET，读完响应体之前一直占用主机名额"""
+        async with self._slot(url):
+            async with self.client.stream("GET", url, **kwargs) as response:
+                yield response
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+async def gather_concurrent(func, items):
+    """并发地对每个元素调用协程函数 func，按输入顺序返回结果"""
+    return await asyncio.gather(*(func(item) for item in items))
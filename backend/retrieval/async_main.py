@@ -0,0 +1,252 @@
+"""import_papers 的异步版本，供异步服务使用
+
+解析和校验逻辑与 retrieval.main 共用，只把网络请求换成 AsyncHTTPClient。
+"""
+import os
+import asyncio
+
+import httpx
+
+from retrieval.main import (
+    logger,
+    DOWNLOAD_CHUNK_SIZE,
+    README_BRANCHES,
+    REPROBE,
+    ImportFailed,
+    get_readme_url,
+    conditional_headers,
+    revalidate_readme,
+    choose_readme,
+    parse_arxiv_title,
+    check_paper_desc,
+    lookup_title_offline,
+    pick_search_result,
+    finish_download,
+    resume_point,
+    plan_download,
+    DOWNLOAD_APPEND,
+    DOWNLOAD_COMPLETE,
+    DOWNLOAD_RETRY,
+    DOWNLOAD_FAILED,
+    write_paper_info,
+    start_import,
+    name_papers,
+    prepare_paper_folder,
+    reuse_stored_pdf,
+    store_downloaded_pdf,
+    apply_arxiv_metadata,
+    SEARCH_RESULT_LIMIT,
+)
+from storage.import_manifest import PENDING
+from retrieval import arxiv_api
+from retrieval.cool_paper import (
+    FEED_CHUNK_SIZE,
+    FeedParser,
+    construct_url,
+    paper_from_dict,
+    paper_to_dict,
+)
+from retrieval.async_http_client import gather_concurrent
+from monitoring.metrics import timed
+
+
+async def fetch_readme(client, readme_url, headers=None):
+    try:
+        with timed("import.readme"):
+            return await client.get(readme_url, timeout=10, headers=headers)
+    except Exception as e:
+        logger.error(f"Error fetching README from {readme_url}: {str(e)}")
+        return None
+
+
+async def get_arxiv_url_from_github(client, github_repo, readme_cache=None):
+    """retrieval.main.get_arxiv_url_from_github 的异步版本"""
+    if not github_repo:
+        return None
+    cached = None
+    if readme_cache is not None:
+        cached = await asyncio.to_thread(readme_cache.get, github_repo)
+    if cached is not None:
+        response = await fetch_readme(
+            client, get_readme_url(github_repo, cached["branch"]), conditional_headers(cached)
+        )
+        paper_urls = await asyncio.to_thread(
+            revalidate_readme, github_repo, cached, response, readme_cache
+        )
+        if paper_urls is not REPROBE:
+            return paper_urls
+    responses = await gather_concurrent(
+        lambda branch: fetch_readme(client, get_readme_url(github_repo, branch)), README_BRANCHES
+    )
+    return await asyncio.to_thread(choose_readme, github_repo, responses, readme_cache)
+
+
+async def search_papers_by_keyword(client, keyword, limit=None, cache=None):
+    if cache is not None:
+        cached = await asyncio.to_thread(cache.get, keyword, limit)
+        if cached is not None:
+            return [paper_from_dict(paper) for paper in cached]
+    parser = FeedParser(limit)
+    with timed("import.papers_cool"):
+        async with client.stream(construct_url(keyword)) as response:
+            if response.status_code != 200:
+                raise Exception(f"搜索失败: {response.status_code}")
+            async for chunk in response.aiter_bytes(FEED_CHUNK_SIZE):
+                if parser.feed(chunk):
+                    break
+    papers = parser.close()
+    if cache is not None:
+        await asyncio.to_thread(cache.put, keyword, [paper_to_dict(paper) for paper in papers], limit)
+    return papers
+
+
+async def resolve_title(client, title, search_cache=None, title_index=None):
+    arxiv_url = await asyncio.to_thread(lookup_title_offline, title, title_index)
+    if arxiv_url is not None:
+        return arxiv_url, None
+    results = await search_papers_by_keyword(client, title, SEARCH_RESULT_LIMIT, search_cache)
+    return pick_search_result(title, results)
+
+
+async def resolve_paper_desc(client, paper_desc, search_cache=None, readme_cache=None, title_index=None):
+    """retrieval.main.resolve_paper_desc 的异步版本"""
+    kind, github_repo = check_paper_desc(paper_desc)
+    if kind == "arxiv":
+        return paper_desc, None
+    if kind == "github":
+        paper_urls = await get_arxiv_url_from_github(client, github_repo, readme_cache)
+        if paper_urls:
+            logger.info(f"Found ArXiv paper in {github_repo}: {paper_urls[0]}")
+            return paper_urls[0], None
+        logger.info(f"No ArXiv paper found in {github_repo}")
+        return await resolve_title(client, github_repo.split("/")[-1], search_cache, title_index)
+    return await resolve_title(client, paper_desc, search_cache, title_index)
+
+
+async def get_paper_title_from_arxiv(client, paper_url):
+    try:
+        with timed("import.arxiv_page"):
+            response = await client.get(paper_url)
+    except Exception as e:
+        logger.error(f"Error fetching {paper_url}: {str(e)}")
+        return None
+    if response.status_code == 200:
+        return parse_arxiv_title(response.text)
+    logger.error(f"Error: Received status code {response.status_code}")
+    return None
+
+
+async def resolve_metadata(client, arxiv_ids, cache=None):
+    """arxiv_api.resolve_metadata 的异步版本"""
+    records, batches = await asyncio.to_thread(arxiv_api.lookup_cached, arxiv_ids, cache)
+    for i, batch in enumerate(batches):
+        if i:
+            await asyncio.sleep(arxiv_api.REQUEST_INTERVAL)
+        try:
+            with timed("import.arxiv_api"):
+                response = await client.get(arxiv_api.build_query_url(batch))
+        except Exception as e:
+            logger.error(f"Error querying arXiv API: {str(e)}")
+            continue
+        if response.status_code != 200:
+            logger.error(f"arXiv API returned status code {response.status_code}")
+            continue
+        records.update(await asyncio.to_thread(arxiv_api.store_fetched, response.text, cache))
+    return records
+
+
+async def download_pdf(client, pdf_url, pdf_path, expected_size=None, expected_sha256=None):
+    """流式下载到 .part 文件并支持续传，行为与 retrieval.main.download_pdf 相同
+
+    文件的打开、写入和校验都放到线程中，不阻塞事件循环。
+    """
+    part_path = pdf_path + ".part"
+    for _ in range(2):
+        resume_from, headers = await asyncio.to_thread(resume_point, part_path)
+        try:
+            async with client.stream(pdf_url, headers=headers) as response:
+                action, total_size = plan_download(response.status_code, response.headers, resume_from)
+                if action == DOWNLOAD_RETRY:
+                    logger.warning(f"Range response does not resume at byte {resume_from}: {pdf_url}")
+                    await asyncio.to_thread(os.remove, part_path)
+                    continue
+                if action == DOWNLOAD_FAILED:
+                    logger.error(f"Failed to download PDF ({response.status_code}): {pdf_url}")
+                    return False
+                if action != DOWNLOAD_COMPLETE:
+                    mode = "ab" if action == DOWNLOAD_APPEND else "wb"
+                    f = await asyncio.to_thread(open, part_path, mode)
+                    try:
+                        async for data in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                            await asyncio.to_thread(f.write, data)
+                    finally:
+                        await asyncio.to_thread(f.close)
+        except httpx.HTTPError as e:
+            logger.error(f"Download interrupted for {pdf_url}: {str(e)}")
+            return False
+        # 校验时可能要计算整个文件的哈希，放到线程中
+        return await asyncio.to_thread(
+            finish_download, pdf_url, pdf_path, total_size, expected_size, expected_sha256
+        )
+    logger.error(f"Server keeps answering with a mismatched range: {pdf_url}")
+    return False
+
+
+async def dump_paper(client, paper, out_folder, blob_store=None):
+    """retrieval.main.dump_paper 的异步版本，文件和 blob_store 的读写放到线程中"""
+    paths = await asyncio.to_thread(prepare_paper_folder, paper, out_folder)
+    if paths is None:
+        return False
+    json_path, pdf_path = paths
+    if not await asyncio.to_thread(reuse_stored_pdf, paper, pdf_path, blob_store):
+        print(f"Downloading PDF: {paper.pdf_url}")
+        with timed("import.pdf_download"):
+            downloaded = await download_pdf(client, paper.pdf_url, pdf_path)
+        if not downloaded:
+            raise ImportFailed("download", f"Failed to download PDF: {paper.pdf_url}")
+        await asyncio.to_thread(store_downloaded_pdf, paper, pdf_path, blob_store)
+    await asyncio.to_thread(write_paper_info, paper, json_path)
+    return True
+
+
+async def import_papers(client, paper_descs, paper_db_dir, blob_store=None, metadata_cache=None,
+                        search_cache=None, readme_cache=None, title_index=None, manifest=None, import_id=None):
+    """retrieval.main.import_papers 的异步版本，导入清单的读写放到线程中"""
+    tracker = await asyncio.to_thread(start_import, paper_descs, paper_db_dir, manifest, import_id)
+
+    async def resolve_one(entry):
+        try:
+            arxiv_url, summary = await resolve_paper_desc(
+                client, entry["desc"], search_cache, readme_cache, title_index
+            )
+        except Exception as e:
+            await asyncio.to_thread(tracker.fail, entry, getattr(e, "stage", "resolve"), e)
+            return
+        await asyncio.to_thread(tracker.resolved, entry, arxiv_url, summary)
+
+    await gather_concurrent(resolve_one, tracker.with_status(PENDING))
+
+    groups = await asyncio.to_thread(tracker.group_resolved)
+    papers = [paper for paper, _ in groups.values()]
+    records = await resolve_metadata(client, list(groups), metadata_cache)
+    unresolved = apply_arxiv_metadata(papers, records)
+    paper_titles = await gather_concurrent(
+        lambda paper: get_paper_title_from_arxiv(client, paper.arxiv_url), unresolved
+    )
+    to_dump = await asyncio.to_thread(name_papers, tracker, groups, unresolved, paper_titles)
+
+    async def dump_one(group):
+        paper, entries = group
+        print(f"Dumping paper: {paper.entry_name}")
+        try:
+            added = await dump_paper(
+                client, paper, os.path.join(tracker.paper_db_dir, paper.entry_name), blob_store
+            )
+        except Exception as e:
+            await asyncio.to_thread(tracker.fail_paper, entries, e)
+            return None
+        await asyncio.to_thread(tracker.finish_paper, paper, entries, added)
+        return paper if added else None
+
+    dumped_papers = await gather_concurrent(dump_one, to_dump)
+    return [paper.__dict__ for paper in dumped_papers if paper is not None]
@@ -0,0 +1,60 @@
+import re
+import math
+from collections import Counter
+
+# 拉丁字母/数字按单词切分，中日韩文字没有空格，按相邻两字切分
+_WORD_RE = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+_CJK_RUN_RE = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯]+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "do", "does", "for", "from",
+    "how", "in", "is", "it", "of", "on", "or", "that", "the", "their", "they",
+    "this", "to", "was", "what", "when", "which", "who", "with", "why",
+}
+
+
+def tokenize(text):
+    text = (text or "").lower()
+    tokens = [w for w in _WORD_RE.findall(text) if w not in _STOPWORDS]
+    for run in _CJK_RUN_RE.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class BM25:
+    """内存中的 BM25 排序，适合单篇论文的几十到几百个文本块"""
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(tokenize(doc)) for doc in documents]
+        self.lengths = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0
+        doc_freqs = Counter()
+        for tf in self.term_freqs:
+            doc_freqs.update(tf.keys())
+        n = len(documents)
+        self.idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freqs.items()
+        }
+
+    def scores(self, query):
+        query_terms = set(tokenize(query))
+        scores = []
+        for tf, length in zip(self.term_freqs, self.lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / (self.avg_length or 1))
+            for term in query_terms:
+                freq = tf.get(term)
+                if freq:
+                    score += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            scores.append(score)
+        return scores
+
+    def top_k(self, query, k):
+        """返回得分最高的 k 个文档下标（只包含得分大于 0 的）"""
+        scores = self.scores(query)
+        ranked = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        return [i for i in ranked[:k] if scores[i] > 0]
@@ -1,10 +1,12 @@
 from urllib.parse import urlencode
-import requests
 import xml.etree.ElementTree as ET
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
 from typing import List, Optional
 from datetime import datetime
 
+from retrieval import http_client
+from monitoring.metrics import timed
+
 
 @dataclass
 class Author:
@@ -27,50 +29,104 @@ def construct_url(keyword: str) -> str:
     return f"https://papers.cool/arxiv/search/feed?{query}"
 
 
-def parse_feed(xml_content: str) -> List[Paper]:
-    # 解析XML内容
-    root = ET.fromstring(xml_content)
-
-    # 定义Atom命名空间
-    ns = {"atom": "http://www.w3.org/2005/Atom"}
-
-    papers = []
-    for entry in root.findall("atom:entry", ns):
-        # 提取论文信息
-        link = entry.find("atom:link", ns).get("href")
-        if "arxiv" in link:
-            arxiv_id = link.split("/")[-1]
-            arxiv_link = f"https://arxiv.org/abs/{arxiv_id}"
-        else:
-            arxiv_link = None
-        paper = Paper(
-            id=entry.find("atom:id", ns).text,
-            title=entry.find("atom:title", ns).text,
-            updated=datetime.fromisoformat(
-                entry.find("atom:updated", ns).text.replace("Z", "+00:00")
-            ),
-            authors=[
-                Author(author.find("atom:name", ns).text)
-                for author in entry.findall("atom:author", ns)
-            ],
-            link=link,
-            arxiv_link=arxiv_link,
-            summary=entry.find("atom:summary", ns).text,
-        )
-        papers.append(paper)
+ATOM = "{http://www.w3.org/2005/Atom}"
+# 流式读取响应时每次交给解析器的字节数
+FEED_CHUNK_SIZE = 16 * 1024
 
-    return papers
 
+def _parse_entry(entry):
+    link = entry.find(f"{ATOM}link").get("href")
+    if "arxiv" in link:
+        arxiv_id = link.split("/")[-1]
+        arxiv_link = f"https://arxiv.org/abs/{arxiv_id}"
+    else:
+        arxiv_link = None
+    return Paper(
+        id=entry.find(f"{ATOM}id").text,
+        title=entry.find(f"{ATOM}title").text,
+        updated=datetime.fromisoformat(
+            entry.find(f"{ATOM}updated").text.replace("Z", "+00:00")
+        ),
+        authors=[
+            Author(author.find(f"{ATOM}name").text)
+            for author in entry.findall(f"{ATOM}author")
+        ],
+        link=link,
+        arxiv_link=arxiv_link,
+        summary=entry.find(f"{ATOM}summary").text,
+    )
+
+
+class FeedParser:
+    """增量解析 Atom feed，拿到 limit 条结果后即可停止读取"""
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.papers = []
+        self._parser = ET.XMLPullParser(events=("end",))
+
+    @property
+    def done(self):
+        return self.limit is not None and len(self.papers) >= self.limit
+
+    def feed(self, data):
+        """送入一段内容，返回是否已经得到足够的结果"""
+        self._parser.feed(data)
+        return self._collect()
+
+    def _collect(self):
+        for _, elem in self._parser.read_events():
+            if elem.tag == f"{ATOM}entry" and not self.done:
+                self.papers.append(_parse_entry(elem))
+                # 已解析的条目不再需要，释放内存
+                elem.clear()
+        return self.done
 
-def search_papers_by_keyword(keyword: str) -> List[Paper]:
-    """搜索论文并返回解析后的结果"""
+    def close(self):
+        if not self.done:
+            self._parser.close()
+            self._collect()
+        return self.papers
+
+
+def parse_feed(xml_content, limit=None) -> List[Paper]:
+    parser = FeedParser(limit)
+    parser.feed(xml_content)
+    return parser.close()
+
+
+def paper_to_dict(paper: Paper) -> dict:
+    return {**asdict(paper), "updated": paper.updated.isoformat()}
+
+
+def paper_from_dict(data: dict) -> Paper:
+    return Paper(**{
+        **data,
+        "updated": datetime.fromisoformat(data["updated"]),
+        "authors": [Author(**author) for author in data["authors"]],
+    })
+
+
+def search_papers_by_keyword(keyword: str, limit=None, cache=None) -> List[Paper]:
+    """搜索论文并返回解析后的结果，最多 limit 条；提供 cache（SearchCache）时优先使用缓存"""
+    if cache is not None:
+        cached = cache.get(keyword, limit)
+        if cached is not None:
+            return [paper_from_dict(paper) for paper in cached]
     url = construct_url(keyword)
-    response = requests.get(url)
-    if response.status_code == 200:
-        papers = parse_feed(response.text)
-        return papers
-    else:
-        raise Exception(f"搜索失败: {response.status_code}")
+    parser = FeedParser(limit)
+    with timed("import.papers_cool"), http_client.host_slot(url), http_client.get_session().get(
+        url, stream=True, timeout=http_client.DEFAULT_TIMEOUT
+    ) as response:
+        if response.status_code != 200:
+            raise Exception(f"搜索失败: {response.status_code}")
+        for chunk in response.iter_content(FEED_CHUNK_SIZE):
+            if parser.feed(chunk):
+                break
+        papers = parser.close()
+    if cache is not None:
+        cache.put(keyword, [paper_to_dict(paper) for paper in papers], limit)
+    return papers
 
 
 if __name__ == "__main__":
@@ -0,0 +1,75 @@
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from monitoring import metrics
+
+DEFAULT_TIMEOUT = 30
+# 连接池大小，需不小于所有主机并发上限之和中实际会用到的部分
+POOL_SIZE = 32
+# 每个主机同时进行的请求数上限，arXiv 对频繁访问比较敏感
+HOST_LIMITS = {
+    "arxiv.org": 4,
+    "export.arxiv.org": 1,
+    "papers.cool": 4,
+    "raw.githubusercontent.com": 8,
+}
+DEFAULT_HOST_LIMIT = 4
+# 导入流水线每个阶段的线程数，真正的并发由 HOST_LIMITS 控制
+STAGE_WORKERS = 16
+
+_session = None
+_session_lock = threading.Lock()
+_host_slots = {}
+_host_slots_lock = threading.Lock()
+
+
+def get_session():
+    """进程内共享的 requests.Session，复用 keep-alive 连接"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+@contextmanager
+def host_slot(url):
+    """占用目标主机的一个并发名额，流式下载时应在读完响应体后再释放"""
+    host = urlparse(url).netloc.lower()
+    with _host_slots_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = _host_slots[host] = threading.BoundedSemaphore(
+                HOST_LIMITS.get(host, DEFAULT_HOST_LIMIT)
+            )
+    with slot:
+        yield
+
+
+def get(url, **kwargs):
+    """受主机并发上限约束的 GET 请求，默认带超时"""
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    with host_slot(url):
+        return get_session().get(url, **kwargs)
+
+
+def map_concurrent(func, items, max_workers=STAGE_WORKERS):
+    """并发地对每个元素调用 func，按输入顺序返回结果"""
+    items = list(items)
+    if len(items) <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers, len(items)), thread_name_prefix="retrieval"
+    ) as pool:
+        # 保留调用方的上下文，工作线程里的耗时仍记在同一个请求的 trace 上
+        futures = [pool.submit(metrics.bind(func), item) for item in items]
+        return [future.result() for future in futures]
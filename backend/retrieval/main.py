@@ -1,9 +1,14 @@
 import os
-import requests
 from bs4 import BeautifulSoup
 import re
 from urllib.parse import urlparse
 from retrieval.cool_paper import search_papers_by_keyword
+from retrieval import http_client
+from retrieval.arxiv_api import resolve_metadata
+from storage.hashing import file_sha256
+from storage.import_manifest import PENDING, RESOLVED, DONE, EXISTS, FAILED
+from monitoring.metrics import timed
+from requests import RequestException
 import json
 from werkzeug.utils import secure_filename
 import logging
@@ -51,40 +56,122 @@ def normalize_github_repo_url(repo_url):
         return None
 
 
+def parse_arxiv_title(html):
+    """从摘要页读取 og:title，页面中没有该标签时返回 None"""
+    meta = BeautifulSoup(html, "html.parser").find("meta", property="og:title")
+    if meta is None or not meta.get("content"):
+        return None
+    return meta["content"]
+
+
 def get_paper_title_from_arxiv(paper_url):
-    response = requests.get(paper_url)
+    try:
+        with timed("import.arxiv_page"):
+            response = http_client.get(paper_url)
+    except RequestException as e:
+        logger.error(f"Error fetching {paper_url}: {str(e)}")
+        return None
     if response.status_code == 200:
-        html = response.text
-        title = BeautifulSoup(html, "html.parser").find("meta", property="og:title")[
-            "content"
-        ]
-        return title
+        return parse_arxiv_title(response.text)
     else:
         logger.error(f"Error: Received status code {response.status_code}")
         return None
 
 
-def get_arxiv_url_from_readme(readme_url):
-    """从 README.md 获取 ArXiv 论文链接"""
+def find_arxiv_urls(md_content):
+    paper_urls = re.findall(r"https://arxiv.org/(?:abs|pdf)/\d+\.\d+", md_content)
+    return paper_urls if paper_urls else None
+
+
+def fetch_readme(readme_url, headers=None):
+    """请求 README，网络错误时返回 None"""
     try:
-        md_content = requests.get(readme_url, timeout=10).text
-        paper_urls = re.findall(r"https://arxiv.org/(?:abs|pdf)/\d+\.\d+", md_content)
-        return paper_urls if paper_urls else None
+        with timed("import.readme"):
+            return http_client.get(readme_url, timeout=10, headers=headers)
     except Exception as e:
         logger.error(f"Error fetching README from {readme_url}: {str(e)}")
         return None
 
 
-def get_arxiv_url_from_github(github_repo):
-    """从 GitHub 仓库获取 ArXiv 论文链接"""
+# 依次尝试的分支，排在前面的优先
+README_BRANCHES = ["main", "master"]
+# 可以指向本地的测试服务
+GITHUB_RAW_URL = "https://raw.githubusercontent.com"
+# revalidate_readme 返回该值表示缓存的分支已不可用，需要重新探测
+REPROBE = object()
+
+
+def get_readme_url(github_repo, branch):
+    return f"{GITHUB_RAW_URL}/{github_repo}/refs/heads/{branch}/README.md"
+
+
+def conditional_headers(cached):
+    headers = {}
+    if cached["etag"]:
+        headers["If-None-Match"] = cached["etag"]
+    if cached["last_modified"]:
+        headers["If-Modified-Since"] = cached["last_modified"]
+    return headers
+
+
+def revalidate_readme(github_repo, cached, response, readme_cache):
+    """处理对缓存分支的条件请求，返回 ArXiv 链接；分支已不可用时返回 REPROBE"""
+    if response is None:
+        # 网络错误时沿用缓存的结果
+        return cached["arxiv_urls"]
+    if response.status_code == 304:
+        readme_cache.touch(github_repo)
+        return cached["arxiv_urls"]
+    if response.status_code == 200:
+        paper_urls = find_arxiv_urls(response.text)
+        readme_cache.put(
+            github_repo, cached["branch"], response.headers.get("ETag"),
+            response.headers.get("Last-Modified"), paper_urls,
+        )
+        return paper_urls
+    return REPROBE
+
+
+def choose_readme(github_repo, responses, readme_cache=None):
+    """从按 README_BRANCHES 顺序排列的响应中选出第一个包含 ArXiv 链接的分支并写入缓存"""
+    chosen = None
+    for branch, response in zip(README_BRANCHES, responses):
+        if response is None or response.status_code != 200:
+            continue
+        paper_urls = find_arxiv_urls(response.text)
+        if chosen is None or paper_urls:
+            chosen = (branch, response, paper_urls)
+        if paper_urls:
+            break
+    if chosen is None:
+        return None
+    branch, response, paper_urls = chosen
+    if readme_cache is not None:
+        readme_cache.put(
+            github_repo, branch, response.headers.get("ETag"),
+            response.headers.get("Last-Modified"), paper_urls,
+        )
+    return paper_urls
+
+
+def get_arxiv_url_from_github(github_repo, readme_cache=None):
+    """从 GitHub 仓库获取 ArXiv 论文链接
+
+    有缓存时只对上次找到 README 的分支发条件请求，README 未变化时服务端返回 304；
+    否则并发请求所有候选分支。
+    """
     if not github_repo:
         return None
-    for branch in ["main", "master"]:  # 尝试两个主要分支
-        github_readme_url = f"https://raw.githubusercontent.com/{github_repo}/refs/heads/{branch}/README.md"
-        paper_urls = get_arxiv_url_from_readme(github_readme_url)
-        if paper_urls:
+    cached = readme_cache.get(github_repo) if readme_cache is not None else None
+    if cached is not None:
+        response = fetch_readme(get_readme_url(github_repo, cached["branch"]), conditional_headers(cached))
+        paper_urls = revalidate_readme(github_repo, cached, response, readme_cache)
+        if paper_urls is not REPROBE:
             return paper_urls
-    return None
+    responses = http_client.map_concurrent(
+        lambda branch: fetch_readme(get_readme_url(github_repo, branch)), README_BRANCHES
+    )
+    return choose_readme(github_repo, responses, readme_cache)
 
 
 class Paper:
@@ -95,56 +182,203 @@ class Paper:
         github_repo=None,
         pdf_url=None,
         entry_name=None,
+        sha256=None,
+        summary=None,
+        authors=None,
+        version=None,
     ):
         self.title = title
         self.arxiv_url = arxiv_url
         self.github_repo = github_repo
         self.pdf_url = pdf_url
         self.entry_name = entry_name
+        # PDF 内容哈希，指向全局 blob 存储中的文件
+        self.sha256 = sha256
+        self.summary = summary
+        self.authors = authors
+        # arXiv 版本号，例如 "v2"
+        self.version = version
 
     def __repr__(self):
         return self.__str__()
 
 
-def github_repos_to_arxiv(github_repos):
-    # 处理并清理 GitHub 仓库 URL
-    normalized_repos = []
-    for repo_url in github_repos:
-        normalized = normalize_github_repo_url(repo_url)
-        if normalized:
-            normalized_repos.append(normalized)
-
-    # 去重处理
-    github_repos = list(set(normalized_repos))
-    logger.info(github_repos)
-    arxiv_urls = []
-    titles = []
-    for repo_url in github_repos:
-        paper_urls = get_arxiv_url_from_github(repo_url)
-        if paper_urls is None:
-            logger.info(f"No ArXiv paper found in {repo_url}")
-            repo_name = repo_url.split("/")[-1]
-            titles.append(repo_name)
-        else:
-            logger.info(f"Found ArXiv paper in {repo_url}: {paper_urls[0]}")
-            arxiv_urls.append(paper_urls[0])
-    return arxiv_urls, titles
-
-
-def titles_to_arxiv(titles):
-    arxiv_urls = []
-    for title in titles:
-        results = search_papers_by_keyword(title)
-        if results:
-            arxiv_url = results[0].arxiv_link
-            if arxiv_url is None:
-                logger.info(f"Failed to find ArXiv URL for {title}")
-            else:
-                print(f"Found ArXiv URL for {title}: {arxiv_url}")
-                arxiv_urls.append(arxiv_url)
-        else:
-            logger.info(f"Failed to find ArXiv URL for {title}")
-    return arxiv_urls
+class ImportFailed(Exception):
+    """单个输入行在某个阶段失败，记录到导入清单后继续处理其他行"""
+
+    def __init__(self, stage, message):
+        super().__init__(message)
+        self.stage = stage
+
+
+def classify_paper_desc(paper_desc):
+    """判断输入行是 GitHub 仓库、ArXiv 链接、PDF 链接还是论文标题"""
+    if "github.com" in paper_desc:
+        return "github"
+    if "arxiv.org" in paper_desc:
+        return "arxiv"
+    if paper_desc.endswith(".pdf"):
+        return "pdf"
+    return "title"
+
+
+def clean_paper_descs(paper_descs):
+    """去掉空行和重复的输入行，保持原有顺序"""
+    return list(dict.fromkeys(desc.strip() for desc in paper_descs if desc and desc.strip()))
+
+
+# 按标题搜索时只用到排在第一位的结果
+SEARCH_RESULT_LIMIT = 1
+
+
+def lookup_title_offline(title, title_index=None):
+    """在本地标题索引中查找，返回 ArXiv 链接或 None"""
+    if title_index is None:
+        return None
+    with timed("import.title_index"):
+        match = title_index.lookup(title)
+    if match is None:
+        return None
+    logger.info(f"Resolved {title} offline: {match['arxiv_id']} ({match['score']})")
+    return f"https://arxiv.org/abs/{match['arxiv_id']}"
+
+
+def pick_search_result(title, results):
+    """取搜索结果的第一条，返回 (ArXiv 链接, 摘要)"""
+    if not results or results[0].arxiv_link is None:
+        raise ImportFailed("search", f"Failed to find ArXiv URL for {title}")
+    print(f"Found ArXiv URL for {title}: {results[0].arxiv_link}")
+    return results[0].arxiv_link, results[0].summary
+
+
+def resolve_title(title, search_cache=None, title_index=None):
+    """把标题解析为 (ArXiv 链接, 摘要)，先查本地索引，未命中再搜索 papers.cool"""
+    arxiv_url = lookup_title_offline(title, title_index)
+    if arxiv_url is not None:
+        return arxiv_url, None
+    return pick_search_result(title, search_papers_by_keyword(title, SEARCH_RESULT_LIMIT, search_cache))
+
+
+def check_paper_desc(paper_desc):
+    """返回 (类别, 标准化的 GitHub 仓库名)，无法处理的输入行抛出 ImportFailed"""
+    kind = classify_paper_desc(paper_desc)
+    if kind == "pdf":
+        raise ImportFailed("resolve", "PDF URLs are not supported yet")
+    github_repo = None
+    if kind == "github":
+        github_repo = normalize_github_repo_url(paper_desc)
+        if github_repo is None:
+            raise ImportFailed("resolve", f"Invalid GitHub URL: {paper_desc}")
+    return kind, github_repo
+
+
+def resolve_paper_desc(paper_desc, search_cache=None, readme_cache=None, title_index=None):
+    """把一个输入行解析为 (ArXiv 链接, 摘要)，失败时抛出异常"""
+    kind, github_repo = check_paper_desc(paper_desc)
+    if kind == "arxiv":
+        return paper_desc, None
+    if kind == "github":
+        paper_urls = get_arxiv_url_from_github(github_repo, readme_cache)
+        if paper_urls:
+            logger.info(f"Found ArXiv paper in {github_repo}: {paper_urls[0]}")
+            return paper_urls[0], None
+        # README 中没有论文链接时按仓库名搜索
+        logger.info(f"No ArXiv paper found in {github_repo}")
+        return resolve_title(github_repo.split("/")[-1], search_cache, title_index)
+    return resolve_title(paper_desc, search_cache, title_index)
+
+
+class ImportTracker:
+    """一次导入中各输入行的进度，每一步都写入 ImportManifest；没有清单时只保存在内存中"""
+
+    def __init__(self, paper_descs, paper_db_dir, manifest=None, import_id=None):
+        self.manifest = manifest
+        self.paper_db_dir = paper_db_dir
+        self.library = os.path.basename(paper_db_dir)
+        records = manifest.begin(import_id, self.library, paper_descs) if manifest is not None else {}
+        self.entries = []
+        for desc in paper_descs:
+            entry = records.get(desc) or {
+                "desc": desc, "status": PENDING, "arxiv_url": None, "summary": None, "entry_name": None,
+            }
+            if entry["status"] in (DONE, EXISTS) and not os.path.exists(
+                os.path.join(paper_db_dir, entry["entry_name"] or "", "info.json")
+            ):
+                # 之前导入的论文已被删除，重新下载
+                entry["status"] = RESOLVED
+            if entry["status"] == FAILED:
+                # 重试失败的行，已经解析出链接的从下载开始
+                entry["status"] = RESOLVED if entry["arxiv_url"] else PENDING
+            self.entries.append(entry)
+
+    def update(self, entry, status, **fields):
+        entry.update(status=status, **fields)
+        if self.manifest is not None:
+            self.manifest.update(self.library, entry["desc"], status, **fields)
+
+    def fail(self, entry, stage, error):
+        logger.error(f"Failed to import {entry['desc']} ({stage}): {str(error)}")
+        self.update(entry, FAILED, stage=stage, error=str(error))
+
+    def resolved(self, entry, arxiv_url, summary):
+        self.update(entry, RESOLVED, arxiv_url=arxiv_url, summary=summary, stage=None, error=None)
+
+    def fail_paper(self, entries, error):
+        """一篇论文下载或写入失败，对应的各行都记为失败"""
+        for entry in entries:
+            self.fail(entry, getattr(error, "stage", "download"), error)
+
+    def with_status(self, status):
+        return [entry for entry in self.entries if entry["status"] == status]
+
+    def group_resolved(self):
+        """把已解析的行按 arXiv ID 合并为待导入的 Paper，返回 {arxiv_id: (paper, 对应的行)}"""
+        groups = {}
+        for entry in self.with_status(RESOLVED):
+            urls = arxiv_abs_and_pdf_urls(entry["arxiv_url"])
+            arxiv_id = get_arxiv_id(entry["arxiv_url"])
+            if urls is None or arxiv_id is None:
+                self.fail(entry, "resolve", f"Invalid ArXiv URL: {entry['arxiv_url']}")
+                continue
+            if arxiv_id not in groups:
+                paper = Paper(arxiv_url=urls[0], pdf_url=urls[1], summary=entry["summary"])
+                groups[arxiv_id] = (paper, [])
+            groups[arxiv_id][1].append(entry)
+        return groups
+
+    def drop_untitled(self, groups):
+        """没有取得标题的论文无法命名文件夹，记为失败"""
+        for arxiv_id, (paper, entries) in list(groups.items()):
+            if paper.title is None:
+                for entry in entries:
+                    self.fail(entry, "metadata", f"Failed to get the title of {paper.arxiv_url}")
+                del groups[arxiv_id]
+
+    def finish_paper(self, paper, entries, added):
+        status = DONE if added else EXISTS
+        for entry in entries:
+            self.update(entry, status, entry_name=paper.entry_name, stage=None, error=None)
+
+
+def start_import(paper_descs, paper_db_dir, manifest=None, import_id=None):
+    """创建文献库目录并登记本次导入的各输入行，返回 ImportTracker"""
+    paper_db_dir = os.path.abspath(paper_db_dir)
+    os.makedirs(paper_db_dir, exist_ok=True)
+    return ImportTracker(clean_paper_descs(paper_descs), paper_db_dir, manifest, import_id)
+
+
+def name_papers(tracker, groups, unresolved, titles):
+    """补上从摘要页取得的标题，去掉没有标题的论文并分配文件夹名，返回待下载的 [(paper, 对应的行)]"""
+    for paper, title in zip(unresolved, titles):
+        paper.title = title
+    tracker.drop_untitled(groups)
+    logger.info(f"Number of unique papers to dump: {len(groups)}")
+    assign_entry_names([paper for paper, _ in groups.values()], tracker.paper_db_dir)
+    return list(groups.values())
+
+
+# 下载时每次写入磁盘的块大小
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
 
 
 def get_short_filename(title):
@@ -153,131 +387,274 @@ def get_short_filename(title):
         safe_name = safe_name[:50]
     return safe_name
 
-def download_pdf(pdf_url, pdf_path):
-    response = requests.get(pdf_url, stream=True)
-    total_size = int(response.headers.get('content-length', 0))
-    block_size = 1024  # 1 Kibibyte
-    
-    # Initialize buffer to store the entire content
-    pdf_content = bytearray()
-    
-    # Download with progress bar
-    if total_size > 0:
-        progress_bar = tqdm.tqdm(total=total_size, unit='iB', unit_scale=True)
-        for data in response.iter_content(block_size):
-            progress_bar.update(len(data))
-            pdf_content.extend(data)
-        progress_bar.close()
+def assign_entry_names(papers, paper_db_dir):
+    """在并发下载之前为每篇论文确定文件夹名
+
+    截断后的标题可能相同：与本批次中其他论文重名，或文献库中已有同名文件夹但属于另一篇论文时，
+    在名字后面加上 arXiv ID 区分，避免两篇论文写入同一个文件夹。
+    """
+    used = set()
+    for paper in papers:
+        arxiv_id = get_arxiv_id(paper.arxiv_url)
+        name = get_short_filename(paper.title)
+        if name in used or _folder_taken(os.path.join(paper_db_dir, name), arxiv_id):
+            suffix = secure_filename(arxiv_id or "") or str(len(used))
+            name = f"{name}_{suffix}"
+        paper.entry_name = name
+        used.add(name)
+
+
+def _folder_taken(folder, arxiv_id):
+    """文件夹已被另一篇论文占用（info.json 中的 arXiv ID 不同）"""
+    try:
+        with open(os.path.join(folder, "info.json"), "r", encoding="utf-8") as f:
+            existing = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return get_arxiv_id(existing.get("arxiv_url")) != arxiv_id
+
+
+def _parse_content_range_start(content_range):
+    # 形如 "bytes 1000-1999/2000"
+    match = re.match(r"bytes (\d+)-", content_range or "")
+    return int(match.group(1)) if match else None
+
+
+# download_pdf 根据响应决定的处理方式
+DOWNLOAD_APPEND = "append"  # 206 且从断点开始，追加到 .part 文件
+DOWNLOAD_RESTART = "restart"  # 200，服务端返回完整文件，从头写入
+DOWNLOAD_COMPLETE = "complete"  # 416，.part 文件已经是完整内容
+DOWNLOAD_RETRY = "retry"  # 206 但起点与断点不符，丢弃 .part 后不带 Range 重新请求
+DOWNLOAD_FAILED = "failed"
+
+
+def resume_point(part_path):
+    """返回 (续传起点, 请求头)，没有上次留下的 .part 文件时从头下载"""
+    resume_from = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    return resume_from, ({"Range": f"bytes={resume_from}-"} if resume_from else {})
+
+
+def plan_download(status_code, headers, resume_from):
+    """根据响应状态和头决定处理方式，返回 (处理方式, 预期的完整文件大小)
+
+    只有 200 表示从头开始的完整文件；206 的起点与断点不一致时，响应体只是文件的一部分，
+    不能当作完整文件写入。
+    """
+    if status_code == 416 and resume_from:
+        return DOWNLOAD_COMPLETE, resume_from
+    if status_code == 200:
+        start = 0
+    elif status_code == 206:
+        if _parse_content_range_start(headers.get("Content-Range")) != resume_from:
+            return DOWNLOAD_RETRY, None
+        start = resume_from
     else:
-        pdf_content = response.content
-    
-    # Write the complete content to file after downloading
-    with open(pdf_path, "wb") as f:
-        f.write(pdf_content)
+        return DOWNLOAD_FAILED, None
+    content_length = headers.get("content-length")
+    total_size = start + int(content_length) if content_length is not None else None
+    return (DOWNLOAD_APPEND if start else DOWNLOAD_RESTART), total_size
+
+
+def download_pdf(pdf_url, pdf_path, expected_size=None, expected_sha256=None):
+    """用一次请求把 PDF 流式写入临时文件，校验通过后原子地重命名为 pdf_path
+
+    上次中断留下的 .part 文件会用 Range 请求续传。返回是否下载成功。
+    """
+    part_path = pdf_path + ".part"
+    # 续传的响应与断点不符时，丢弃 .part 文件再完整请求一次
+    for _ in range(2):
+        resume_from, headers = resume_point(part_path)
+        try:
+            # 流式读取期间一直占用主机名额
+            with http_client.host_slot(pdf_url), http_client.get_session().get(
+                pdf_url, stream=True, headers=headers, timeout=http_client.DEFAULT_TIMEOUT
+            ) as response:
+                action, total_size = plan_download(response.status_code, response.headers, resume_from)
+                if action == DOWNLOAD_RETRY:
+                    logger.warning(f"Range response does not resume at byte {resume_from}: {pdf_url}")
+                    os.remove(part_path)
+                    continue
+                if action == DOWNLOAD_FAILED:
+                    logger.error(f"Failed to download PDF ({response.status_code}): {pdf_url}")
+                    return False
+                if action != DOWNLOAD_COMPLETE:
+                    initial = resume_from if action == DOWNLOAD_APPEND else 0
+                    mode = "ab" if action == DOWNLOAD_APPEND else "wb"
+                    with open(part_path, mode) as f, tqdm.tqdm(
+                        total=total_size, initial=initial, unit="iB", unit_scale=True
+                    ) as progress_bar:
+                        for data in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                            f.write(data)
+                            progress_bar.update(len(data))
+        except RequestException as e:
+            # 保留 .part 文件，下次从断点续传
+            logger.error(f"Download interrupted for {pdf_url}: {str(e)}")
+            return False
+        return finish_download(pdf_url, pdf_path, total_size, expected_size, expected_sha256)
+    logger.error(f"Server keeps answering with a mismatched range: {pdf_url}")
+    return False
+
+
+def finish_download(pdf_url, pdf_path, total_size=None, expected_size=None, expected_sha256=None):
+    """校验下载到 .part 文件的内容，通过后重命名为 pdf_path"""
+    part_path = pdf_path + ".part"
+    downloaded_size = os.path.getsize(part_path)
+    if total_size is not None and downloaded_size < total_size:
+        logger.error(f"Incomplete download ({downloaded_size}/{total_size} bytes): {pdf_url}")
+        return False
+    if expected_size is not None and downloaded_size != expected_size:
+        logger.error(f"Size mismatch for {pdf_url}: {downloaded_size} != {expected_size}")
+        os.remove(part_path)
+        return False
+    if expected_sha256 is not None and file_sha256(part_path) != expected_sha256:
+        logger.error(f"Checksum mismatch for {pdf_url}")
+        os.remove(part_path)
+        return False
+    os.replace(part_path, pdf_path)
+    return True
+
+
+def get_arxiv_id(arxiv_url):
+    """从 arXiv 链接中取出不带版本号的论文 ID"""
+    if not arxiv_url:
+        return None
+    # 旧式 ID 中带有分类，例如 hep-th/9901001
+    match = re.search(r"arxiv\.org/(?:abs|pdf)/(.+?)/?$", arxiv_url)
+    paper_id = match.group(1) if match else arxiv_url.rstrip("/").split("/")[-1]
+    if paper_id.endswith(".pdf"):
+        paper_id = paper_id[: -len(".pdf")]
+    return re.sub(r"v\d+$", "", paper_id) or None
+
 
-def dump_paper(paper, out_folder):
+def prepare_paper_folder(paper, out_folder):
+    """创建论文文件夹，返回 (info.json 路径, PDF 路径)；论文已经导入过时返回 None"""
     os.makedirs(out_folder, exist_ok=True)
-    file_name = paper.entry_name
-    json_path = os.path.join(out_folder, f"info.json")
+    json_path = os.path.join(out_folder, "info.json")
     if os.path.exists(json_path):
         logger.info(f"Skipping existing file: {json_path}")
+        return None
+    return json_path, os.path.join(out_folder, f"{paper.entry_name}.pdf")
+
+
+def reuse_stored_pdf(paper, pdf_path, blob_store):
+    """其他文献库已经下载过这篇论文时直接链接到 pdf_path，返回是否成功"""
+    if blob_store is None:
         return False
-    pdf_path = os.path.join(out_folder, f"{file_name}.pdf")
-    pdf_response = requests.get(paper.pdf_url)
-    if pdf_response.status_code != 200:
-        logger.error(f"Failed to download PDF: {paper.pdf_url}")
+    arxiv_id = get_arxiv_id(paper.arxiv_url)
+    digest = blob_store.find_by_arxiv(arxiv_id)
+    if not digest or not blob_store.link_into(digest, pdf_path):
         return False
-    # Download PDF with progress bar
-    print(f"Downloading PDF: {paper.pdf_url}")
-    download_pdf(paper.pdf_url, pdf_path)
-    
+    logger.info(f"Reusing stored PDF for {arxiv_id}")
+    paper.sha256 = digest
+    return True
+
+
+def store_downloaded_pdf(paper, pdf_path, blob_store):
+    """把新下载的 PDF 登记到 blob_store，供其他文献库复用"""
+    if blob_store is not None:
+        paper.sha256 = blob_store.add_file(pdf_path, get_arxiv_id(paper.arxiv_url))
+
+
+def dump_paper(paper, out_folder, blob_store=None):
+    """下载论文并写入 info.json，返回是否新加入了文献库（已存在时返回 False），下载失败时抛出 ImportFailed"""
+    paths = prepare_paper_folder(paper, out_folder)
+    if paths is None:
+        return False
+    json_path, pdf_path = paths
+    if not reuse_stored_pdf(paper, pdf_path, blob_store):
+        # Download PDF with progress bar
+        print(f"Downloading PDF: {paper.pdf_url}")
+        with timed("import.pdf_download"):
+            downloaded = download_pdf(paper.pdf_url, pdf_path)
+        if not downloaded:
+            raise ImportFailed("download", f"Failed to download PDF: {paper.pdf_url}")
+        store_downloaded_pdf(paper, pdf_path, blob_store)
+
+    write_paper_info(paper, json_path)
+    return True
+
 
+def write_paper_info(paper, json_path):
     with open(json_path, "w", encoding="utf-8") as f:
         f.write(json.dumps(paper.__dict__, ensure_ascii=False, indent=4))
-    return True
 
 
-def dump_papers(papers, out_folder):
-    os.makedirs(out_folder, exist_ok=True)
-    dumped_papers = []
-    for paper in papers:
-        paper_entry_name = get_short_filename(paper.title)
-        print(f"Dumping paper: {paper_entry_name}")
-        paper.entry_name = paper_entry_name
-        paper_out_folder = os.path.join(out_folder, paper_entry_name)
-        success = dump_paper(paper, paper_out_folder)
-        if success:
-            dumped_papers.append(paper)
-    return dumped_papers
+def arxiv_abs_and_pdf_urls(arxiv_url):
+    """返回 (摘要页链接, PDF 链接)，无法识别时返回 None"""
+    if "/abs/" in arxiv_url:
+        return arxiv_url, arxiv_url.replace("/abs/", "/pdf/")
+    if "/pdf/" in arxiv_url:
+        return arxiv_url.replace("/pdf/", "/abs/"), arxiv_url
+    return None
 
 
-def import_papers(paper_descs, paper_db_dir):
-    paper_db_dir = os.path.abspath(paper_db_dir)
-    github_repos = []
-    arxiv_urls = []
-    titles = []
-    paper_names = []
-    pdf_urls = []
-
-    for paper_desc in paper_descs:
-        if "github.com" in paper_desc:
-            github_repos.append(paper_desc)
-        elif "arxiv.org" in paper_desc:
-            arxiv_urls.append(paper_desc)
-        elif paper_desc.endswith(".pdf"):
-            pdf_urls.append(paper_desc)
-        else:
-            paper_names.append(paper_desc)
-
-    logger.info("Input Summary:")
-    logger.info(f"Found {len(github_repos)} GitHub repos")
-    logger.info(f"Found {len(arxiv_urls)} ArXiv URLs")
-    logger.info(f"Found {len(pdf_urls)} PDF URLs")
-    logger.info(f"Found {len(paper_names)} paper names")
-
-    arxiv_urls2, titles2 = github_repos_to_arxiv(github_repos)
-    arxiv_urls.extend(arxiv_urls2)
-    titles.extend(titles2)
-
-    arxiv_urls3 = titles_to_arxiv(titles + paper_names)
-    arxiv_urls.extend(arxiv_urls3)
-    papers = []
-    for arxiv_url in arxiv_urls:
-        if "/abs/" in arxiv_url:
-            arxiv_pdf_url = arxiv_url.replace("/abs/", "/pdf/")
-        elif "/pdf/" in arxiv_url:
-            arxiv_pdf_url = arxiv_url
-            arxiv_url = arxiv_url.replace("/pdf/", "/abs/")
-        else:
-            logger.info(f"Invalid ArXiv URL: {arxiv_url}")
+def apply_arxiv_metadata(papers, records):
+    """用 arXiv 接口返回的元数据填充标题、作者、版本号和摘要，返回没有查到的论文"""
+    unresolved = []
+    for paper in papers:
+        record = records.get(get_arxiv_id(paper.arxiv_url))
+        if record is None:
+            unresolved.append(paper)
             continue
-        paper = Paper(
-            title=get_paper_title_from_arxiv(arxiv_url),
-            arxiv_url=arxiv_url,
-            github_repo=None,
-            pdf_url=arxiv_pdf_url,
-        )
-        papers.append(paper)
-    assert len(pdf_urls) == 0, "PDF URLs not supported yet"
-
-    # 去重
-    papers = list(
-        {paper.arxiv_url: paper for paper in papers if paper.title is not None}.values()
+        paper.title = record["title"]
+        paper.authors = record["authors"]
+        paper.version = record["version"]
+        paper.summary = paper.summary or record["abstract"]
+    return unresolved
+
+
+def import_papers(paper_descs, paper_db_dir, blob_store=None, metadata_cache=None, search_cache=None,
+                  readme_cache=None, title_index=None, manifest=None, import_id=None):
+    """导入论文，返回新加入文献库的论文信息
+
+    每个输入行的进度和失败原因写入 manifest（ImportManifest），一行失败不影响其他行；
+    再次导入同样的内容时跳过已完成的行，已解析出链接的行直接从下载开始。
+    """
+    tracker = start_import(paper_descs, paper_db_dir, manifest, import_id)
+
+    def resolve_one(entry):
+        try:
+            arxiv_url, summary = resolve_paper_desc(entry["desc"], search_cache, readme_cache, title_index)
+        except Exception as e:
+            tracker.fail(entry, getattr(e, "stage", "resolve"), e)
+            return
+        tracker.resolved(entry, arxiv_url, summary)
+
+    # 并发解析各输入行，每个主机的并发数由 http_client 限制
+    http_client.map_concurrent(resolve_one, tracker.with_status(PENDING))
+
+    # 按 arXiv ID 去重后批量获取元数据，已缓存的论文不访问网络
+    groups = tracker.group_resolved()
+    papers = [paper for paper, _ in groups.values()]
+    records = resolve_metadata(list(groups), metadata_cache)
+    unresolved = apply_arxiv_metadata(papers, records)
+    # 接口不可用时退回到逐篇读取摘要页
+    paper_titles = http_client.map_concurrent(
+        lambda paper: get_paper_title_from_arxiv(paper.arxiv_url), unresolved
     )
+    to_dump = name_papers(tracker, groups, unresolved, paper_titles)
+
+    def dump_one(group):
+        paper, entries = group
+        print(f"Dumping paper: {paper.entry_name}")
+        try:
+            added = dump_paper(paper, os.path.join(tracker.paper_db_dir, paper.entry_name), blob_store)
+        except Exception as e:
+            tracker.fail_paper(entries, e)
+            return None
+        tracker.finish_paper(paper, entries, added)
+        return paper if added else None
 
-    logger.info(f"Number of unique papers to dump: {len(papers)}")
-
-    dumped_papers = dump_papers(papers, paper_db_dir)
+    dumped_papers = http_client.map_concurrent(dump_one, to_dump)
     logger.info("=== Processing Complete ===")
-
-    return [paper.__dict__ for paper in dumped_papers]
+    return [paper.__dict__ for paper in dumped_papers if paper is not None]
 
 
 def load_paper_descs(in_file):
     paper_descs = open(in_file, "r", encoding="utf-8").read().split("\n")
     # filter # comments
     paper_descs = [x for x in paper_descs if not x.startswith("#")]
-    return paper_descs
+    return clean_paper_descs(paper_descs)
 
 
 if __name__ == "__main__":
@@ -1,34 +1,324 @@
 import os
 import json
+import io
+import csv
 import uuid
-import glob
-from flask import Flask, request, jsonify
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
 from datetime import datetime
 from werkzeug.utils import secure_filename
+from werkzeug.formparser import parse_form_data
 
 # 导入现有功能模块
-from readers.gemini_reader import GeminiPDFReader
-from retrieval.main import import_papers
+from readers.gemini_reader import GeminiPDFReader, DEFAULT_MODEL, is_retryable
+from readers.call_policy import CallPolicy, CircuitBreaker, is_transient
+from readers.fake_reader import FakePDFReader
+from readers.upload_cache import UploadCache
+from readers.context_cache import ContextCacheManager, GeminiContextCacheBackend
+from readers.pdf_text import build_chunks, extract_pdf_metadata, load_chunks, load_page_count, needs_full_pdf, select_chunks
+from readers.scheduler import ModelScheduler, estimate_tokens, OUTPUT_TOKENS
+from storage.answer_cache import AnswerCache
+from storage.catalog import LibraryCatalog
+from storage.history_index import HistoryIndex
+from storage.blob_store import BlobStore
+from storage.arxiv_metadata import ArxivMetadataCache
+from storage.search_cache import SearchCache
+from storage.readme_cache import ReadmeCache
+from storage.title_index import ArxivTitleIndex
+from storage.import_manifest import ImportManifest
+from storage.bulk_upload import BulkUpload, UploadTooLarge
+from storage.search_index import LibrarySearchIndex
+from jobs.manager import JobManager, JobCancelled
+from monitoring import metrics
+from monitoring.metrics import timed
+from retrieval.main import import_papers, clean_paper_descs
 
 # 加载环境变量
 load_dotenv()
 
 app = Flask(__name__)
-CORS(app)  # 启用跨域请求支持
+CORS(app, expose_headers=['X-Total-Count', 'X-Next-Cursor', 'X-Trace-Id'])  # 启用跨域请求支持
 
 # 配置
-LIBRARY_ROOT = os.path.join(os.path.dirname(__file__), '../data/libraries/')
-HISTORY_FOLDER = os.path.join(os.path.dirname(__file__), '../data/history/')
+# 所有数据的根目录，压测等场景可以指向临时目录
+DATA_ROOT = os.getenv('DATA_ROOT', os.path.join(os.path.dirname(__file__), '../data/'))
+LIBRARY_ROOT = os.path.join(DATA_ROOT, 'libraries/')
+HISTORY_FOLDER = os.path.join(DATA_ROOT, 'history/')
+CACHE_FOLDER = os.path.join(DATA_ROOT, 'cache/')
+JOBS_FOLDER = os.path.join(DATA_ROOT, 'jobs/')
+BLOB_FOLDER = os.path.join(DATA_ROOT, 'blobs/')
+MATRIX_FOLDER = os.path.join(DATA_ROOT, 'matrices/')
+# 批量上传的暂存目录，与文献库在同一文件系统上，写完后直接移入论文文件夹
+UPLOAD_STAGING_FOLDER = os.path.join(DATA_ROOT, 'uploads/')
 ALLOWED_EXTENSIONS = {'pdf'}
+# 单个请求内同时向模型提问的论文数上限
+ASK_MAX_WORKERS = int(os.getenv('ASK_MAX_WORKERS', 8))
+# 整个进程内同时进行的模型调用上限（跨所有请求）
+ASK_MAX_GLOBAL_WORKERS = int(os.getenv('ASK_MAX_GLOBAL_WORKERS', 16))
+# 模型接口每分钟的请求数和 token 数配额，0 表示不限制
+MODEL_RPM = int(os.getenv('MODEL_RPM', 0))
+MODEL_TPM = int(os.getenv('MODEL_TPM', 0))
+# 阅读器后端：gemini，或不访问网络的 fake（用于压测，可配置耗时、失败率和回答长度）
+READER_BACKEND = os.getenv('READER_BACKEND', 'gemini')
+FAKE_READER_LATENCY = float(os.getenv('FAKE_READER_LATENCY', 0.5))
+FAKE_READER_ERROR_RATE = float(os.getenv('FAKE_READER_ERROR_RATE', 0))
+FAKE_READER_OUTPUT_SIZE = int(os.getenv('FAKE_READER_OUTPUT_SIZE', 2000))
+# 回答缓存以模型名区分，fake 阅读器使用独立的名字以免混入真实回答
+MODEL = os.getenv('MODEL', 'fake-model' if READER_BACKEND == 'fake' else DEFAULT_MODEL)
+# 模型调用的重试次数、退避基数和上限（秒）、单次尝试超时和含重试的总时限（秒）
+MODEL_CALL_RETRIES = int(os.getenv('MODEL_CALL_RETRIES', 3))
+MODEL_CALL_BACKOFF = float(os.getenv('MODEL_CALL_BACKOFF', 1))
+MODEL_CALL_MAX_BACKOFF = float(os.getenv('MODEL_CALL_MAX_BACKOFF', 30))
+MODEL_CALL_TIMEOUT = float(os.getenv('MODEL_CALL_TIMEOUT', 180))
+MODEL_CALL_DEADLINE = float(os.getenv('MODEL_CALL_DEADLINE', 600))
+# 调用耗时超过近期 p95 时再发一个相同请求，取先返回的结果（会增加少量调用量）
+MODEL_CALL_HEDGE = os.getenv('MODEL_CALL_HEDGE', '0') == '1'
+# 连续失败多少次后熔断，以及熔断持续的秒数
+CIRCUIT_BREAKER_THRESHOLD = int(os.getenv('CIRCUIT_BREAKER_THRESHOLD', 5))
+CIRCUIT_BREAKER_COOLDOWN = float(os.getenv('CIRCUIT_BREAKER_COOLDOWN', 30))
+# 服务端上下文缓存的有效期（秒），0 表示不使用
+CONTEXT_CACHE_TTL = int(os.getenv('CONTEXT_CACHE_TTL', 0))
+# 检索模式 (mode=chunks) 下默认发送给模型的文本块数
+CHUNK_TOP_K = int(os.getenv('CHUNK_TOP_K', 8))
+# 回答缓存的总大小上限和最长保留时间
+ANSWER_CACHE_MAX_MB = float(os.getenv('ANSWER_CACHE_MAX_MB', 200))
+ANSWER_CACHE_MAX_AGE_DAYS = float(os.getenv('ANSWER_CACHE_MAX_AGE_DAYS', 30))
+# 按标题搜索论文的结果缓存：有结果和无结果条目的保留时间，以及最多保留的条目数
+SEARCH_CACHE_TTL_HOURS = float(os.getenv('SEARCH_CACHE_TTL_HOURS', 168))
+SEARCH_CACHE_NEGATIVE_TTL_HOURS = float(os.getenv('SEARCH_CACHE_NEGATIVE_TTL_HOURS', 24))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv('SEARCH_CACHE_MAX_ENTRIES', 10000))
+# 本地 arXiv 标题索引（用 python -m storage.title_index 从元数据快照建立），文件不存在时只用在线搜索
+ARXIV_TITLE_INDEX = os.getenv('ARXIV_TITLE_INDEX', '')
+ARXIV_TITLE_FUZZY = os.getenv('ARXIV_TITLE_FUZZY', '1') == '1'
+# 后台任务的工作线程数，以及导入任务每批处理（并保存断点）的论文条目数
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+JOB_IMPORT_BATCH = int(os.getenv('JOB_IMPORT_BATCH', 10))
+# 服务退出时等待运行中的任务保存断点的秒数，超时的任务在下次启动时从上一个断点继续
+JOB_STOP_TIMEOUT = float(os.getenv('JOB_STOP_TIMEOUT', 30))
+# 问题矩阵模式下，一次生成最多合并回答的问题数
+MATRIX_QUESTIONS_PER_CALL = int(os.getenv('MATRIX_QUESTIONS_PER_CALL', 5))
+# 请求 trace 日志（JSON Lines），为空时不记录；默认只记录带 X-Trace: 1 请求头的请求
+TRACE_LOG = os.getenv('TRACE_LOG', '')
+TRACE_ALL_REQUESTS = os.getenv('TRACE_ALL_REQUESTS', '0') == '1'
+# 问答历史分页接口每页最多返回的会话数
+HISTORY_MAX_LIMIT = int(os.getenv('HISTORY_MAX_LIMIT', 500))
+# 批量上传中单个 PDF 的大小上限（MB）和每次上传的文件数上限
+BULK_UPLOAD_MAX_FILE_MB = int(os.getenv('BULK_UPLOAD_MAX_FILE_MB', 200))
+BULK_UPLOAD_MAX_FILES = int(os.getenv('BULK_UPLOAD_MAX_FILES', 1000))
+# 一次批量上传写入的总大小上限（MB），包括上传的压缩包和从中解出的 PDF
+BULK_UPLOAD_MAX_TOTAL_MB = int(os.getenv('BULK_UPLOAD_MAX_TOTAL_MB', 4096))
+# 在后台提取上传 PDF 的标题和页数的线程数
+UPLOAD_METADATA_WORKERS = int(os.getenv('UPLOAD_METADATA_WORKERS', 4))
 
 # 确保目录存在
 os.makedirs(LIBRARY_ROOT, exist_ok=True)
 os.makedirs(HISTORY_FOLDER, exist_ok=True)
+os.makedirs(CACHE_FOLDER, exist_ok=True)
+os.makedirs(JOBS_FOLDER, exist_ok=True)
+os.makedirs(MATRIX_FOLDER, exist_ok=True)
+os.makedirs(UPLOAD_STAGING_FOLDER, exist_ok=True)
+
+# 全局调度器：所有模型调用在并发数和 RPM/TPM 配额内排队准入，防止多个请求同时扇出时触发限流
+scheduler = ModelScheduler(ASK_MAX_GLOBAL_WORKERS, rpm=MODEL_RPM, tpm=MODEL_TPM)
 
 # 初始化 PDF 阅读器
-reader = GeminiPDFReader(os.getenv("API_KEY"))
+def create_call_policy(classify):
+    return CallPolicy(
+        retries=MODEL_CALL_RETRIES,
+        backoff=MODEL_CALL_BACKOFF,
+        max_backoff=MODEL_CALL_MAX_BACKOFF,
+        attempt_timeout=MODEL_CALL_TIMEOUT,
+        deadline=MODEL_CALL_DEADLINE,
+        hedge=MODEL_CALL_HEDGE,
+        breaker=CircuitBreaker(CIRCUIT_BREAKER_THRESHOLD, CIRCUIT_BREAKER_COOLDOWN),
+        classify=classify,
+        # 对冲和重试请求向调度器申请名额，超时后仍在运行的请求数不超过全局并发上限
+        scheduler=scheduler,
+        max_abandoned=ASK_MAX_GLOBAL_WORKERS,
+    )
+
+def create_reader():
+    if READER_BACKEND == 'fake':
+        return FakePDFReader(
+            latency=FAKE_READER_LATENCY,
+            error_rate=FAKE_READER_ERROR_RATE,
+            output_size=FAKE_READER_OUTPUT_SIZE,
+            model=MODEL,
+            call_policy=create_call_policy(is_transient),
+        )
+    # 上传过的 PDF 按内容哈希缓存文件引用，追问时不必重复上传
+    upload_cache = UploadCache(os.path.join(CACHE_FOLDER, 'uploads.json'))
+    gemini_reader = GeminiPDFReader(
+        os.getenv("API_KEY"),
+        upload_cache=upload_cache,
+        model=MODEL,
+        call_policy=create_call_policy(is_retryable),
+    )
+    if CONTEXT_CACHE_TTL > 0:
+        # 对同一篇论文的多轮提问复用服务端缓存的 PDF 上下文
+        gemini_reader.context_cache = ContextCacheManager(
+            GeminiContextCacheBackend(gemini_reader.client), ttl=CONTEXT_CACHE_TTL
+        )
+    return gemini_reader
+
+reader = create_reader()
+# 相同问题、相同论文、相同模型的回答直接复用
+answer_cache = AnswerCache(
+    os.path.join(CACHE_FOLDER, 'answers.db'),
+    max_bytes=int(ANSWER_CACHE_MAX_MB * 1024 * 1024),
+    max_age=ANSWER_CACHE_MAX_AGE_DAYS * 24 * 3600,
+)
+# 所有文献库共享的 PDF 存储，同一篇论文只保存一份
+blob_store = BlobStore(BLOB_FOLDER)
+# 导入时获取的 arXiv 元数据，重复导入同一篇论文不再访问 arXiv
+arxiv_metadata = ArxivMetadataCache(os.path.join(CACHE_FOLDER, 'arxiv_metadata.db'))
+# 按标题搜索论文的结果，导入重试时不再重复搜索
+search_cache = SearchCache(
+    os.path.join(CACHE_FOLDER, 'searches.db'),
+    ttl=SEARCH_CACHE_TTL_HOURS * 3600,
+    negative_ttl=SEARCH_CACHE_NEGATIVE_TTL_HOURS * 3600,
+    max_entries=SEARCH_CACHE_MAX_ENTRIES,
+)
+# GitHub 仓库 README 中的 arXiv 链接，重复导入时用条件请求确认 README 是否变化
+readme_cache = ReadmeCache(os.path.join(CACHE_FOLDER, 'readmes.db'))
+# 按标题导入时先查本地索引，未命中才搜索 papers.cool
+title_index_path = ARXIV_TITLE_INDEX or os.path.join(CACHE_FOLDER, 'arxiv_titles.db')
+title_index = None
+if os.path.exists(title_index_path):
+    title_index = ArxivTitleIndex(title_index_path, fuzzy=ARXIV_TITLE_FUZZY)
+# 导入清单：逐行记录导入进度，重新导入时从断点继续，并提供导入进度查询
+import_manifest = ImportManifest(os.path.join(CACHE_FOLDER, 'imports.db'))
+# 文献库和论文的索引，代替每次请求时的目录扫描
+catalog = LibraryCatalog(os.path.join(CACHE_FOLDER, 'catalog.db'), LIBRARY_ROOT)
+# 问答历史的索引，启动时补录尚未索引的旧会话
+history_index = HistoryIndex(os.path.join(CACHE_FOLDER, 'history.db'))
+with timed('history.sync'):
+    history_index.sync(HISTORY_FOLDER)
+# 文献库内的论文检索索引，用于为问题预选相关论文
+search_index = LibrarySearchIndex(os.path.join(CACHE_FOLDER, 'search.db'))
+# 耗时的提问和导入可以作为后台任务提交，任务持久化在 JOBS_FOLDER 中
+job_manager = JobManager(JOBS_FOLDER, workers=JOB_WORKERS)
+
+# 请求级别的各阶段耗时记录
+trace_log = metrics.TraceLog(TRACE_LOG) if TRACE_LOG else None
+
+def start_request_trace(method, path, headers):
+    """按配置为请求开始记录 trace，返回 (trace, token)，不记录时均为 None"""
+    if trace_log is not None and (TRACE_ALL_REQUESTS or headers.get('X-Trace') == '1'):
+        return metrics.start_trace(f"{method} {path}")
+    return None, None
+
+def record_request(start, method, endpoint, status, trace=None):
+    metrics.HTTP_REQUESTS.observe(
+        time.perf_counter() - start, method=method, endpoint=endpoint, status=status,
+    )
+    if trace is not None:
+        trace_log.write(trace.to_dict(endpoint=endpoint, status=status))
+
+@app.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    g.trace, g.trace_token = start_request_trace(request.method, request.path, request.headers)
+
+@app.after_request
+def finish_request_metrics(response):
+    start = g.get('request_start')
+    if start is None:
+        return response
+    method = request.method
+    # 用路由规则而不是实际路径作为标签，避免标签数量无限增长
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    trace = g.get('trace')
+    if trace is not None:
+        response.headers['X-Trace-Id'] = trace.id
+        metrics.end_trace(g.trace_token)
+
+    # 流式响应在发送完毕后才算结束
+    response.call_on_close(
+        lambda: record_request(start, method, endpoint, response.status_code, trace)
+    )
+    return response
+
+# 导入后在后台提取并切分论文文本，供检索模式使用
+preprocess_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='preprocess')
+
+def index_paper_for_search(library_name, paper_folder, chunks=None):
+    """把论文的标题、摘要和已提取的正文写入文献库检索索引"""
+    paper_info = get_paper_info(paper_folder)
+    if chunks is None:
+        chunks = load_chunks(paper_folder) or []
+    search_index.index_paper(
+        library_name,
+        os.path.basename(paper_folder),
+        title=paper_info.get('title'),
+        summary=paper_info.get('summary'),
+        text='\n'.join(chunk['text'] for chunk in chunks),
+    )
+
+def preprocess_paper(library_name, paper_folder):
+    try:
+        paper_info = get_paper_info(paper_folder)
+        chunks = build_chunks(paper_folder, paper_info['path'])
+        index_paper_for_search(library_name, paper_folder, chunks)
+    except Exception as e:
+        print(f"Error preprocessing {paper_folder}: {str(e)}")
+
+def schedule_preprocess(library_name, folder_names):
+    library_path = os.path.join(LIBRARY_ROOT, library_name)
+    for folder_name in folder_names:
+        preprocess_pool.submit(preprocess_paper, library_name, os.path.join(library_path, folder_name))
+
+# 删除论文或文献库后在后台回收不再被引用的 PDF，检查副本时可能要计算哈希
+blob_gc_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='blob-gc')
+
+def collect_blobs(deleted_path):
+    try:
+        blob_store.gc(deleted_path)
+    except Exception as e:
+        print(f"Error collecting blobs under {deleted_path}: {str(e)}")
+
+def schedule_blob_gc(deleted_path):
+    blob_gc_pool.submit(collect_blobs, deleted_path)
+
+# 上传的 PDF 只有文件名，在后台从 PDF 文档信息中补充标题和页数
+metadata_pool = ThreadPoolExecutor(max_workers=UPLOAD_METADATA_WORKERS, thread_name_prefix='pdf-metadata')
+
+def extract_upload_metadata(library_name, folder_name):
+    """把 PDF 中的标题和页数写入 info.json，随后交给预处理"""
+    paper_folder = os.path.join(LIBRARY_ROOT, library_name, folder_name)
+    info_file = os.path.join(paper_folder, 'info.json')
+    try:
+        with open(info_file, 'r', encoding='utf-8') as f:
+            paper_info = json.load(f)
+        metadata = extract_pdf_metadata(os.path.join(paper_folder, paper_info['entry_name'] + '.pdf'))
+        if metadata is not None:
+            paper_info['title'] = metadata['title'] or paper_info['title']
+            paper_info['pages'] = metadata['pages']
+            tmp_file = info_file + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(paper_info, f, ensure_ascii=False, indent=4)
+            os.replace(tmp_file, info_file)
+            catalog.refresh_paper(library_name, folder_name)
+    except Exception as e:
+        print(f"Error reading metadata of {paper_folder}: {str(e)}")
+    schedule_preprocess(library_name, [folder_name])
+
+def sync_search_index(library_name):
+    """补录检索索引中缺失的论文（例如索引建立前已导入的论文），移除已删除的论文"""
+    papers, _ = catalog.list_papers(library_name)
+    folders = {p.get('entry_name') for p in papers}
+    indexed = search_index.indexed_folders(library_name)
+    for folder_name in indexed - folders:
+        search_index.remove_paper(library_name, folder_name)
+    for folder_name in folders - indexed:
+        try:
+            index_paper_for_search(library_name, os.path.join(LIBRARY_ROOT, library_name, folder_name))
+        except (OSError, ValueError) as e:
+            print(f"Error indexing {folder_name}: {str(e)}")
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -36,20 +326,9 @@ def allowed_file(filename):
 # 获取所有文献库
 @app.route('/api/libraries', methods=['GET'])
 def get_libraries():
-    libraries = []
-    # 假设每个库是一个文件夹
-    lib_folders = glob.glob(os.path.join(LIBRARY_ROOT, '*'))
-    for folder in lib_folders:
-        if os.path.isdir(folder):
-            lib_name = os.path.basename(folder)
-            # 计算包含的论文数量 (每个子文件夹是一篇论文)
-            paper_folders = glob.glob(os.path.join(folder, '*'))
-            pdf_count = sum(1 for f in paper_folders if os.path.isdir(f))
-            libraries.append({
-                'name': lib_name,
-                'count': pdf_count,
-                'created': os.path.getctime(folder)
-            })
+    # 由索引提供，只有目录发生变化的文献库才会被重新扫描
+    with timed('catalog.list_libraries'):
+        libraries = catalog.list_libraries()
     return jsonify(libraries)
 
 # 创建新文献库
@@ -65,6 +344,7 @@ def create_library():
         return jsonify({'error': 'Library already exists'}), 400
     
     os.makedirs(library_path)
+    catalog.refresh_library(library_name)
     return jsonify({'name': library_name, 'created': datetime.now().isoformat()})
 
 # 删除文献库
@@ -77,6 +357,10 @@ def delete_library(library_name):
     # 递归删除文件夹
     import shutil
     shutil.rmtree(library_path)
+    catalog.remove_library(secure_filename(library_name))
+    search_index.remove_library(secure_filename(library_name))
+    # 回收不再被任何文献库引用的 PDF
+    schedule_blob_gc(library_path)
     return jsonify({'success': True})
 
 # 上传 PDF 到文献库 - NEED CHECK, HAS NOT BEEN TESTED
@@ -105,7 +389,12 @@ def upload_pdf(library_name):
         
         # 保存PDF文件到论文文件夹中
         file_path = os.path.join(paper_folder, filename)
-        file.save(file_path)
+        # 先写临时文件再替换：已有的 PDF 可能是与其他文献库共享的硬链接，不能原地覆盖
+        tmp_path = file_path + '.upload'
+        file.save(tmp_path)
+        os.replace(tmp_path, file_path)
+        # 纳入全局存储，内容已存在时文献库中的文件会变成指向它的链接
+        sha256 = blob_store.add_file(file_path)
         
         # 创建简单的info.json
         paper_info = {
@@ -113,16 +402,72 @@ def upload_pdf(library_name):
             "arxiv_url": None,
             "github_repo": None,
             "pdf_url": None,
-            "entry_name": paper_folder_name
+            "entry_name": paper_folder_name,
+            "sha256": sha256
         }
         
         with open(os.path.join(paper_folder, "info.json"), "w", encoding="utf-8") as f:
             json.dump(paper_info, f, ensure_ascii=False, indent=4)
+        catalog.refresh_paper(secure_filename(library_name), paper_folder_name)
+        schedule_preprocess(secure_filename(library_name), [paper_folder_name])
         
         return jsonify({'filename': filename, 'folder': paper_folder_name})
     
     return jsonify({'error': 'Invalid file type'}), 400
 
+# 请求体直接是压缩包时，按 Content-Type 推断类型
+ARCHIVE_MIMETYPES = {
+    'application/zip': 'upload.zip',
+    'application/x-zip-compressed': 'upload.zip',
+    'application/x-tar': 'upload.tar',
+    'application/gzip': 'upload.tar.gz',
+    'application/x-gzip': 'upload.tar.gz',
+}
+
+# 批量上传：multipart 中的多个 PDF 或压缩包，或者请求体本身就是一个 zip/tar 压缩包
+@app.route('/api/libraries/<library_name>/upload/bulk', methods=['POST'])
+def bulk_upload_pdfs(library_name):
+    library_name = secure_filename(library_name)
+    library_path = os.path.join(LIBRARY_ROOT, library_name)
+    if not os.path.exists(library_path):
+        return jsonify({'error': 'Library not found'}), 404
+    max_total_size = BULK_UPLOAD_MAX_TOTAL_MB * 1024 * 1024
+    if request.content_length and request.content_length > max_total_size:
+        return jsonify({'error': f'Upload exceeds {BULK_UPLOAD_MAX_TOTAL_MB} MB in total'}), 413
+    
+    papers, _ = catalog.list_papers(library_name)
+    upload = BulkUpload(
+        library_path, UPLOAD_STAGING_FOLDER, blob_store,
+        known={p['sha256']: p.get('entry_name') for p in papers if p.get('sha256')},
+        max_file_size=BULK_UPLOAD_MAX_FILE_MB * 1024 * 1024,
+        max_files=BULK_UPLOAD_MAX_FILES,
+        max_total_size=max_total_size,
+    )
+    try:
+        if request.mimetype == 'multipart/form-data':
+            # 不经过 request.files：每个文件字段边接收边写入暂存文件并计算哈希
+            _, _, files = parse_form_data(request.environ, stream_factory=upload.stream_factory)
+            uploads = [(file.filename, file.stream) for _, file in files.items(multi=True)]
+        elif request.mimetype in ARCHIVE_MIMETYPES:
+            filename = request.args.get('filename') or ARCHIVE_MIMETYPES[request.mimetype]
+            uploads = [(filename, request.stream)]
+        else:
+            return jsonify({'error': 'Expected multipart/form-data or a zip/tar archive'}), 415
+        if not uploads:
+            return jsonify({'error': 'No file part'}), 400
+        for filename, stream in uploads:
+            upload.add_upload(filename, stream)
+    except UploadTooLarge as e:
+        return jsonify({'error': str(e), 'files': upload.results}), 413
+    finally:
+        upload.cleanup()
+        if upload.added:
+            catalog.refresh_library(library_name)
+            for folder_name in upload.added:
+                metadata_pool.submit(extract_upload_metadata, library_name, folder_name)
+    
+    return jsonify({'files': upload.results, 'counts': upload.counts()})
+
 # 添加论文到文献库 - 这个已经使用 main.py 中的 import_papers 方法，结构兼容
 @app.route('/api/libraries/<library_name>/add', methods=['POST'])
 def add_paper(library_name):
@@ -137,9 +482,57 @@ def add_paper(library_name):
     if not os.path.exists(library_path):
         return jsonify({'error': 'Library not found'}), 404
 
-    downloaded_papers = import_papers(paper_descs, library_path)
+    if data.get('async'):
+        job = job_manager.submit('import', {
+            'library': secure_filename(library_name),
+            'paper_descs': paper_descs,
+        })
+        return jsonify({'job_id': job['id'], 'status': job['status']}), 202
+
+    # 客户端可以自带 import_id，在请求进行中通过 /api/imports/<import_id> 查询进度
+    import_id = data.get('import_id') or str(uuid.uuid4())
+    try:
+        downloaded_papers = import_papers(
+            paper_descs, library_path, blob_store, arxiv_metadata, search_cache, readme_cache,
+            title_index, import_manifest, import_id,
+        )
+    except Exception:
+        import_manifest.finish(import_id, 'failed')
+        raise
+    import_manifest.finish(import_id)
+    finish_import(secure_filename(library_name), downloaded_papers)
     
-    return jsonify({'added': downloaded_papers})
+    return jsonify(import_result(import_id, downloaded_papers))
+
+def finish_import(library_name, downloaded_papers):
+    """导入完成后更新索引，并在后台预处理新论文"""
+    catalog.refresh_library(library_name)
+    schedule_preprocess(library_name, [p['entry_name'] for p in downloaded_papers])
+
+def import_result(import_id, downloaded_papers):
+    """导入接口的返回内容：新加入的论文、失败的输入行和各状态的数量"""
+    progress = import_manifest.progress(import_id)
+    return {
+        'import_id': import_id,
+        'added': downloaded_papers,
+        'failed': progress['failed'],
+        'total': progress['total'],
+        'counts': progress['counts'],
+    }
+
+# 一次导入的进度：各状态的输入行数和失败原因
+@app.route('/api/imports/<import_id>', methods=['GET'])
+def get_import_progress(import_id):
+    progress = import_manifest.progress(import_id)
+    if progress is None:
+        return jsonify({'error': 'Import not found'}), 404
+    return jsonify(progress)
+
+# 文献库最近的导入记录
+@app.route('/api/libraries/<library_name>/imports', methods=['GET'])
+def list_library_imports(library_name):
+    limit = request.args.get('limit', default=20, type=int)
+    return jsonify(import_manifest.list_imports(secure_filename(library_name), limit))
 
 def get_paper_info(folder):
     info_file = os.path.join(folder, 'info.json')
@@ -159,23 +552,50 @@ def get_paper_info(folder):
 # 获取文献库中的所有 PDF - 修改以适应新结构
 @app.route('/api/libraries/<library_name>/papers', methods=['GET'])
 def get_library_papers(library_name):
-    library_path = os.path.join(LIBRARY_ROOT, secure_filename(library_name))
+    library_name = secure_filename(library_name)
+    library_path = os.path.join(LIBRARY_ROOT, library_name)
     if not os.path.exists(library_path):
         return jsonify({'error': 'Library not found'}), 404
     
-    papers = []
-    paper_folders = [f for f in glob.glob(os.path.join(library_path, '*')) if os.path.isdir(f) and os.path.exists(os.path.join(f, 'info.json'))]
+    # 支持 ?q=标题关键词&sort=title|entry_name|size|added&order=asc|desc&page=1&page_size=50
+    # 不传 page 时返回全部论文；总数通过 X-Total-Count 头返回
+    page = request.args.get('page', type=int)
+    page_size = request.args.get('page_size', 50, type=int)
+    limit = offset = None
+    if page is not None:
+        limit = max(1, min(page_size, 500))
+        offset = (max(page, 1) - 1) * limit
+    with timed('catalog.list_papers'):
+        papers, total = catalog.list_papers(
+            library_name,
+            query=request.args.get('q'),
+            sort=request.args.get('sort', 'title'),
+            order=request.args.get('order', 'asc'),
+            offset=offset or 0,
+            limit=limit,
+        )
     
-    for folder in paper_folders:
-        try:
-            paper_info = get_paper_info(folder)
-            # 敏感信息不应该暴露给前端
-            paper_info.pop('path', None)
-            papers.append(paper_info)
-        except Exception as e:
-            print(f"Error processing {folder}: {str(e)}")
+    response = jsonify(papers)
+    response.headers['X-Total-Count'] = str(total)
+    return response
+
+# 在文献库中检索与查询最相关的论文
+@app.route('/api/libraries/<library_name>/search', methods=['GET'])
+def search_library(library_name):
+    library_name = secure_filename(library_name)
+    if not os.path.exists(os.path.join(LIBRARY_ROOT, library_name)):
+        return jsonify({'error': 'Library not found'}), 404
+    query = request.args.get('q', '')
+    if not query:
+        return jsonify({'error': 'Query is required'}), 400
     
-    return jsonify(papers)
+    sync_search_index(library_name)
+    limit = max(1, min(request.args.get('limit', 10, type=int), 100))
+    results = search_index.search(library_name, query, limit)
+    return jsonify([
+        {'entry_name': folder_name, 'title': title, 'score': score}
+        for folder_name, title, score in results
+    ])
 
 # 从文献库中删除论文 - 修改为删除整个论文文件夹
 @app.route('/api/libraries/<library_name>/papers/<folder_name>', methods=['DELETE'])
@@ -186,25 +606,198 @@ def delete_paper(library_name, folder_name):
     
     import shutil
     shutil.rmtree(folder_path)
+    catalog.remove_paper(secure_filename(library_name), folder_name)
+    search_index.remove_paper(secure_filename(library_name), folder_name)
+    schedule_blob_gc(folder_path)
     return jsonify({'success': True})
 
 
-# 向多个 PDF 提问 - 修改为使用新的文件结构
-@app.route('/api/ask', methods=['POST'])
-def ask_papers():
-    data = request.json
-    question = data.get('question')
-    library_name = data.get('library')
-    paper_folders = data.get('papers', [])  # 现在接收的是文件夹名而不是文件名
+def get_ask_passages(question, paper_folder, pdf_path, options):
+    """检索模式下返回要发给模型的相关文本块；应当发送整篇 PDF 时返回 None"""
+    if options.get('mode') != 'chunks' or needs_full_pdf(question):
+        return None
+    chunks = load_chunks(paper_folder)
+    if chunks is None:
+        # 导入时还没来得及预处理，现在补做
+        chunks = build_chunks(paper_folder, pdf_path)
+    if not chunks:
+        return None
+    top_k = max(1, min(int(options.get('top_k') or CHUNK_TOP_K), 50))
+    return select_chunks(question, chunks, top_k) or None
+
+def estimate_paper_tokens(question, paper_folder, paper_info, passages=None):
+    """估计向这篇论文提问消耗的 token 数，供调度器排队和计入配额"""
+    return estimate_tokens(
+        question,
+        pages=load_page_count(paper_folder),
+        pdf_size=paper_info.get('size'),
+        passages=passages,
+    )
+
+def paper_error(folder_name, message):
+    return {
+        'paper': folder_name,
+        'folder': folder_name,
+        'error': message,
+        'success': False
+    }
+
+def prepare_paper_question(question, library_path, folder_name, session_folder, options):
+    """提问前的准备：读取论文信息、按需检索文本块、查询回答缓存
+
+    返回 (上下文, 错误结果)，上下文的 response 不为 None 时表示命中了回答缓存。
+    """
+    paper_folder = os.path.join(library_path, folder_name)
+    if not os.path.exists(paper_folder):
+        print(f"Paper folder not found: {paper_folder}")
+        return None, paper_error(folder_name, 'Paper folder not found')
+    paper_info = get_paper_info(paper_folder)
+    pdf_path = paper_info.get('path')
+    pdf_basename = paper_info.get('entry_name')
+    with timed('ask.passages'):
+        passages = get_ask_passages(question, paper_folder, pdf_path, options)
+    # 两种模式的回答不同，分开缓存
+    cache_model = MODEL
+    if passages is not None:
+        cache_model += ':chunks:' + ','.join(str(p['id']) for p in passages)
+    response = None
+    if not options.get('no_cache'):
+        with timed('ask.cache_lookup'):
+            response = answer_cache.get(question, pdf_path, cache_model)
+    return {
+        'question': question,
+        'folder': folder_name,
+        'session': os.path.basename(session_folder),
+        'paper_info': paper_info,
+        'pdf_path': pdf_path,
+        # 保存回答
+        'answer_file': os.path.join(session_folder, f"{pdf_basename}_response.md"),
+        'passages': passages,
+        'cache_model': cache_model,
+        'response': response,
+        'cost': None if response is not None else estimate_paper_tokens(
+            question, paper_folder, paper_info, passages
+        ),
+    }, None
+
+def finish_paper_question(context, response):
+    """保存回答并写入回答缓存，返回这篇论文的结果"""
+    cached = context['response'] is not None
+    with timed('ask.dump_response'):
+        reader.dump_response(response, context['answer_file'])
+    if not cached:
+        with timed('ask.cache_put'):
+            answer_cache.put(context['question'], context['pdf_path'], context['cache_model'], response)
+    return {
+        'paper': context['paper_info'].get('title'),
+        'folder': context['folder'],
+        'answer': response,
+        'answer_file': os.path.basename(context['answer_file']),
+        'mode': 'full' if context['passages'] is None else 'chunks',
+        # 写入回答缓存时使用的模型键，历史记录据此回填缓存
+        'cache_model': context['cache_model'],
+        'cached': cached,
+        'success': True
+    }
+
+def ask_single_paper(question, library_path, folder_name, session_folder, options=None, on_chunk=None):
+    """向单篇论文提问并把回答写入会话目录，失败只影响这一篇
+
+    options 是提问请求中的选项：no_cache 为真时跳过回答缓存的查询（新回答仍会写入缓存）；
+    mode 为 "chunks" 时只把本地检索出的 top_k 个相关文本块发给模型，
+    问到图表、公式等版面内容或论文没有可用文本时退回整篇 PDF。
+    提供 on_chunk 时使用流式生成，每收到一段文本就回调一次。
+    """
+    options = options or {}
+    try:
+        context, error = prepare_paper_question(
+            question, library_path, folder_name, session_folder, options
+        )
+        if error:
+            return error
+        response = context['response']
+        passages = context['passages']
+        pdf_path = context['pdf_path']
+        if response is not None:
+            if on_chunk is not None:
+                on_chunk(response)
+        else:
+            with timed('ask.wait_slot'):
+                slot_token = scheduler.acquire(context['session'], context['cost'])
+            try:
+                with timed('ask.model'):
+                    if passages is not None:
+                        response = reader.ask_text(question, passages)
+                        if on_chunk is not None:
+                            on_chunk(response)
+                    elif on_chunk is None:
+                        response = reader.ask_pdf(question, pdf_path)
+                    else:
+                        parts = []
+                        for text in reader.ask_pdf_stream(question, pdf_path):
+                            parts.append(text)
+                            on_chunk(text)
+                        response = ''.join(parts)
+            finally:
+                scheduler.release(slot_token)
+        return finish_paper_question(context, response)
+    except Exception as e:
+        return paper_error(folder_name, str(e))
+
+def get_ask_library_path(data):
+    """校验提问请求，返回 (文献库路径, 错误响应)，错误响应不依赖 Flask，异步服务也可以直接返回"""
+    if not data.get('question'):
+        return None, ({'error': 'Question is required'}, 400)
     
-    if not question:
-        return jsonify({'error': 'Question is required'}), 400
+    error = check_ask_int_options(data)
+    if error:
+        return None, error
     
-    library_path = os.path.join(LIBRARY_ROOT, library_name)
+    library_path = os.path.join(LIBRARY_ROOT, data.get('library') or '')
     library_path = os.path.abspath(library_path)
-    if not os.path.exists(library_path):
-        return jsonify({'error': 'Library not found'}), 404
-    
+    if not data.get('library') or not os.path.exists(library_path):
+        return None, ({'error': 'Library not found'}, 404)
+    return library_path, None
+
+# 提问请求中的整数选项，不传或为 0 时使用默认值
+ASK_INT_OPTIONS = ('max_workers', 'top_k', 'top_n', 'questions_per_call')
+
+def check_ask_int_options(data):
+    """整数选项不是非负整数时返回 400 错误响应，否则返回 None"""
+    for name in ASK_INT_OPTIONS:
+        value = data.get(name)
+        if value is None or value == '':
+            continue
+        try:
+            number = int(value)
+        except (TypeError, ValueError):
+            number = -1
+        if number < 0 or isinstance(value, float) and not value.is_integer():
+            return {'error': f'{name} must be a non-negative integer'}, 400
+    return None
+
+def select_ask_papers(data):
+    """确定要提问的论文
+
+    指定 top_n 时按问题检索文献库，只保留得分最高的 top_n 篇；同时给出 papers 时只在其中挑选。
+    """
+    paper_folders = data.get('papers', [])
+    top_n = data.get('top_n')
+    if not top_n:
+        return paper_folders
+    library_name = data['library']
+    sync_search_index(library_name)
+    candidates = set(paper_folders) if paper_folders else None
+    results = search_index.search(library_name, data['question'], int(top_n), folders=candidates)
+    return [folder_name for folder_name, _, _ in results]
+
+def get_ask_pool_size(data, paper_count):
+    # 请求可以要求更低的并发度，但不能超过配置上限
+    max_workers = min(int(data.get('max_workers') or ASK_MAX_WORKERS), ASK_MAX_WORKERS)
+    return max(1, min(max_workers, paper_count))
+
+def create_session(library_name, question):
+    """创建会话目录并保存问题，返回 (会话 ID, 会话目录)"""
     # 生成包含时间戳的唯一会话 ID
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     session_id = f"{library_name}_{timestamp}"
@@ -214,52 +807,76 @@ def ask_papers():
     # 保存问题
     with open(os.path.join(session_folder, 'question.txt'), 'w', encoding='utf-8') as f:
         f.write(question)
-    
-    # 对每个 PDF 提问并保存回答
-    responses = []
-    for folder_name in paper_folders:
-        paper_folder = os.path.join(library_path, folder_name)
-        if os.path.exists(paper_folder):
-            try:
-                paper_info = get_paper_info(paper_folder)
-                pdf_path = paper_info.get('path')
-                pdf_basename = paper_info.get('entry_name')
-                # 保存回答
-                answer_file = os.path.join(session_folder, f"{pdf_basename}_response.md")
-                response = reader.ask_pdf(question, pdf_path)
-                reader.dump_response(response, answer_file)
-                
-                responses.append({
-                    'paper': paper_info.get('title'),
-                    'answer': response,
-                    'success': True
-                })
-            except Exception as e:
-                responses.append({
-                    'paper': folder_name,
-                    'error': str(e),
-                    'success': False
-                })
-        else:
-            print(f"Paper folder not found: {paper_folder}")
-            responses.append({
-                'paper': folder_name,
-                'error': 'Paper folder not found',
-                'success': False
-            })
-    
+    return session_id, session_folder
+
+def save_session_metadata(session_id, session_folder, question, library_name, paper_folders, responses):
     # 保存会话元数据
     metadata = {
         'id': session_id,
         'question': question,
         'library': library_name,
+        'model': MODEL,
         'papers': paper_folders,  # 保存文件夹名称
         'timestamp': datetime.now().isoformat(),
-        'responses': [r['success'] for r in responses]
+        'responses': [r['success'] for r in responses],
+        # 记录每篇论文的回答文件名，查看详情时不必再猜测
+        'answer_files': [r.get('answer_file') for r in responses],
+        # 每篇论文的回答缓存键中的模型部分，检索模式的回答与整篇 PDF 的回答分开
+        'cache_models': [r.get('cache_model') for r in responses],
     }
     
     with open(os.path.join(session_folder, 'metadata.json'), 'w', encoding='utf-8') as f:
         json.dump(metadata, f, ensure_ascii=False, indent=2)
+    history_index.add_session(metadata, metadata['answer_files'])
+    return metadata
+
+def submit_ask_job(data, paper_folders):
+    """把提问作为后台任务提交，返回 202 响应"""
+    job = job_manager.submit('ask', {
+        'question': data.get('question'),
+        'library': data.get('library'),
+        'papers': paper_folders,
+        'no_cache': data.get('no_cache', False),
+        'max_workers': data.get('max_workers'),
+        'mode': data.get('mode'),
+        'top_k': data.get('top_k'),
+    })
+    return {'job_id': job['id'], 'status': job['status']}, 202
+
+# 向多个 PDF 提问 - 修改为使用新的文件结构
+@app.route('/api/ask', methods=['POST'])
+def ask_papers():
+    data = request.json
+    question = data.get('question')
+    library_name = data.get('library')
+    
+    library_path, error = get_ask_library_path(data)
+    if error:
+        return error
+    paper_folders = select_ask_papers(data)  # 现在接收的是文件夹名而不是文件名
+    
+    if data.get('async'):
+        return submit_ask_job(data, paper_folders)
+    
+    session_id, session_folder = create_session(library_name, question)
+    
+    # 并发地对每个 PDF 提问并保存回答，结果按输入顺序返回
+    responses = []
+    if paper_folders:
+        max_workers = get_ask_pool_size(data, len(paper_folders))
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ask') as pool:
+            futures = [
+                pool.submit(
+                    metrics.bind(ask_single_paper),
+                    question, library_path, folder_name, session_folder, data
+                )
+                for folder_name in paper_folders
+            ]
+            responses = [future.result() for future in futures]
+    
+    metadata = save_session_metadata(
+        session_id, session_folder, question, library_name, paper_folders, responses
+    )
     
     return jsonify({
         'session_id': session_id,
@@ -267,49 +884,270 @@ def ask_papers():
         'metadata': metadata
     })
 
+def format_sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+# 流式提问：每篇论文的回答逐段推送，某篇完成时立即推送结果，最后推送会话元数据
+@app.route('/api/ask/stream', methods=['POST'])
+def ask_papers_stream():
+    data = request.json
+    question = data.get('question')
+    library_name = data.get('library')
+    
+    library_path, error = get_ask_library_path(data)
+    if error:
+        return error
+    paper_folders = select_ask_papers(data)
+    
+    session_id, session_folder = create_session(library_name, question)
+    max_workers = get_ask_pool_size(data, len(paper_folders))
+    # 响应体在视图返回后才生成，需要显式带上本次请求的 trace
+    trace = metrics.current_trace()
+    
+    def generate():
+        events = queue.Queue()
+        
+        def ask_and_report(index, folder_name):
+            def on_chunk(text):
+                events.put(('chunk', {'index': index, 'folder': folder_name, 'text': text}))
+            result = ask_single_paper(
+                question, library_path, folder_name, session_folder, data, on_chunk
+            )
+            events.put(('paper', {'index': index, 'folder': folder_name, **result}))
+            return result
+        
+        yield format_sse('session', {'session_id': session_id, 'papers': paper_folders})
+        
+        pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ask-stream')
+        try:
+            futures = [
+                pool.submit(metrics.bind(ask_and_report, trace), index, folder_name)
+                for index, folder_name in enumerate(paper_folders)
+            ]
+            finished = 0
+            while finished < len(futures):
+                event, payload = events.get()
+                if event == 'paper':
+                    finished += 1
+                yield format_sse(event, payload)
+        finally:
+            # 客户端中途断开时不再开始排队中的论文
+            pool.shutdown(wait=False, cancel_futures=True)
+        
+        responses = [future.result() for future in futures]
+        metadata = save_session_metadata(
+            session_id, session_folder, question, library_name, paper_folders, responses
+        )
+        yield format_sse('done', {'session_id': session_id, 'metadata': metadata})
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+def ask_paper_matrix(questions, library_path, folder_name, options, session=None):
+    """对一篇论文回答全部问题：PDF 只上传一次，多个问题合并进同一次结构化生成
+
+    session 用于调度器在并发的任务之间公平分配配额。
+    """
+    paper_folder = os.path.join(library_path, folder_name)
+    if not os.path.exists(paper_folder):
+        return {'title': folder_name, 'answers': [None] * len(questions), 'error': 'Paper folder not found'}
+    try:
+        paper_info = get_paper_info(paper_folder)
+        pdf_path = paper_info.get('path')
+        # 合并生成的回答与单独提问的回答不同，分开缓存
+        cache_model = MODEL + ':matrix'
+        answers = [None] * len(questions)
+        if not options.get('no_cache'):
+            answers = [answer_cache.get(question, pdf_path, cache_model) for question in questions]
+        missing = [i for i, answer in enumerate(answers) if answer is None]
+        per_call = max(1, int(options.get('questions_per_call') or MATRIX_QUESTIONS_PER_CALL))
+        error = None
+        for start in range(0, len(missing), per_call):
+            group = missing[start:start + per_call]
+            group_questions = [questions[i] for i in group]
+            # 合并回答时每个问题各有一份输出
+            cost = estimate_paper_tokens('\n'.join(group_questions), paper_folder, paper_info)
+            cost += OUTPUT_TOKENS * (len(group) - 1)
+            try:
+                with scheduler.slot(session or folder_name, cost):
+                    batch_answers = reader.ask_pdf_batch(group_questions, pdf_path)
+            except Exception as e:
+                # 一组失败不影响其他组，已有的回答照常返回
+                error = str(e)
+                continue
+            for i, answer in zip(group, batch_answers):
+                if answer is not None:
+                    answers[i] = answer
+                    answer_cache.put(questions[i], pdf_path, cache_model, answer)
+        return {'title': paper_info.get('title'), 'answers': answers, 'error': error}
+    except Exception as e:
+        return {'title': folder_name, 'answers': [None] * len(questions), 'error': str(e)}
+
+# 问题矩阵：多个问题 × 多篇论文，作为后台任务执行
+@app.route('/api/ask/matrix', methods=['POST'])
+def ask_matrix():
+    data = request.json
+    questions = [q for q in data.get('questions', []) if q and q.strip()]
+    if not questions:
+        return jsonify({'error': 'Questions are required'}), 400
+    
+    _, error = get_ask_library_path({**data, 'question': questions[0]})
+    if error:
+        return error
+    paper_folders = select_ask_papers({**data, 'question': '\n'.join(questions)})
+    if not paper_folders:
+        return jsonify({'error': 'Papers are required'}), 400
+    
+    job = job_manager.submit('matrix', {
+        'questions': questions,
+        'library': data['library'],
+        'papers': paper_folders,
+        'no_cache': data.get('no_cache', False),
+        'max_workers': data.get('max_workers'),
+        'questions_per_call': data.get('questions_per_call'),
+    })
+    return jsonify({'job_id': job['id'], 'matrix_id': job['id'], 'status': job['status']}), 202
+
+# 导出问题矩阵：format=json（默认）、csv（行为问题、列为论文）或 jsonl（每个单元格一行）
+@app.route('/api/ask/matrix/<matrix_id>', methods=['GET'])
+def get_matrix(matrix_id):
+    matrix_file = os.path.join(MATRIX_FOLDER, f"{secure_filename(matrix_id)}.json")
+    if not os.path.exists(matrix_file):
+        return jsonify({'error': 'Matrix not found'}), 404
+    with open(matrix_file, 'r', encoding='utf-8') as f:
+        matrix = json.load(f)
+    
+    export_format = request.args.get('format', 'json')
+    if export_format == 'csv':
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(['question'] + [paper['title'] for paper in matrix['papers']])
+        for question, row in zip(matrix['questions'], matrix['answers']):
+            writer.writerow([question] + [answer or '' for answer in row])
+        return Response(output.getvalue(), mimetype='text/csv', headers={
+            'Content-Disposition': f'attachment; filename={matrix["id"]}.csv'
+        })
+    if export_format == 'jsonl':
+        lines = []
+        for question, row in zip(matrix['questions'], matrix['answers']):
+            for paper, answer in zip(matrix['papers'], row):
+                lines.append(json.dumps({
+                    'question': question,
+                    'paper': paper['folder'],
+                    'title': paper['title'],
+                    'answer': answer,
+                }, ensure_ascii=False))
+        return Response('\n'.join(lines) + '\n', mimetype='application/x-ndjson', headers={
+            'Content-Disposition': f'attachment; filename={matrix["id"]}.jsonl'
+        })
+    return jsonify(matrix)
+
+# 回答缓存的命中统计
+@app.route('/api/cache/answers', methods=['GET'])
+def get_answer_cache_stats():
+    return jsonify(answer_cache.stats())
+
+# arXiv 元数据缓存的条目数
+@app.route('/api/cache/arxiv', methods=['GET'])
+def get_arxiv_cache_stats():
+    return jsonify(arxiv_metadata.stats())
+
+# 论文搜索缓存的命中统计
+@app.route('/api/cache/searches', methods=['GET'])
+def get_search_cache_stats():
+    return jsonify(search_cache.stats())
+
+# GitHub README 缓存的条目数
+@app.route('/api/cache/readmes', methods=['GET'])
+def get_readme_cache_stats():
+    return jsonify(readme_cache.stats())
+
+# 本地 arXiv 标题索引的规模
+@app.route('/api/cache/titles', methods=['GET'])
+def get_title_index_stats():
+    if title_index is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **title_index.stats()})
+
+# 用历史会话中已有的回答填充回答缓存
+@app.route('/api/cache/answers/seed', methods=['POST'])
+def seed_answer_cache():
+    def resolve_paper(library_name, folder_name):
+        if not library_name:
+            return None
+        paper_folder = os.path.join(LIBRARY_ROOT, secure_filename(library_name), folder_name)
+        try:
+            paper_info = get_paper_info(paper_folder)
+        except (OSError, ValueError):
+            return None
+        return paper_info['path'], paper_info.get('entry_name')
+    
+    seeded = answer_cache.seed_from_history(HISTORY_FOLDER, resolve_paper, MODEL)
+    return jsonify({'seeded': seeded, **answer_cache.stats()})
+
+# 模型调用调度器的排队情况
+@app.route('/api/scheduler', methods=['GET'])
+def get_scheduler_stats():
+    return jsonify(scheduler.stats())
+
 # 获取历史问答记录和历史会话详情方法不需要修改
 
 # 继续保留原有的历史问答相关方法
+def parse_history_limit(value):
+    """解析分页大小：不传时返回 None（全部），非正整数抛出 ValueError，超过上限时按上限返回"""
+    if value is None or value == '':
+        return None
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError(f"Invalid limit: {value}")
+    if limit < 1:
+        raise ValueError(f"Invalid limit: {value}")
+    return min(limit, HISTORY_MAX_LIMIT)
+
 @app.route('/api/history', methods=['GET'])
 def get_history():
-    history_folders = glob.glob(os.path.join(HISTORY_FOLDER, '*'))
-    history = []
-    
-    for folder in history_folders:
-        metadata_file = os.path.join(folder, 'metadata.json')
-        if os.path.exists(metadata_file):
-            with open(metadata_file, 'r', encoding='utf-8') as f:
-                try:
-                    metadata = json.load(f)
-                    history.append(metadata)
-                except:
-                    pass
-    
-    # 按时间戳排序
-    history.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-    return jsonify(history)
+    # 支持 ?library=&paper=&since=&until=&q=&limit=&cursor=，不传 limit 时返回全部
+    # 还有更多结果时，下一页的游标通过 X-Next-Cursor 头返回
+    try:
+        with timed('history.list_sessions'):
+            history, next_cursor = history_index.list_sessions(
+                cursor=request.args.get('cursor'),
+                limit=parse_history_limit(request.args.get('limit')),
+                library=request.args.get('library'),
+                paper=request.args.get('paper'),
+                since=request.args.get('since'),
+                until=request.args.get('until'),
+                query=request.args.get('q'),
+            )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    response = jsonify(history)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
 
 # 获取特定历史会话详情
 @app.route('/api/history/<session_id>', methods=['GET'])
 def get_history_detail(session_id):
-    session_folder = os.path.join(HISTORY_FOLDER, secure_filename(session_id))
-    if not os.path.exists(session_folder):
+    session_id = secure_filename(session_id)
+    session = history_index.get_session(session_id)
+    if session is None:
         return jsonify({'error': 'Session not found'}), 404
-    
-    metadata_file = os.path.join(session_folder, 'metadata.json')
-    with open(metadata_file, 'r', encoding='utf-8') as f:
-        metadata = json.load(f)
+    metadata, papers = session
+    session_folder = os.path.join(HISTORY_FOLDER, session_id)
     
     # 读取每个回答文件
     responses = []
-    for paper in metadata.get('papers', []):
-        # 查找与该paper对应的响应文件
-        # 假设PDF名称格式为paper名+.pdf
-        pdf_basename = os.path.splitext(paper)[0]
-        answer_file = os.path.join(session_folder, f"{pdf_basename}_response.md")
-        
-        if os.path.exists(answer_file):
-            with open(answer_file, 'r', encoding='utf-8') as f:
+    for paper, answer_file in papers:
+        if answer_file is None:
+            continue
+        answer_path = os.path.join(session_folder, answer_file)
+        if os.path.exists(answer_path):
+            with open(answer_path, 'r', encoding='utf-8') as f:
                 response = f.read()
             responses.append({
                 'paper': paper,
@@ -321,5 +1159,176 @@ def get_history_detail(session_id):
         'responses': responses
     })
 
+# ==================== 后台任务 ====================
+def run_ask_job(job):
+    """后台提问任务，每完成一篇论文保存一次断点，重启后只处理剩余论文"""
+    params = job.params
+    question = params['question']
+    library_name = params['library']
+    paper_folders = params.get('papers', [])
+    library_path = os.path.abspath(os.path.join(LIBRARY_ROOT, library_name))
+    
+    if 'session_id' not in job.state:
+        session_id, _ = create_session(library_name, question)
+        job.checkpoint(session_id=session_id, responses={}, done=0, total=len(paper_folders))
+    session_id = job.state['session_id']
+    session_folder = os.path.join(HISTORY_FOLDER, session_id)
+    # 断点中的回答以输入序号为键（JSON 的键只能是字符串）
+    finished = dict(job.state.get('responses', {}))
+    pending = [(i, f) for i, f in enumerate(paper_folders) if str(i) not in finished]
+    
+    if pending:
+        pool = ThreadPoolExecutor(
+            max_workers=get_ask_pool_size(params, len(pending)), thread_name_prefix='ask-job'
+        )
+        try:
+            futures = {
+                pool.submit(
+                    ask_single_paper, question, library_path, folder_name, session_folder, params
+                ): index
+                for index, folder_name in pending
+            }
+            for future in as_completed(futures):
+                index = str(futures[future])
+                finished[index] = future.result()
+                job.add_item('responses', index, finished[index], done=len(finished))
+                job.check_cancelled()
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+    
+    responses = [finished[str(i)] for i in range(len(paper_folders))]
+    metadata = save_session_metadata(
+        session_id, session_folder, question, library_name, paper_folders, responses
+    )
+    return {'session_id': session_id, 'responses': responses, 'metadata': metadata}
+
+def run_import_job(job):
+    """后台导入任务，按批导入论文，每批完成后保存断点
+
+    批内每个输入行的进度记录在导入清单中（import_id 即任务 ID），任务中断后重新执行时跳过已完成的行。
+    """
+    library_path = os.path.join(LIBRARY_ROOT, job.params['library'])
+    paper_descs = job.params['paper_descs']
+    next_index = job.state.get('next_index', 0)
+    # 每批新增的论文按批的起始位置分别保存，保存断点时不重写之前的批次
+    added_batches = job.state.get('added_batches', {})
+    added = [paper for start in sorted(added_batches, key=int) for paper in added_batches[start]]
+    job.checkpoint(done=next_index, total=len(paper_descs))
+    # 先登记所有输入行，进度接口从一开始就能给出总数
+    import_manifest.begin(job.id, job.params['library'], clean_paper_descs(paper_descs))
+    
+    try:
+        while next_index < len(paper_descs):
+            job.check_cancelled()
+            batch = paper_descs[next_index:next_index + JOB_IMPORT_BATCH]
+            batch_added = import_papers(
+                batch, library_path, blob_store, arxiv_metadata, search_cache, readme_cache,
+                title_index, import_manifest, job.id,
+            )
+            added.extend(batch_added)
+            finish_import(job.params['library'], batch_added)
+            job.add_item(
+                'added_batches', str(next_index), batch_added,
+                done=next_index + len(batch), next_index=next_index + len(batch),
+            )
+            next_index += len(batch)
+    except JobCancelled:
+        import_manifest.finish(job.id, 'cancelled')
+        raise
+    except Exception:
+        import_manifest.finish(job.id, 'failed')
+        raise
+    import_manifest.finish(job.id)
+    return import_result(job.id, added)
+
+def run_matrix_job(job):
+    """后台问题矩阵任务，每完成一篇论文保存一次断点，结果保存到 MATRIX_FOLDER"""
+    params = job.params
+    questions = params['questions']
+    paper_folders = params['papers']
+    library_path = os.path.abspath(os.path.join(LIBRARY_ROOT, params['library']))
+    finished = dict(job.state.get('papers', {}))
+    job.checkpoint(done=len(finished), total=len(paper_folders))
+    pending = [f for f in paper_folders if f not in finished]
+    
+    if pending:
+        pool = ThreadPoolExecutor(
+            max_workers=get_ask_pool_size(params, len(pending)), thread_name_prefix='matrix-job'
+        )
+        try:
+            futures = {
+                pool.submit(
+                    ask_paper_matrix, questions, library_path, folder_name, params, job.id
+                ): folder_name
+                for folder_name in pending
+            }
+            for future in as_completed(futures):
+                folder_name = futures[future]
+                finished[folder_name] = future.result()
+                job.add_item('papers', folder_name, finished[folder_name], done=len(finished))
+                job.check_cancelled()
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+    
+    # answers[i][j] 是第 i 个问题对第 j 篇论文的回答
+    matrix = {
+        'id': job.id,
+        'library': params['library'],
+        'model': MODEL,
+        'questions': questions,
+        'papers': [
+            {'folder': f, 'title': finished[f]['title'], 'error': finished[f]['error']}
+            for f in paper_folders
+        ],
+        'answers': [
+            [finished[f]['answers'][i] for f in paper_folders] for i in range(len(questions))
+        ],
+        'timestamp': datetime.now().isoformat(),
+    }
+    with open(os.path.join(MATRIX_FOLDER, f"{job.id}.json"), 'w', encoding='utf-8') as f:
+        json.dump(matrix, f, ensure_ascii=False, indent=2)
+    return {'matrix_id': job.id, 'questions': len(questions), 'papers': len(paper_folders)}
+
+job_manager.register('ask', run_ask_job)
+job_manager.register('matrix', run_matrix_job)
+job_manager.register('import', run_import_job)
+# debug 模式下 reloader 的父进程不处理请求，只在真正服务的进程中启动任务线程
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    return jsonify(job_manager.list())
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    job.pop('state', None)
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/progress', methods=['GET'])
+def get_job_progress(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({'id': job['id'], 'status': job['status'], **job['progress']})
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+# Prometheus 格式的指标：各阶段耗时、模型 token 用量和接口延迟
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # 调试模式下 Flask 会另起一个重载子进程处理请求，后台任务只在该子进程中运行
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        job_manager.start()
+    try:
+        app.run(debug=True, host='0.0.0.0', port=5000)
+    finally:
+        job_manager.stop(timeout=JOB_STOP_TIMEOUT)
\ No newline at end of file
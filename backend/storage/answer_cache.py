@@ -0,0 +1,175 @@
+import os
+import re
+import json
+import glob
+import time
+import hashlib
+import threading
+
+from storage.hashing import file_sha256
+from storage.sqlite_store import SQLiteStore
+
+
+def normalize_question(question):
+    """去掉缩进、空行和多余空白，让排版不同的同一问题命中同一条缓存"""
+    lines = (re.sub(r"\s+", " ", line).strip() for line in question.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def make_answer_key(question, pdf_sha256, model):
+    raw = "\0".join([normalize_question(question), pdf_sha256, model])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AnswerCache(SQLiteStore):
+    """按 (规范化问题, PDF 内容哈希, 模型) 持久化缓存模型回答
+
+    超过 max_age 秒的条目会被淘汰；总大小超过 max_bytes 时按最近访问时间淘汰最旧的条目。
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS answers (
+        key TEXT PRIMARY KEY,
+        question TEXT NOT NULL,
+        pdf_sha256 TEXT NOT NULL,
+        model TEXT NOT NULL,
+        answer TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        created REAL NOT NULL,
+        accessed REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS answers_accessed ON answers (accessed);
+    CREATE INDEX IF NOT EXISTS answers_created ON answers (created);
+    """
+
+    def __init__(self, db_path, max_bytes=200 * 1024 * 1024, max_age=30 * 24 * 3600):
+        super().__init__(db_path)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._counter_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _count(self, hit):
+        with self._counter_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, question, pdf_path, model):
+        """返回缓存的回答，未命中或已过期时返回 None"""
+        key = make_answer_key(question, file_sha256(pdf_path), model)
+        now = time.time()
+        with self.transaction() as conn:
+            row = conn.execute(
+                "SELECT answer, created FROM answers WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row["created"] > self.max_age:
+                conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+                row = None
+            if row is not None:
+                conn.execute("UPDATE answers SET accessed = ? WHERE key = ?", (now, key))
+        self._count(row is not None)
+        return row["answer"] if row is not None else None
+
+    def put(self, question, pdf_path, model, answer, created=None):
+        self.put_by_hash(question, file_sha256(pdf_path), model, answer, created)
+
+    def put_by_hash(self, question, pdf_sha256, model, answer, created=None):
+        now = time.time()
+        created = created or now
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO answers "
+                "(key, question, pdf_sha256, model, answer, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    make_answer_key(question, pdf_sha256, model),
+                    normalize_question(question),
+                    pdf_sha256,
+                    model,
+                    answer,
+                    len(answer.encode("utf-8")),
+                    created,
+                    now,
+                ),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM answers WHERE created < ?", (now - self.max_age,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM answers").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # 从最久未访问的条目开始删除，直到总大小回到上限以内
+        for row in conn.execute("SELECT key, size FROM answers ORDER BY accessed").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM answers WHERE key = ?", (row["key"],))
+            total -= row["size"]
+
+    def stats(self):
+        row = self.query_one("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM answers")
+        with self._counter_lock:
+            hits, misses = self.hits, self.misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "entries": row[0],
+            "size_bytes": row[1],
+        }
+
+    def seed_from_history(self, history_folder, resolve_paper, default_model):
+        """用历史会话中保存的回答填充缓存
+
+        resolve_paper(library, folder_name) 返回 (PDF 路径, 回答文件名前缀)，论文不存在时返回 None。
+        回答文件取会话记录的 answer_files；没有这一项的旧会话按 "<前缀>_response.md" 查找。
+        回答按会话记录的每篇论文的 cache_models 写入（检索模式的回答不会占用整篇 PDF 的键）；
+        没有这一项的旧会话按模型名写入，未保存模型名时视为 default_model。返回新写入的条目数。
+        """
+        seeded = 0
+        for metadata_file in glob.glob(os.path.join(history_folder, "*", "metadata.json")):
+            session_folder = os.path.dirname(metadata_file)
+            try:
+                with open(metadata_file, "r", encoding="utf-8") as f:
+                    metadata = json.load(f)
+            except (OSError, ValueError):
+                continue
+            question = metadata.get("question")
+            if not question:
+                continue
+            model = metadata.get("model", default_model)
+            created = os.path.getmtime(metadata_file)
+            successes = metadata.get("responses", [])
+            cache_models = metadata.get("cache_models")
+            answer_files = metadata.get("answer_files")
+            for index, folder_name in enumerate(metadata.get("papers", [])):
+                if index < len(successes) and not successes[index]:
+                    continue
+                if cache_models is not None:
+                    # 失败或未记录的论文没有对应的缓存键
+                    if index >= len(cache_models) or not cache_models[index]:
+                        continue
+                    paper_model = cache_models[index]
+                else:
+                    paper_model = model
+                resolved = resolve_paper(metadata.get("library"), folder_name)
+                if resolved is None:
+                    continue
+                pdf_path, pdf_basename = resolved
+                if answer_files is not None:
+                    answer_name = answer_files[index] if index < len(answer_files) else None
+                    if not answer_name:
+                        continue
+                else:
+                    answer_name = f"{pdf_basename}_response.md"
+                answer_file = os.path.join(session_folder, answer_name)
+                if not os.path.exists(answer_file) or not os.path.exists(pdf_path):
+                    continue
+                with open(answer_file, "r", encoding="utf-8") as f:
+                    answer = f.read()
+                if answer:
+                    self.put_by_hash(question, file_sha256(pdf_path), paper_model, answer, created)
+                    seeded += 1
+        return seeded
@@ -0,0 +1,71 @@
+import json
+import time
+
+from storage.sqlite_store import SQLiteStore
+
+
+class ArxivMetadataCache(SQLiteStore):
+    """按 arXiv ID（不含版本号）持久化论文元数据，重复导入时不再访问 arXiv"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS arxiv_metadata (
+        arxiv_id TEXT PRIMARY KEY,
+        version TEXT,
+        title TEXT NOT NULL,
+        authors TEXT NOT NULL,
+        abstract TEXT,
+        published TEXT,
+        updated TEXT,
+        fetched REAL NOT NULL
+    );
+    """
+
+    @staticmethod
+    def _to_record(row):
+        return {
+            "arxiv_id": row["arxiv_id"],
+            "version": row["version"],
+            "title": row["title"],
+            "authors": json.loads(row["authors"]),
+            "abstract": row["abstract"],
+            "published": row["published"],
+            "updated": row["updated"],
+        }
+
+    def get(self, arxiv_id):
+        return self.get_many([arxiv_id]).get(arxiv_id)
+
+    def get_many(self, arxiv_ids):
+        """返回 {arxiv_id: 元数据}，只包含已缓存的 ID"""
+        arxiv_ids = list(dict.fromkeys(arxiv_ids))
+        records = {}
+        # SQLite 对单条语句的参数个数有限制，分批查询
+        for i in range(0, len(arxiv_ids), 500):
+            batch = arxiv_ids[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            for row in self.query(
+                f"SELECT * FROM arxiv_metadata WHERE arxiv_id IN ({placeholders})", batch
+            ):
+                records[row["arxiv_id"]] = self._to_record(row)
+        return records
+
+    def put_many(self, records):
+        now = time.time()
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO arxiv_metadata "
+                "(arxiv_id, version, title, authors, abstract, published, updated, fetched) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        r["arxiv_id"], r.get("version"), r["title"],
+                        json.dumps(r.get("authors", []), ensure_ascii=False),
+                        r.get("abstract"), r.get("published"), r.get("updated"), now,
+                    )
+                    for r in records
+                ],
+            )
+
+    def stats(self):
+        row = self.query_one("SELECT COUNT(*) AS entries FROM arxiv_metadata")
+        return {"entries": row["entries"]}
@@ -0,0 +1,166 @@
+import os
+import time
+import shutil
+
+from storage.hashing import file_sha256
+from storage.sqlite_store import SQLiteStore
+
+
+class BlobStore(SQLiteStore):
+    """按内容哈希保存 PDF 的全局存储，arXiv ID 作为辅助索引
+
+    文献库中的 PDF 是指向这里的硬链接（跨文件系统时退化为复制），同一篇论文在多个
+    文献库中只占一份磁盘空间。每个引用 blob 的文献库文件都记录在 refs 表中，
+    复制出的文件不会增加链接数，因此 gc() 只删除 refs 中的文件都已不再是该 blob
+    （不存在、不是同一个 inode 且内容哈希不同），且没有其他硬链接的 blob。
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS blobs (
+        sha256 TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        arxiv_id TEXT,
+        created REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS blobs_arxiv_id ON blobs (arxiv_id);
+    CREATE TABLE IF NOT EXISTS refs (
+        path TEXT PRIMARY KEY,
+        sha256 TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS refs_sha256 ON refs (sha256);
+    """
+
+    def __init__(self, root):
+        os.makedirs(root, exist_ok=True)
+        super().__init__(os.path.join(root, "blobs.db"))
+        self.root = root
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, "sha256", digest[:2], f"{digest}.pdf")
+
+    def find_by_arxiv(self, arxiv_id):
+        """返回已存储的该 arXiv 论文的内容哈希，没有则返回 None"""
+        if not arxiv_id:
+            return None
+        row = self.query_one(
+            "SELECT sha256 FROM blobs WHERE arxiv_id = ? ORDER BY created DESC", (arxiv_id,)
+        )
+        if row is None or not os.path.exists(self.blob_path(row["sha256"])):
+            return None
+        return row["sha256"]
+
+    def add_file(self, path, arxiv_id=None, sha256=None):
+        """把文献库中的文件纳入存储并返回内容哈希
+
+        内容已存在时，path 会被替换为指向已有 blob 的硬链接，从而释放重复的副本。
+        写入时已经算过哈希的调用方可以传入 sha256，避免再读一遍文件。
+        """
+        digest = sha256 or file_sha256(path)
+        blob_path = self.blob_path(digest)
+        with self.transaction() as conn:
+            if os.path.exists(blob_path):
+                if not os.path.samefile(path, blob_path):
+                    self._replace_with_link(blob_path, path)
+            else:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                self._link_or_copy(path, blob_path)
+            row = conn.execute("SELECT arxiv_id FROM blobs WHERE sha256 = ?", (digest,)).fetchone()
+            if row is None:
+                conn.execute(
+                    "INSERT INTO blobs (sha256, size, arxiv_id, created) VALUES (?, ?, ?, ?)",
+                    (digest, os.path.getsize(blob_path), arxiv_id, time.time()),
+                )
+            elif arxiv_id and row["arxiv_id"] is None:
+                conn.execute(
+                    "UPDATE blobs SET arxiv_id = ? WHERE sha256 = ?", (arxiv_id, digest)
+                )
+            self._add_ref(conn, path, digest)
+        return digest
+
+    def link_into(self, digest, dest_path):
+        """把已有 blob 链接到文献库中的 dest_path，blob 不存在时返回 False"""
+        # 持有锁，避免与 gc() 同时进行时 blob 在链接前被删除
+        with self.transaction() as conn:
+            blob_path = self.blob_path(digest)
+            if not os.path.exists(blob_path):
+                return False
+            self._replace_with_link(blob_path, dest_path)
+            self._add_ref(conn, dest_path, digest)
+            return True
+
+    @staticmethod
+    def _add_ref(conn, path, digest):
+        conn.execute(
+            "INSERT OR REPLACE INTO refs (path, sha256) VALUES (?, ?)",
+            (os.path.abspath(path), digest),
+        )
+
+    @staticmethod
+    def _link_or_copy(src, dest):
+        try:
+            os.link(src, dest)
+        except OSError:
+            shutil.copyfile(src, dest)
+
+    def _replace_with_link(self, blob_path, dest_path):
+        tmp_path = dest_path + ".link"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        self._link_or_copy(blob_path, tmp_path)
+        os.replace(tmp_path, dest_path)
+
+    @staticmethod
+    def _is_live_ref(path, blob_path, size, digest):
+        """引用的文件仍然存在且仍是这个 blob：同一个 inode（硬链接），或内容相同的副本"""
+        try:
+            if os.path.samefile(path, blob_path):
+                return True
+            # 大小不同时不必计算哈希
+            if os.path.getsize(path) != size:
+                return False
+            return file_sha256(path) == digest
+        except FileNotFoundError:
+            return os.path.exists(path) and file_sha256(path) == digest
+
+    def gc(self, under=None):
+        """删除不再被任何文献库引用的 blob，返回删除的数量
+
+        传入 under 时只检查被该目录下的文件引用过的 blob，删除论文或文献库后只需检查这些。
+        """
+        removed = 0
+        with self.transaction() as conn:
+            if under is None:
+                rows = conn.execute("SELECT sha256, size FROM blobs").fetchall()
+            else:
+                prefix = os.path.join(os.path.abspath(under), "")
+                rows = conn.execute(
+                    "SELECT sha256, size FROM blobs WHERE sha256 IN "
+                    "(SELECT sha256 FROM refs WHERE substr(path, 1, ?) = ?)",
+                    (len(prefix), prefix),
+                ).fetchall()
+            for row in rows:
+                digest = row["sha256"]
+                blob_path = self.blob_path(digest)
+                refs = [
+                    ref["path"] for ref in
+                    conn.execute("SELECT path FROM refs WHERE sha256 = ?", (digest,)).fetchall()
+                ]
+                live = [
+                    path for path in refs if self._is_live_ref(path, blob_path, row["size"], digest)
+                ]
+                stale = [path for path in refs if path not in live]
+                conn.executemany(
+                    "DELETE FROM refs WHERE path = ? AND sha256 = ?",
+                    [(path, digest) for path in stale],
+                )
+                try:
+                    # 记录引用之前链接到文献库中的文件只能从链接数看出来
+                    linked = os.stat(blob_path).st_nlink > 1
+                except FileNotFoundError:
+                    linked = False
+                if not live and not linked:
+                    if os.path.exists(blob_path):
+                        os.remove(blob_path)
+                    conn.execute("DELETE FROM blobs WHERE sha256 = ?", (digest,))
+                    removed += 1
+        return removed
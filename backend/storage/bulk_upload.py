@@ -0,0 +1,300 @@
+"""批量上传：把多个 PDF 或 zip/tar 压缩包中的 PDF 流式写入文献库
+
+上传的文件和压缩包中的每个条目都按块写入暂存目录，写入的同时计算 sha256，
+不在内存中缓存整个文件；内容与文献库中已有论文相同的条目直接跳过。
+暂存目录应与文献库在同一文件系统上，写完后用 os.replace 移入论文文件夹。
+
+直接以请求体上传的 tar 边接收边解包；multipart 请求中的 tar 由 werkzeug 解析，
+只能先整体写入暂存文件再解包，和 zip 一样计入整次上传的总大小上限。
+"""
+import os
+import json
+import uuid
+import tarfile
+import zipfile
+import hashlib
+
+from werkzeug.utils import secure_filename
+
+CHUNK_SIZE = 1024 * 1024
+PDF_MAGIC = b"%PDF"
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+# 条目的处理结果
+ADDED = "added"
+DUPLICATE = "duplicate"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+class UploadRejected(Exception):
+    """单个条目无法加入文献库（过大、不是 PDF 等），记为失败后继续处理其他条目"""
+
+
+class UploadTooLarge(Exception):
+    """整次上传写入暂存目录的数据超过总大小上限，终止整个请求"""
+
+
+def archive_kind(filename):
+    """根据文件名判断压缩包类型，返回 "zip"、"tar" 或 None"""
+    name = (filename or "").lower()
+    if name.endswith(".zip"):
+        return "zip"
+    if name.endswith(TAR_SUFFIXES):
+        return "tar"
+    return None
+
+
+def is_pdf_name(filename):
+    return (filename or "").lower().endswith(".pdf")
+
+
+def is_hidden_member(name):
+    """macOS 压缩时附带的 __MACOSX/ 和 ._ 开头的资源文件"""
+    parts = name.replace("\\", "/").split("/")
+    return "__MACOSX" in parts or parts[-1].startswith(".")
+
+
+class HashingFile:
+    """写入暂存文件的同时计算 sha256，并记录开头的几个字节用于判断是否为 PDF
+
+    也可以作为 werkzeug 解析 multipart 请求时的 stream_factory 返回值，
+    解析完成后按普通文件读取（打开压缩包时需要 seek）。
+    超过 max_size 时不抛出异常（否则会中断整个 multipart 解析），而是记录 rejected
+    并丢弃后续数据，由调用方把这个条目记为失败。on_write 用于统计整次上传写入的字节数。
+    """
+
+    def __init__(self, path, max_size=None, on_write=None):
+        self.path = path
+        self.max_size = max_size
+        self.on_write = on_write
+        self.size = 0
+        self.head = b""
+        self.rejected = None
+        self._sha = hashlib.sha256()
+        self._file = open(path, "w+b")
+
+    def write(self, data):
+        self.size += len(data)
+        if self.rejected is not None:
+            return len(data)
+        if self.max_size is not None and self.size > self.max_size:
+            self.rejected = f"File exceeds {self.max_size // (1024 * 1024)} MB"
+            self._file.truncate(0)
+            return len(data)
+        if self.on_write is not None:
+            self.on_write(len(data))
+        if len(self.head) < len(PDF_MAGIC):
+            self.head += data[: len(PDF_MAGIC) - len(self.head)]
+        self._sha.update(data)
+        return self._file.write(data)
+
+    @property
+    def sha256(self):
+        return self._sha.hexdigest()
+
+    @property
+    def is_pdf(self):
+        return self.head == PDF_MAGIC
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self._file.seek(offset, whence)
+
+    def tell(self):
+        return self._file.tell()
+
+    def seekable(self):
+        return True
+
+    def readable(self):
+        return True
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def discard(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class BulkUpload:
+    """一次批量上传：逐个接收 PDF 或压缩包，把其中的 PDF 放入文献库并记录每个条目的结果
+
+    known 为文献库中已有论文的 {sha256: 文件夹名}，用于去重；
+    added 记录新建的论文文件夹，供调用方刷新索引和提取元数据。
+    max_files 只限制 PDF 条目数；max_total_size 限制写入暂存目录的总字节数
+    （上传的压缩包和从中解出的 PDF 都计入），超过时抛出 UploadTooLarge。
+    """
+
+    def __init__(self, library_path, staging_dir, blob_store=None, known=None,
+                 max_file_size=None, max_files=None, max_total_size=None):
+        self.library_path = library_path
+        self.staging_dir = staging_dir
+        self.blob_store = blob_store
+        self.known = dict(known or {})
+        self.max_file_size = max_file_size
+        self.max_files = max_files
+        self.max_total_size = max_total_size
+        self.total_size = 0
+        self.pdf_count = 0
+        self.results = []
+        self.added = []
+        self._staged = []
+        os.makedirs(staging_dir, exist_ok=True)
+
+    def stream_factory(self, total_content_length=None, content_type=None, filename=None,
+                       content_length=None):
+        """供 werkzeug 解析 multipart 时使用：每个文件字段直接写入暂存文件并计算哈希"""
+        # 压缩包本身不受单个 PDF 的大小限制
+        max_size = None if archive_kind(filename) else self.max_file_size
+        return self._stage(max_size)
+
+    def _stage(self, max_size):
+        staged = HashingFile(
+            os.path.join(self.staging_dir, f"{uuid.uuid4().hex}.part"), max_size, self._count_bytes
+        )
+        self._staged.append(staged)
+        return staged
+
+    def _count_bytes(self, size):
+        self.total_size += size
+        if self.max_total_size is not None and self.total_size > self.max_total_size:
+            raise UploadTooLarge(
+                f"Upload exceeds {self.max_total_size // (1024 * 1024)} MB in total"
+            )
+
+    def _record(self, name, status, **fields):
+        result = {"name": name, "status": status, **fields}
+        self.results.append(result)
+        return result
+
+    def add_upload(self, filename, stream):
+        """处理一个上传的文件：PDF 直接加入，压缩包逐个条目加入，其他类型跳过"""
+        kind = archive_kind(filename)
+        try:
+            if kind == "zip":
+                if not (hasattr(stream, "seekable") and stream.seekable()):
+                    # 直接读取请求体时先写入暂存文件
+                    stream = self._copy(stream, None)
+                self.add_zip(stream)
+            elif kind == "tar":
+                self.add_tar(stream)
+            elif is_pdf_name(filename):
+                self._check_limit()
+                if isinstance(stream, HashingFile) and stream.rejected:
+                    # multipart 解析时已超过单个 PDF 的大小上限，其他文件照常处理
+                    stream.discard()
+                    raise UploadRejected(stream.rejected)
+                if not isinstance(stream, HashingFile):
+                    stream = self._copy(stream, self.max_file_size)
+                self.add_staged(filename, stream)
+            else:
+                self._record(filename, SKIPPED, error="Unsupported file type")
+        except (UploadRejected, zipfile.BadZipFile, tarfile.TarError, OSError) as e:
+            self._record(filename, FAILED, error=str(e))
+
+    def add_zip(self, stream):
+        """zip 的目录在文件末尾，需要可以 seek 的文件（multipart 请求已写入暂存文件）"""
+        with zipfile.ZipFile(stream) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or is_hidden_member(info.filename):
+                    continue
+                with archive.open(info) as member:
+                    self._add_member(info.filename, member)
+
+    def add_tar(self, stream):
+        """以流模式读取 tar（可带 gzip/bz2/xz 压缩），不需要 seek，可以直接读取请求体"""
+        with tarfile.open(fileobj=stream, mode="r|*") as archive:
+            for info in archive:
+                if not info.isfile() or is_hidden_member(info.name):
+                    continue
+                self._add_member(info.name, archive.extractfile(info))
+
+    def _add_member(self, name, member):
+        if not is_pdf_name(name):
+            self._record(name, SKIPPED, error="Not a PDF")
+            return
+        self._check_limit()
+        try:
+            staged = self._copy(member, self.max_file_size)
+        except UploadRejected as e:
+            self._record(name, FAILED, error=str(e))
+            return
+        self.add_staged(name, staged)
+
+    def _check_limit(self):
+        """每个 PDF 条目处理前调用，跳过的非 PDF 文件不计入文件数上限"""
+        if self.max_files is not None and self.pdf_count >= self.max_files:
+            raise UploadRejected(f"Too many files, at most {self.max_files} per upload")
+        self.pdf_count += 1
+
+    def _copy(self, stream, max_size):
+        staged = self._stage(max_size)
+        try:
+            for block in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                staged.write(block)
+                if staged.rejected:
+                    break
+        except Exception:
+            staged.discard()
+            raise
+        if staged.rejected:
+            staged.discard()
+            raise UploadRejected(staged.rejected)
+        return staged
+
+    def add_staged(self, name, staged):
+        """把已写入暂存文件的 PDF 放入文献库，内容重复时删除暂存文件"""
+        staged.close()
+        if not staged.is_pdf:
+            staged.discard()
+            return self._record(name, FAILED, error="Not a PDF file")
+        digest = staged.sha256
+        if digest in self.known:
+            staged.discard()
+            return self._record(name, DUPLICATE, folder=self.known[digest], sha256=digest)
+
+        title = os.path.splitext(os.path.basename(name.replace("\\", "/")))[0]
+        folder_name = secure_filename(title)[:50] or digest[:12]
+        if os.path.exists(os.path.join(self.library_path, folder_name)):
+            # 同名但内容不同的论文，用哈希前缀区分
+            folder_name = f"{folder_name}_{digest[:8]}"
+        paper_folder = os.path.join(self.library_path, folder_name)
+        os.makedirs(paper_folder, exist_ok=True)
+        pdf_path = os.path.join(paper_folder, f"{folder_name}.pdf")
+        os.replace(staged.path, pdf_path)
+        if self.blob_store is not None:
+            self.blob_store.add_file(pdf_path, sha256=digest)
+
+        paper_info = {
+            "title": title,
+            "arxiv_url": None,
+            "github_repo": None,
+            "pdf_url": None,
+            "entry_name": folder_name,
+            "sha256": digest,
+        }
+        with open(os.path.join(paper_folder, "info.json"), "w", encoding="utf-8") as f:
+            json.dump(paper_info, f, ensure_ascii=False, indent=4)
+        self.known[digest] = folder_name
+        self.added.append(folder_name)
+        return self._record(name, ADDED, folder=folder_name, sha256=digest, size=staged.size)
+
+    def cleanup(self):
+        """删除没有放入文献库的暂存文件（压缩包本身、失败的条目）"""
+        for staged in self._staged:
+            staged.discard()
+        self._staged = []
+
+    def counts(self):
+        counts = {}
+        for result in self.results:
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+        return counts
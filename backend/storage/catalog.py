@@ -0,0 +1,201 @@
+import os
+import json
+
+from storage.sqlite_store import SQLiteStore
+
+# 允许排序的字段，防止把请求参数直接拼进 SQL
+SORT_FIELDS = {"title", "entry_name", "size", "added"}
+
+
+class LibraryCatalog(SQLiteStore):
+    """文献库和论文的持久化索引
+
+    写入接口（添加、上传、删除）会显式刷新索引；此外每次查询前会比较目录的修改时间，
+    只重新扫描发生过变化的文献库，以发现绕过接口直接改动磁盘的情况。
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS libraries (
+        name TEXT PRIMARY KEY,
+        created REAL NOT NULL,
+        mtime_ns INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS papers (
+        library TEXT NOT NULL,
+        folder TEXT NOT NULL,
+        title TEXT,
+        entry_name TEXT,
+        size INTEGER,
+        added REAL NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        info TEXT NOT NULL,
+        PRIMARY KEY (library, folder)
+    );
+    CREATE INDEX IF NOT EXISTS papers_title ON papers (library, title COLLATE NOCASE);
+    """
+
+    def __init__(self, db_path, library_root):
+        super().__init__(db_path)
+        self.library_root = library_root
+
+    def _library_path(self, name):
+        return os.path.join(self.library_root, name)
+
+    @staticmethod
+    def _paper_mtime_ns(folder):
+        # info.json 可能被原地改写而不改变目录的修改时间，所以两者都看
+        info_file = os.path.join(folder, "info.json")
+        return max(os.stat(folder).st_mtime_ns, os.stat(info_file).st_mtime_ns)
+
+    @staticmethod
+    def _read_paper(folder):
+        with open(os.path.join(folder, "info.json"), "r", encoding="utf-8") as f:
+            paper_info = json.load(f)
+        pdf_filename = paper_info.get("entry_name", os.path.basename(folder)) + ".pdf"
+        pdf_path = os.path.join(folder, pdf_filename)
+        return paper_info, os.path.getsize(pdf_path)
+
+    def _index_paper(self, conn, name, folder_name, mtime_ns=None):
+        folder = os.path.join(self._library_path(name), folder_name)
+        try:
+            if mtime_ns is None:
+                mtime_ns = self._paper_mtime_ns(folder)
+            paper_info, size = self._read_paper(folder)
+        except (OSError, ValueError) as e:
+            print(f"Error processing {folder}: {str(e)}")
+            conn.execute(
+                "DELETE FROM papers WHERE library = ? AND folder = ?", (name, folder_name)
+            )
+            return
+        conn.execute(
+            "INSERT OR REPLACE INTO papers "
+            "(library, folder, title, entry_name, size, added, mtime_ns, info) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                name,
+                folder_name,
+                paper_info.get("title"),
+                paper_info.get("entry_name", folder_name),
+                size,
+                os.path.getctime(folder),
+                mtime_ns,
+                json.dumps(paper_info, ensure_ascii=False),
+            ),
+        )
+
+    def _scan_library(self, conn, name):
+        """重新扫描一个文献库，只重新读取修改时间变化过的论文"""
+        library_path = self._library_path(name)
+        known = {
+            row["folder"]: row["mtime_ns"]
+            for row in conn.execute(
+                "SELECT folder, mtime_ns FROM papers WHERE library = ?", (name,)
+            )
+        }
+        seen = set()
+        for entry in os.scandir(library_path):
+            if not entry.is_dir() or not os.path.exists(os.path.join(entry.path, "info.json")):
+                continue
+            seen.add(entry.name)
+            try:
+                mtime_ns = self._paper_mtime_ns(entry.path)
+            except OSError:
+                continue
+            if known.get(entry.name) != mtime_ns:
+                self._index_paper(conn, name, entry.name, mtime_ns)
+        for folder_name in set(known) - seen:
+            conn.execute(
+                "DELETE FROM papers WHERE library = ? AND folder = ?", (name, folder_name)
+            )
+        conn.execute(
+            "INSERT OR REPLACE INTO libraries (name, created, mtime_ns) VALUES (?, ?, ?)",
+            (name, os.path.getctime(library_path), os.stat(library_path).st_mtime_ns),
+        )
+
+    def _remove_library(self, conn, name):
+        conn.execute("DELETE FROM papers WHERE library = ?", (name,))
+        conn.execute("DELETE FROM libraries WHERE name = ?", (name,))
+
+    def revalidate(self, name=None):
+        """对比磁盘上目录的修改时间，把变化同步到索引；name 为空时检查所有文献库"""
+        with self.transaction() as conn:
+            known = {
+                row["name"]: row["mtime_ns"]
+                for row in conn.execute("SELECT name, mtime_ns FROM libraries")
+            }
+            if name is None:
+                on_disk = {
+                    entry.name: entry.stat().st_mtime_ns
+                    for entry in os.scandir(self.library_root)
+                    if entry.is_dir()
+                }
+            else:
+                library_path = self._library_path(name)
+                on_disk = (
+                    {name: os.stat(library_path).st_mtime_ns}
+                    if os.path.isdir(library_path)
+                    else {}
+                )
+                known = {name: known[name]} if name in known else {}
+            for library_name in set(known) - set(on_disk):
+                self._remove_library(conn, library_name)
+            for library_name, mtime_ns in on_disk.items():
+                if known.get(library_name) != mtime_ns:
+                    self._scan_library(conn, library_name)
+
+    def refresh_library(self, name):
+        """强制重新扫描文献库（新建或导入论文之后调用）"""
+        with self.transaction() as conn:
+            if os.path.isdir(self._library_path(name)):
+                self._scan_library(conn, name)
+            else:
+                self._remove_library(conn, name)
+
+    def remove_library(self, name):
+        with self.transaction() as conn:
+            self._remove_library(conn, name)
+
+    def refresh_paper(self, name, folder_name):
+        with self.transaction() as conn:
+            self._index_paper(conn, name, folder_name)
+
+    def remove_paper(self, name, folder_name):
+        with self.transaction() as conn:
+            conn.execute(
+                "DELETE FROM papers WHERE library = ? AND folder = ?", (name, folder_name)
+            )
+
+    def list_libraries(self):
+        self.revalidate()
+        rows = self.query(
+            "SELECT l.name, l.created, COUNT(p.folder) AS count "
+            "FROM libraries l LEFT JOIN papers p ON p.library = l.name "
+            "GROUP BY l.name ORDER BY l.name"
+        )
+        return [
+            {"name": row["name"], "count": row["count"], "created": row["created"]}
+            for row in rows
+        ]
+
+    def list_papers(self, name, query=None, sort="title", order="asc", offset=0, limit=None):
+        """分页查询文献库中的论文，返回 (论文列表, 总数)"""
+        self.revalidate(name)
+        if sort not in SORT_FIELDS:
+            sort = "title"
+        direction = "DESC" if order == "desc" else "ASC"
+        where = "library = ?"
+        params = [name]
+        if query:
+            where += " AND title LIKE ? ESCAPE '\\'"
+            escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{escaped}%")
+        total = self.query_one(f"SELECT COUNT(*) FROM papers WHERE {where}", params)[0]
+        collate = " COLLATE NOCASE" if sort in ("title", "entry_name") else ""
+        sql = f"SELECT info, size FROM papers WHERE {where} ORDER BY {sort}{collate} {direction}, folder"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+        papers = [
+            {**json.loads(row["info"]), "size": row["size"]} for row in self.query(sql, params)
+        ]
+        return papers, total
@@ -0,0 +1,30 @@
+import os
+import hashlib
+import threading
+
+# 大文件反复计算哈希代价不小，按 (路径, 大小, 修改时间) 记住结果
+_MAX_MEMO_ENTRIES = 4096
+_memo = {}
+_memo_lock = threading.Lock()
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """计算文件内容的 sha256，文件未变化时直接返回记忆的结果"""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _memo_lock:
+        digest = _memo.get(key)
+    if digest is not None:
+        return digest
+
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            sha.update(block)
+    digest = sha.hexdigest()
+
+    with _memo_lock:
+        if len(_memo) >= _MAX_MEMO_ENTRIES:
+            _memo.clear()
+        _memo[key] = digest
+    return digest
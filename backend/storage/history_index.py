@@ -0,0 +1,207 @@
+import os
+import json
+import base64
+import sqlite3
+
+from storage.sqlite_store import SQLiteStore
+
+
+def _fts5_trigram_available():
+    # 中文问题没有空格分词，需要 trigram 分词器才能做子串检索（SQLite >= 3.34）
+    try:
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE VIRTUAL TABLE t USING fts5(x, tokenize='trigram')")
+        conn.close()
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def encode_cursor(timestamp, session_id):
+    raw = json.dumps([timestamp, session_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        timestamp, session_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return timestamp, session_id
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+class HistoryIndex(SQLiteStore):
+    """问答历史的索引，由提问接口在保存会话时增量写入
+
+    启动时 sync() 会补录磁盘上存在但尚未索引的旧会话，并移除已被删除的会话。
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        id TEXT PRIMARY KEY,
+        library TEXT,
+        question TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        metadata TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS sessions_timestamp ON sessions (timestamp, id);
+    CREATE INDEX IF NOT EXISTS sessions_library ON sessions (library, timestamp);
+    CREATE TABLE IF NOT EXISTS session_papers (
+        session_id TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        folder TEXT NOT NULL,
+        answer_file TEXT,
+        success INTEGER NOT NULL,
+        PRIMARY KEY (session_id, position)
+    );
+    CREATE INDEX IF NOT EXISTS session_papers_folder ON session_papers (folder);
+    """
+
+    def __init__(self, db_path):
+        super().__init__(db_path)
+        self.use_fts = _fts5_trigram_available()
+        if self.use_fts:
+            with self.transaction() as conn:
+                conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS sessions_fts "
+                    "USING fts5(id UNINDEXED, question, tokenize='trigram')"
+                )
+
+    def add_session(self, metadata, answer_files):
+        """索引一个会话；answer_files 与 metadata['papers'] 一一对应，失败的论文为 None"""
+        session_id = metadata["id"]
+        successes = metadata.get("responses", [])
+        with self.transaction() as conn:
+            self._delete(conn, session_id)
+            conn.execute(
+                "INSERT INTO sessions (id, library, question, timestamp, metadata) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    session_id,
+                    metadata.get("library"),
+                    metadata.get("question", ""),
+                    metadata.get("timestamp", ""),
+                    json.dumps(metadata, ensure_ascii=False),
+                ),
+            )
+            conn.executemany(
+                "INSERT INTO session_papers (session_id, position, folder, answer_file, success) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        session_id,
+                        position,
+                        folder,
+                        answer_files[position] if position < len(answer_files) else None,
+                        int(bool(successes[position])) if position < len(successes) else 0,
+                    )
+                    for position, folder in enumerate(metadata.get("papers", []))
+                ],
+            )
+            if self.use_fts:
+                conn.execute(
+                    "INSERT INTO sessions_fts (id, question) VALUES (?, ?)",
+                    (session_id, metadata.get("question", "")),
+                )
+
+    def _delete(self, conn, session_id):
+        conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        conn.execute("DELETE FROM session_papers WHERE session_id = ?", (session_id,))
+        if self.use_fts:
+            conn.execute("DELETE FROM sessions_fts WHERE id = ?", (session_id,))
+
+    def sync(self, history_folder):
+        """补录尚未索引的会话目录，移除磁盘上已不存在的会话，返回补录数量"""
+        on_disk = {
+            entry.name
+            for entry in os.scandir(history_folder)
+            if entry.is_dir() and os.path.exists(os.path.join(entry.path, "metadata.json"))
+        }
+        indexed = {row["id"] for row in self.query("SELECT id FROM sessions")}
+        with self.transaction() as conn:
+            for session_id in indexed - on_disk:
+                self._delete(conn, session_id)
+
+        added = 0
+        for session_id in sorted(on_disk - indexed):
+            session_folder = os.path.join(history_folder, session_id)
+            try:
+                with open(os.path.join(session_folder, "metadata.json"), "r", encoding="utf-8") as f:
+                    metadata = json.load(f)
+            except (OSError, ValueError):
+                continue
+            answer_files = metadata.get("answer_files")
+            if answer_files is None:
+                # 旧会话没有记录回答文件名，按 "<文件夹名>_response.md" 查找
+                answer_files = []
+                for paper in metadata.get("papers", []):
+                    answer_file = f"{os.path.splitext(paper)[0]}_response.md"
+                    exists = os.path.exists(os.path.join(session_folder, answer_file))
+                    answer_files.append(answer_file if exists else None)
+            self.add_session(metadata, answer_files)
+            added += 1
+        return added
+
+    def list_sessions(self, cursor=None, limit=None, library=None, paper=None,
+                      since=None, until=None, query=None):
+        """按时间倒序列出会话，返回 (元数据列表, 下一页游标)"""
+        where = []
+        params = []
+        if library:
+            where.append("s.library = ?")
+            params.append(library)
+        if paper:
+            where.append("s.id IN (SELECT session_id FROM session_papers WHERE folder = ?)")
+            params.append(paper)
+        if since:
+            where.append("s.timestamp >= ?")
+            params.append(since)
+        if until:
+            # 只给出日期时包含当天全部会话
+            where.append("s.timestamp <= ?")
+            params.append(until + "T23:59:59.999999" if len(until) == 10 else until)
+        if query:
+            # trigram 分词至少需要 3 个字符，更短的关键词退回到 LIKE
+            if self.use_fts and len(query) >= 3:
+                where.append("s.id IN (SELECT id FROM sessions_fts WHERE sessions_fts MATCH ?)")
+                params.append('"' + query.replace('"', '""') + '"')
+            else:
+                where.append("s.question LIKE ? ESCAPE '\\'")
+                escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                params.append(f"%{escaped}%")
+        if cursor:
+            timestamp, session_id = decode_cursor(cursor)
+            where.append("(s.timestamp < ? OR (s.timestamp = ? AND s.id < ?))")
+            params += [timestamp, timestamp, session_id]
+
+        if limit is not None and limit < 1:
+            raise ValueError(f"Invalid limit: {limit}")
+
+        sql = "SELECT s.id, s.timestamp, s.metadata FROM sessions s"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY s.timestamp DESC, s.id DESC"
+        if limit is not None:
+            # 多取一条用于判断是否还有下一页
+            sql += " LIMIT ?"
+            params.append(limit + 1)
+        rows = self.query(sql, params)
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            if rows:
+                next_cursor = encode_cursor(rows[-1]["timestamp"], rows[-1]["id"])
+        return [json.loads(row["metadata"]) for row in rows], next_cursor
+
+    def get_session(self, session_id):
+        """返回 (元数据, [(论文文件夹, 回答文件名)])，会话不存在时返回 None"""
+        row = self.query_one("SELECT metadata FROM sessions WHERE id = ?", (session_id,))
+        if row is None:
+            return None
+        papers = self.query(
+            "SELECT folder, answer_file FROM session_papers "
+            "WHERE session_id = ? ORDER BY position",
+            (session_id,),
+        )
+        return json.loads(row["metadata"]), [(p["folder"], p["answer_file"]) for p in papers]
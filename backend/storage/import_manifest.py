@@ -0,0 +1,129 @@
+import json
+import time
+
+from storage.sqlite_store import SQLiteStore
+
+# 条目状态
+PENDING = "pending"
+RESOLVED = "resolved"
+DONE = "done"
+EXISTS = "exists"
+FAILED = "failed"
+COMPLETED_STATUSES = {DONE, EXISTS, FAILED}
+
+
+class ImportManifest(SQLiteStore):
+    """按 (文献库, 输入行) 记录导入进度的清单
+
+    每个输入行完成一步就写一次断点：解析出的 arXiv 链接、导入后的文件夹名，或失败的阶段和原因。
+    再次导入同样的内容时，已完成的行直接跳过，已解析的行从下载开始。
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS imports (
+        id TEXT PRIMARY KEY,
+        library TEXT NOT NULL,
+        status TEXT NOT NULL,
+        started REAL NOT NULL,
+        finished REAL,
+        result TEXT
+    );
+    CREATE INDEX IF NOT EXISTS imports_library ON imports (library, started);
+    CREATE TABLE IF NOT EXISTS entries (
+        library TEXT NOT NULL,
+        desc TEXT NOT NULL,
+        import_id TEXT NOT NULL,
+        status TEXT NOT NULL,
+        arxiv_url TEXT,
+        summary TEXT,
+        entry_name TEXT,
+        stage TEXT,
+        error TEXT,
+        updated REAL NOT NULL,
+        PRIMARY KEY (library, desc)
+    );
+    CREATE INDEX IF NOT EXISTS entries_import ON entries (import_id);
+    """
+
+    def begin(self, import_id, library, descs):
+        """登记一次导入及其输入行，返回这些行已有的记录 {输入行: 记录}；可以重复调用以追加输入行"""
+        now = time.time()
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO imports (id, library, status, started) VALUES (?, ?, 'running', ?)",
+                (import_id, library, now),
+            )
+            conn.executemany(
+                "INSERT INTO entries (library, desc, import_id, status, updated) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (library, desc) DO UPDATE SET import_id = excluded.import_id",
+                [(library, desc, import_id, PENDING, now) for desc in descs],
+            )
+        return {desc: self.get(library, desc) for desc in descs}
+
+    def get(self, library, desc):
+        row = self.query_one("SELECT * FROM entries WHERE library = ? AND desc = ?", (library, desc))
+        return dict(row) if row is not None else None
+
+    def update(self, library, desc, status, **fields):
+        """保存一个输入行的断点，fields 可包含 arxiv_url、summary、entry_name、stage、error"""
+        columns = ["status", "updated"] + list(fields)
+        values = [status, time.time()] + list(fields.values())
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        with self.transaction() as conn:
+            conn.execute(
+                f"UPDATE entries SET {assignments} WHERE library = ? AND desc = ?",
+                values + [library, desc],
+            )
+
+    def finish(self, import_id, status="succeeded"):
+        """结束一次导入并保存当时的统计；之后重新导入同样的行时，这些行会归到新的导入下"""
+        result = self._summarize(import_id)
+        with self.transaction() as conn:
+            conn.execute(
+                "UPDATE imports SET status = ?, finished = ?, result = ? WHERE id = ?",
+                (status, time.time(), json.dumps(result, ensure_ascii=False), import_id),
+            )
+
+    def _summarize(self, import_id):
+        counts = {
+            r["status"]: r["count"]
+            for r in self.query(
+                "SELECT status, COUNT(*) AS count FROM entries WHERE import_id = ? GROUP BY status",
+                (import_id,),
+            )
+        }
+        failed = [
+            {"desc": r["desc"], "stage": r["stage"], "error": r["error"]}
+            for r in self.query(
+                "SELECT desc, stage, error FROM entries WHERE import_id = ? AND status = ?",
+                (import_id, FAILED),
+            )
+        ]
+        return {"counts": counts, "failed": failed}
+
+    def progress(self, import_id, include_entries=True):
+        """返回一次导入的状态、各状态的条目数和失败的条目；进行中的导入实时统计"""
+        row = self.query_one("SELECT * FROM imports WHERE id = ?", (import_id,))
+        if row is None:
+            return None
+        summary = json.loads(row["result"]) if row["result"] else self._summarize(import_id)
+        counts = summary["counts"]
+        result = {
+            "id": row["id"],
+            "library": row["library"],
+            "status": row["status"],
+            "started": row["started"],
+            "finished": row["finished"],
+            "total": sum(counts.values()),
+            "done": sum(counts.get(s, 0) for s in COMPLETED_STATUSES),
+            "counts": counts,
+        }
+        if include_entries:
+            result["failed"] = summary["failed"]
+        return result
+
+    def list_imports(self, library, limit=20):
+        rows = self.query(
+            "SELECT id FROM imports WHERE library = ? ORDER BY started DESC LIMIT ?", (library, limit)
+        )
+        return [self.progress(row["id"], include_entries=False) for row in rows]
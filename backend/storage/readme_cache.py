@@ -0,0 +1,54 @@
+import json
+import time
+
+from storage.sqlite_store import SQLiteStore
+
+
+class ReadmeCache(SQLiteStore):
+    """按 GitHub 仓库缓存 README 中找到的 arXiv 链接，以及用于条件请求的 ETag / Last-Modified
+
+    arxiv_urls 为 None 表示 README 存在但其中没有 arXiv 链接。
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS readmes (
+        repo TEXT PRIMARY KEY,
+        branch TEXT NOT NULL,
+        etag TEXT,
+        last_modified TEXT,
+        arxiv_urls TEXT,
+        checked REAL NOT NULL
+    );
+    """
+
+    def get(self, repo):
+        row = self.query_one("SELECT * FROM readmes WHERE repo = ?", (repo,))
+        if row is None:
+            return None
+        return {
+            "branch": row["branch"],
+            "etag": row["etag"],
+            "last_modified": row["last_modified"],
+            "arxiv_urls": json.loads(row["arxiv_urls"]) if row["arxiv_urls"] else None,
+            "checked": row["checked"],
+        }
+
+    def put(self, repo, branch, etag, last_modified, arxiv_urls):
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO readmes "
+                "(repo, branch, etag, last_modified, arxiv_urls, checked) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    repo, branch, etag, last_modified,
+                    json.dumps(arxiv_urls) if arxiv_urls else None, time.time(),
+                ),
+            )
+
+    def touch(self, repo):
+        """服务端确认 README 未变化时更新检查时间"""
+        with self.transaction() as conn:
+            conn.execute("UPDATE readmes SET checked = ? WHERE repo = ?", (time.time(), repo))
+
+    def stats(self):
+        row = self.query_one("SELECT COUNT(*), COALESCE(SUM(arxiv_urls IS NULL), 0) FROM readmes")
+        return {"entries": row[0], "without_arxiv": row[1]}
@@ -0,0 +1,97 @@
+import re
+import json
+import time
+import threading
+
+from storage.sqlite_store import SQLiteStore
+
+
+def normalize_query(query):
+    """忽略大小写和空白差异，让同一标题的不同写法命中同一条缓存"""
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+class SearchCache(SQLiteStore):
+    """持久化的论文搜索结果缓存，按 (规范化查询, 结果条数上限) 索引
+
+    有结果的条目保留 ttl 秒，没有结果的条目（负缓存）保留 negative_ttl 秒；
+    条目数超过 max_entries 时按最近访问时间淘汰最旧的条目。
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS searches (
+        query TEXT NOT NULL,
+        result_limit INTEGER NOT NULL,
+        results TEXT NOT NULL,
+        expires REAL NOT NULL,
+        accessed REAL NOT NULL,
+        PRIMARY KEY (query, result_limit)
+    );
+    CREATE INDEX IF NOT EXISTS searches_accessed ON searches (accessed);
+    """
+
+    def __init__(self, db_path, ttl=7 * 24 * 3600, negative_ttl=24 * 3600, max_entries=10000):
+        super().__init__(db_path)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._counter_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, query, limit=None):
+        """返回缓存的结果列表（可能为空列表），未命中或已过期时返回 None"""
+        key = (normalize_query(query), limit or 0)
+        now = time.time()
+        with self.transaction() as conn:
+            row = conn.execute(
+                "SELECT results, expires FROM searches WHERE query = ? AND result_limit = ?", key
+            ).fetchone()
+            if row is not None and row["expires"] <= now:
+                conn.execute("DELETE FROM searches WHERE query = ? AND result_limit = ?", key)
+                row = None
+            if row is not None:
+                conn.execute(
+                    "UPDATE searches SET accessed = ? WHERE query = ? AND result_limit = ?",
+                    (now, *key),
+                )
+        with self._counter_lock:
+            if row is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return json.loads(row["results"]) if row is not None else None
+
+    def put(self, query, results, limit=None):
+        now = time.time()
+        ttl = self.ttl if results else self.negative_ttl
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO searches (query, result_limit, results, expires, accessed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (normalize_query(query), limit or 0, json.dumps(results, ensure_ascii=False), now + ttl, now),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM searches WHERE expires <= ?", (now,))
+        count = conn.execute("SELECT COUNT(*) FROM searches").fetchone()[0]
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM searches WHERE rowid IN "
+                "(SELECT rowid FROM searches ORDER BY accessed LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def stats(self):
+        row = self.query_one(
+            "SELECT COUNT(*), COALESCE(SUM(results = '[]'), 0) FROM searches"
+        )
+        with self._counter_lock:
+            hits, misses = self.hits, self.misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "entries": row[0],
+            "negative_entries": row[1],
+        }
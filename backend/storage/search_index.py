@@ -0,0 +1,102 @@
+import math
+from collections import Counter
+
+from retrieval.bm25 import tokenize
+from storage.sqlite_store import SQLiteStore
+
+# 标题比摘要和正文更能说明论文主题，计算词频时重复计入
+TITLE_WEIGHT = 3
+SUMMARY_WEIGHT = 2
+
+
+class LibrarySearchIndex(SQLiteStore):
+    """按文献库划分的 BM25 倒排索引，覆盖标题、摘要和提取出的正文
+
+    论文导入并预处理后逐篇写入，不需要重建整个索引。
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS docs (
+        library TEXT NOT NULL,
+        folder TEXT NOT NULL,
+        title TEXT,
+        length INTEGER NOT NULL,
+        PRIMARY KEY (library, folder)
+    );
+    CREATE TABLE IF NOT EXISTS postings (
+        library TEXT NOT NULL,
+        term TEXT NOT NULL,
+        folder TEXT NOT NULL,
+        tf INTEGER NOT NULL,
+        PRIMARY KEY (library, term, folder)
+    );
+    CREATE INDEX IF NOT EXISTS postings_folder ON postings (library, folder);
+    """
+
+    def __init__(self, db_path, k1=1.5, b=0.75):
+        super().__init__(db_path)
+        self.k1 = k1
+        self.b = b
+
+    def index_paper(self, library, folder, title=None, summary=None, text=None):
+        term_freqs = Counter()
+        for _ in range(TITLE_WEIGHT):
+            term_freqs.update(tokenize(title))
+        for _ in range(SUMMARY_WEIGHT):
+            term_freqs.update(tokenize(summary))
+        term_freqs.update(tokenize(text))
+        with self.transaction() as conn:
+            self._remove(conn, library, folder)
+            conn.execute(
+                "INSERT INTO docs (library, folder, title, length) VALUES (?, ?, ?, ?)",
+                (library, folder, title, sum(term_freqs.values())),
+            )
+            conn.executemany(
+                "INSERT INTO postings (library, term, folder, tf) VALUES (?, ?, ?, ?)",
+                [(library, term, folder, tf) for term, tf in term_freqs.items()],
+            )
+
+    def _remove(self, conn, library, folder):
+        conn.execute("DELETE FROM docs WHERE library = ? AND folder = ?", (library, folder))
+        conn.execute("DELETE FROM postings WHERE library = ? AND folder = ?", (library, folder))
+
+    def remove_paper(self, library, folder):
+        with self.transaction() as conn:
+            self._remove(conn, library, folder)
+
+    def remove_library(self, library):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM docs WHERE library = ?", (library,))
+            conn.execute("DELETE FROM postings WHERE library = ?", (library,))
+
+    def indexed_folders(self, library):
+        return {row["folder"] for row in self.query("SELECT folder FROM docs WHERE library = ?", (library,))}
+
+    def search(self, library, query, limit=10, folders=None):
+        """返回 [(文件夹名, 标题, 得分)]，按得分从高到低；folders 可限定候选论文"""
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return []
+        stats = self.query_one(
+            "SELECT COUNT(*), COALESCE(AVG(length), 0) FROM docs WHERE library = ?", (library,)
+        )
+        doc_count, avg_length = stats[0], stats[1] or 1
+        placeholders = ",".join("?" * len(terms))
+        rows = self.query(
+            f"SELECT p.term, p.folder, p.tf, d.length, d.title FROM postings p "
+            f"JOIN docs d ON d.library = p.library AND d.folder = p.folder "
+            f"WHERE p.library = ? AND p.term IN ({placeholders})",
+            [library, *terms],
+        )
+        doc_freqs = Counter(row["term"] for row in rows)
+        scores = Counter()
+        titles = {}
+        for row in rows:
+            if folders is not None and row["folder"] not in folders:
+                continue
+            df = doc_freqs[row["term"]]
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * row["length"] / avg_length)
+            scores[row["folder"]] += idf * row["tf"] * (self.k1 + 1) / (row["tf"] + norm)
+            titles[row["folder"]] = row["title"]
+        return [(folder, titles[folder], score) for folder, score in scores.most_common(limit)]
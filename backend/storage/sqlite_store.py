@@ -0,0 +1,39 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class SQLiteStore:
+    """多线程共享同一个 SQLite 连接的存储基类，子类通过 SCHEMA 声明表结构"""
+
+    SCHEMA = ""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(self.SCHEMA)
+
+    @contextmanager
+    def transaction(self):
+        """在一个事务中执行多条语句，异常时回滚"""
+        with self._lock:
+            with self._conn:
+                yield self._conn
+
+    def query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def query_one(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
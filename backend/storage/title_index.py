@@ -0,0 +1,209 @@
+"""本地 arXiv 标题索引：按标题离线查找 arXiv ID，未命中时再走网络搜索
+
+从 arXiv 元数据快照（例如 Kaggle 上每周更新的 arxiv-metadata-oai-snapshot.json，
+每行一篇论文的 JSON）建立索引，之后可以用新的快照或增量文件更新：
+
+    python -m storage.title_index arxiv-metadata-oai-snapshot.json --db ../data/cache/arxiv_titles.db
+    python -m storage.title_index delta.jsonl --db ../data/cache/arxiv_titles.db --update
+"""
+import re
+import json
+import hashlib
+import argparse
+import unicodedata
+from difflib import SequenceMatcher
+
+from retrieval.bm25 import tokenize
+from storage.sqlite_store import SQLiteStore
+
+# 模糊匹配时候选标题与查询的最低相似度
+FUZZY_THRESHOLD = 0.9
+FUZZY_CANDIDATES = 20
+LOAD_BATCH_SIZE = 10000
+
+
+def normalize_title(title):
+    """去掉重音、大小写、LaTeX 符号和标点差异，只保留以单个空格分隔的字母数字"""
+    text = unicodedata.normalize("NFKD", title or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    # \'e 之类的重音命令只保留字母，\alpha 之类的命令保留名称
+    text = re.sub(r"\\[^a-z\s]", "", text)
+    text = re.sub(r"\\([a-z]+)|[${}]", r" \1 ", text)
+    return " ".join(re.findall(r"[^\W_]+", text))
+
+
+def title_key(text):
+    """64 位有符号整数哈希，作为 SQLite 的整数索引"""
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def title_keys(title):
+    """返回 (规范化标题的哈希, 去掉空格后的哈希)；后者让 "Pre-training" 和 "Pretraining" 命中同一篇"""
+    normalized = normalize_title(title)
+    return title_key(normalized), title_key(normalized.replace(" ", ""))
+
+
+class ArxivTitleIndex(SQLiteStore):
+    """按规范化标题哈希查找 arXiv ID，查不到时用 FTS5 全文索引找相近的标题"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS papers (
+        id INTEGER PRIMARY KEY,
+        arxiv_id TEXT NOT NULL UNIQUE,
+        title TEXT NOT NULL,
+        norm_key INTEGER NOT NULL,
+        squash_key INTEGER NOT NULL,
+        updated TEXT
+    );
+    CREATE INDEX IF NOT EXISTS papers_norm_key ON papers (norm_key);
+    CREATE INDEX IF NOT EXISTS papers_squash_key ON papers (squash_key);
+    CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+        title, content='papers', content_rowid='id'
+    );
+    CREATE TRIGGER IF NOT EXISTS papers_ai AFTER INSERT ON papers BEGIN
+        INSERT INTO papers_fts (rowid, title) VALUES (new.id, new.title);
+    END;
+    CREATE TRIGGER IF NOT EXISTS papers_ad AFTER DELETE ON papers BEGIN
+        INSERT INTO papers_fts (papers_fts, rowid, title) VALUES ('delete', old.id, old.title);
+    END;
+    CREATE TRIGGER IF NOT EXISTS papers_au AFTER UPDATE OF title ON papers BEGIN
+        INSERT INTO papers_fts (papers_fts, rowid, title) VALUES ('delete', old.id, old.title);
+        INSERT INTO papers_fts (rowid, title) VALUES (new.id, new.title);
+    END;
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    """
+
+    def __init__(self, db_path, fuzzy=True):
+        super().__init__(db_path)
+        self.fuzzy = fuzzy
+
+    def load_snapshot(self, path, incremental=False):
+        """逐行读取快照并写入索引，返回写入的论文数
+
+        incremental 为真时跳过 update_date 早于索引中最新日期的记录，用于导入新一期的完整快照或增量文件。
+        """
+        since = self.get_meta("max_updated") if incremental else None
+        max_updated = self.get_meta("max_updated")
+        batch = []
+        loaded = 0
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                updated = record.get("update_date")
+                if since and updated and updated < since:
+                    continue
+                if not record.get("id") or not record.get("title"):
+                    continue
+                title = " ".join(record["title"].split())
+                norm_key, squash_key = title_keys(title)
+                batch.append((record["id"], title, norm_key, squash_key, updated))
+                if updated and (max_updated is None or updated > max_updated):
+                    max_updated = updated
+                if len(batch) >= LOAD_BATCH_SIZE:
+                    loaded += self._upsert(batch)
+                    batch = []
+        loaded += self._upsert(batch)
+        if max_updated:
+            self.set_meta("max_updated", max_updated)
+        return loaded
+
+    def _upsert(self, batch):
+        if not batch:
+            return 0
+        with self.transaction() as conn:
+            # 标题没有变化的记录不更新，避免重写全文索引
+            conn.executemany(
+                "INSERT INTO papers (arxiv_id, title, norm_key, squash_key, updated) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (arxiv_id) DO UPDATE SET "
+                "title = excluded.title, norm_key = excluded.norm_key, "
+                "squash_key = excluded.squash_key, updated = excluded.updated "
+                "WHERE excluded.title != papers.title",
+                batch,
+            )
+        return len(batch)
+
+    def _exact(self, column, key, normalized, squashed):
+        rows = self.query(
+            f"SELECT arxiv_id, title FROM papers WHERE {column} = ? ORDER BY updated DESC", (key,)
+        )
+        for row in rows:
+            # 防止哈希碰撞
+            candidate = normalize_title(row["title"])
+            if candidate == normalized or candidate.replace(" ", "") == squashed:
+                return {"arxiv_id": row["arxiv_id"], "title": row["title"], "score": 1.0}
+        return None
+
+    def _fuzzy(self, normalized):
+        terms = sorted(set(tokenize(normalized)))
+        if not terms:
+            return None
+        # 先要求包含所有词；找不到时依次去掉一个词，容忍一个拼错或多出来的词。
+        # 不用 OR 查询，常见词的倒排列表很长，逐一打分太慢
+        term_sets = [terms]
+        if len(terms) > 1:
+            term_sets += [terms[:i] + terms[i + 1:] for i in range(len(terms))]
+        seen = set()
+        best = None
+        for term_set in term_sets:
+            rows = self.query(
+                "SELECT papers.arxiv_id, papers.title FROM papers_fts "
+                "JOIN papers ON papers.id = papers_fts.rowid "
+                "WHERE papers_fts MATCH ? ORDER BY bm25(papers_fts) LIMIT ?",
+                (" AND ".join(f'"{term}"' for term in term_set), FUZZY_CANDIDATES),
+            )
+            for row in rows:
+                if row["arxiv_id"] in seen:
+                    continue
+                seen.add(row["arxiv_id"])
+                score = SequenceMatcher(None, normalized, normalize_title(row["title"])).ratio()
+                if score >= FUZZY_THRESHOLD and (best is None or score > best["score"]):
+                    best = {"arxiv_id": row["arxiv_id"], "title": row["title"], "score": round(score, 3)}
+            if best is not None:
+                return best
+        return None
+
+    def lookup(self, title):
+        """返回 {"arxiv_id", "title", "score"}，找不到足够相近的标题时返回 None"""
+        normalized = normalize_title(title)
+        if not normalized:
+            return None
+        squashed = normalized.replace(" ", "")
+        result = (
+            self._exact("norm_key", title_key(normalized), normalized, squashed)
+            or self._exact("squash_key", title_key(squashed), normalized, squashed)
+        )
+        if result is None and self.fuzzy:
+            result = self._fuzzy(normalized)
+        return result
+
+    def get_meta(self, key):
+        row = self.query_one("SELECT value FROM meta WHERE key = ?", (key,))
+        return row["value"] if row else None
+
+    def set_meta(self, key, value):
+        with self.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def stats(self):
+        row = self.query_one("SELECT COUNT(*) FROM papers")
+        return {"papers": row[0], "max_updated": self.get_meta("max_updated")}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="从 arXiv 元数据快照建立或更新本地标题索引")
+    parser.add_argument("snapshot", help="每行一篇论文的 JSON 文件")
+    parser.add_argument("--db", default="../data/cache/arxiv_titles.db")
+    parser.add_argument("--update", action="store_true", help="只导入比索引更新的记录")
+    args = parser.parse_args()
+
+    index = ArxivTitleIndex(args.db)
+    loaded = index.load_snapshot(args.snapshot, incremental=args.update)
+    print(f"Loaded {loaded} papers, {index.stats()}")
@@ -0,0 +1,86 @@
+import os
+import sys
+import json
+import time
+import uuid
+import tempfile
+
+import pytest
+
+# 测试直接导入 backend 下的模块，与 server.py 的运行方式一致
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# server.py 在导入时创建数据目录和模型客户端，测试中写到临时目录，并使用假的 API key
+os.environ.setdefault("DATA_ROOT", tempfile.mkdtemp(prefix="askpapers-tests-"))
+os.environ.setdefault("API_KEY", "test-key")
+
+
+class StubReader:
+    """代替 GeminiPDFReader：回答为 "问题 @ PDF 文件名"，不访问网络
+
+    delays 为 {文件夹名: 秒数}，failures 中的论文抛出异常。
+    """
+
+    def __init__(self, delays=None, failures=()):
+        self.delays = delays or {}
+        self.failures = set(failures)
+        self.calls = []
+        self.batches = []
+
+    def _answer(self, question, pdf_path):
+        folder_name = os.path.basename(os.path.dirname(pdf_path))
+        self.calls.append((question, folder_name))
+        time.sleep(self.delays.get(folder_name, 0))
+        if folder_name in self.failures:
+            raise RuntimeError(f"model error for {folder_name}")
+        return f"{question} @ {os.path.basename(pdf_path)}"
+
+    def ask_pdf(self, question, pdf_path, *args, **kwargs):
+        return self._answer(question, pdf_path)
+
+    def ask_pdf_stream(self, question, pdf_path, *args, **kwargs):
+        answer = self._answer(question, pdf_path)
+        # 按词拆成多段，模拟流式生成
+        for index, word in enumerate(answer.split(" ")):
+            yield word if index == 0 else " " + word
+
+    def ask_pdf_batch(self, questions, pdf_path, *args, **kwargs):
+        self.batches.append((os.path.basename(pdf_path), list(questions)))
+        return [self._answer(question, pdf_path) for question in questions]
+
+    def dump_response(self, response, output_path):
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(response)
+
+
+@pytest.fixture
+def server_app(tmp_path, monkeypatch):
+    """导入 server，文献库和历史目录指向 tmp_path，模型调用换成 StubReader"""
+    import server
+
+    library_root = tmp_path / "libraries"
+    history_folder = tmp_path / "history"
+    library_root.mkdir()
+    history_folder.mkdir()
+    monkeypatch.setattr(server, "LIBRARY_ROOT", str(library_root))
+    monkeypatch.setattr(server, "HISTORY_FOLDER", str(history_folder))
+    monkeypatch.setattr(server, "reader", StubReader())
+    return server
+
+
+@pytest.fixture
+def make_library(server_app):
+    """在临时文献库中创建论文：每篇论文一个文件夹，包含 info.json 和内容互不相同的 PDF"""
+
+    def make(name, folder_names):
+        library_path = os.path.join(server_app.LIBRARY_ROOT, name)
+        for folder_name in folder_names:
+            paper_folder = os.path.join(library_path, folder_name)
+            os.makedirs(paper_folder)
+            with open(os.path.join(paper_folder, "info.json"), "w", encoding="utf-8") as f:
+                json.dump({"title": f"Title of {folder_name}", "entry_name": folder_name}, f)
+            with open(os.path.join(paper_folder, f"{folder_name}.pdf"), "wb") as f:
+                f.write(f"%PDF-1.4 {folder_name} {uuid.uuid4().hex}".encode())
+        return library_path
+
+    return make
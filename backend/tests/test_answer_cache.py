@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from storage.answer_cache import AnswerCache
+
+MODEL = "gemini-test"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return AnswerCache(str(tmp_path / "answers.db"))
+
+
+@pytest.fixture
+def library(tmp_path):
+    papers = {}
+    for name in ["a", "b"]:
+        path = tmp_path / "library" / name / f"{name}.pdf"
+        path.parent.mkdir(parents=True)
+        path.write_bytes(f"%PDF-1.4 {name}".encode())
+        papers[name] = str(path)
+    return papers
+
+
+def write_session(history, session_id, metadata, answers):
+    folder = history / session_id
+    folder.mkdir(parents=True)
+    (folder / "metadata.json").write_text(json.dumps({"id": session_id, **metadata}))
+    for name, answer in answers.items():
+        (folder / f"{name}_response.md").write_text(answer)
+
+
+def test_normalized_question_hits(cache, library):
+    cache.put("  What  is new?\n\n", library["a"], MODEL, "answer")
+    assert cache.get("What is new?", library["a"], MODEL) == "answer"
+    assert cache.get("What is new?", library["a"], MODEL + ":other") is None
+
+
+def test_seed_uses_recorded_cache_models(cache, library, tmp_path):
+    history = tmp_path / "history"
+    chunk_model = MODEL + ":chunks:1,4"
+    write_session(history, "s1", {
+        "question": "q",
+        "library": "lib",
+        "model": MODEL,
+        "papers": ["a", "b"],
+        "responses": [True, True],
+        "cache_models": [MODEL, chunk_model],
+    }, {"a": "full answer", "b": "chunk answer"})
+
+    seeded = cache.seed_from_history(str(history), lambda lib, name: (library[name], name), MODEL)
+    assert seeded == 2
+    assert cache.get("q", library["a"], MODEL) == "full answer"
+    # 检索模式的回答不能占用整篇 PDF 的缓存键
+    assert cache.get("q", library["b"], MODEL) is None
+    assert cache.get("q", library["b"], chunk_model) == "chunk answer"
+
+
+def test_seed_legacy_sessions_by_model(cache, library, tmp_path):
+    history = tmp_path / "history"
+    write_session(history, "s1", {
+        "question": "q",
+        "library": "lib",
+        "papers": ["a", "b"],
+        "responses": [True, False],
+    }, {"a": "answer a", "b": "partial"})
+
+    seeded = cache.seed_from_history(str(history), lambda lib, name: (library[name], name), MODEL)
+    assert seeded == 1
+    assert cache.get("q", library["a"], MODEL) == "answer a"
+    assert cache.get("q", library["b"], MODEL) is None
+
+
+def test_seed_reads_recorded_answer_files(cache, library, tmp_path):
+    history = tmp_path / "history"
+    # 回答文件以提问时的 PDF 文件名命名，论文之后改名也能找到
+    write_session(history, "s1", {
+        "question": "q",
+        "library": "lib",
+        "model": MODEL,
+        "papers": ["a", "b"],
+        "responses": [True, False],
+        "answer_files": ["old_name_response.md", None],
+    }, {"old_name": "answer a", "b": "stale"})
+
+    seeded = cache.seed_from_history(str(history), lambda lib, name: (library[name], name), MODEL)
+    assert seeded == 1
+    assert cache.get("q", library["a"], MODEL) == "answer a"
+    assert cache.get("q", library["b"], MODEL) is None
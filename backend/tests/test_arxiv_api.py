@@ -0,0 +1,109 @@
+import os
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+from retrieval import arxiv_api
+from storage.arxiv_metadata import ArxivMetadataCache
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "arxiv_atom.xml")
+
+
+@pytest.fixture
+def atom():
+    with open(FIXTURE, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+class Response:
+    def __init__(self, text, status_code=200):
+        self.text = text
+        self.status_code = status_code
+
+
+class RecordedGet:
+    """返回录制的响应并记录请求的 ID 列表"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requested = []
+
+    def __call__(self, url):
+        self.requested.append(parse_qs(urlparse(url).query)["id_list"][0].split(","))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.mark.parametrize("entry_id, expected", [
+    ("http://arxiv.org/abs/1706.03762v7", ("1706.03762", "v7")),
+    ("https://arxiv.org/abs/2401.00001", ("2401.00001", None)),
+    ("http://arxiv.org/abs/hep-th/9711200v3", ("hep-th/9711200", "v3")),
+    ("http://arxiv.org/abs/math.GT/0309136v1", ("math.GT/0309136", "v1")),
+    (" http://arxiv.org/abs/1706.03762v12 \n", ("1706.03762", "v12")),
+])
+def test_split_version(entry_id, expected):
+    assert arxiv_api.split_version(entry_id) == expected
+
+
+def test_parse_atom(atom):
+    records = arxiv_api.parse_atom(atom)
+    # 无效 ID 对应的错误条目被跳过
+    assert [r["arxiv_id"] for r in records] == ["1706.03762", "hep-th/9711200"]
+    attention, maldacena = records
+    assert attention["version"] == "v7"
+    assert attention["title"] == "Attention Is All You Need"
+    assert attention["authors"] == ["Ashish Vaswani", "Noam Shazeer", "Niki Parmar"]
+    assert attention["abstract"].startswith("The dominant sequence transduction models are based on")
+    assert "\n" not in attention["abstract"]
+    assert attention["published"] == "2017-06-12T17:57:34Z"
+    assert maldacena["title"] == (
+        "The Large N Limit of Superconformal Field Theories and Supergravity"
+    )
+    assert maldacena["version"] == "v3"
+    assert maldacena["authors"] == ["Juan M. Maldacena"]
+
+
+def test_parse_atom_without_entries():
+    assert arxiv_api.parse_atom('<feed xmlns="http://www.w3.org/2005/Atom"></feed>') == []
+
+
+def test_resolve_metadata_caches_results(atom, tmp_path):
+    cache = ArxivMetadataCache(str(tmp_path / "arxiv.db"))
+    get = RecordedGet(Response(atom))
+    ids = ["1706.03762", "hep-th/9711200", "1234.12345"]
+    records = arxiv_api.resolve_metadata(ids, cache, get=get)
+    assert set(records) == {"1706.03762", "hep-th/9711200"}
+    assert get.requested == [ids]
+
+    # 已缓存的论文不再查询，只重新查询上次没有结果的 ID
+    get = RecordedGet(Response(atom))
+    records = arxiv_api.resolve_metadata(ids + ["1706.03762"], cache, get=get)
+    assert records["hep-th/9711200"]["authors"] == ["Juan M. Maldacena"]
+    assert get.requested == [["1234.12345"]]
+
+
+def test_resolve_metadata_skips_failed_batches(atom, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(arxiv_api, "BATCH_SIZE", 2)
+    monkeypatch.setattr(arxiv_api.time, "sleep", sleeps.append)
+    get = RecordedGet(
+        Response("", status_code=503),
+        Response(atom),
+        ConnectionError("reset"),
+        Response("<not xml"),
+    )
+    ids = ["a", "b", "1706.03762", "hep-th/9711200", "c", "d", "e"]
+    records = arxiv_api.resolve_metadata(ids, get=get)
+    assert set(records) == {"1706.03762", "hep-th/9711200"}
+    assert get.requested == [["a", "b"], ["1706.03762", "hep-th/9711200"], ["c", "d"], ["e"]]
+    # 连续请求之间遵守 arXiv 的间隔要求
+    assert sleeps == [arxiv_api.REQUEST_INTERVAL] * 3
+
+
+def test_build_query_url_keeps_old_style_ids():
+    url = arxiv_api.build_query_url(["hep-th/9711200", "1706.03762"])
+    query = parse_qs(urlparse(url).query)
+    assert query["id_list"] == ["hep-th/9711200,1706.03762"]
+    assert query["max_results"] == ["2"]
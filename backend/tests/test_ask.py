@@ -0,0 +1,45 @@
+def test_answers_follow_input_order(server_app, make_library):
+    papers = ["p0", "p1", "p2", "p3"]
+    make_library("lib", papers)
+    # 先提交的论文回答得最慢，完成顺序与输入顺序相反
+    server_app.reader.delays = {"p0": 0.3, "p1": 0.2, "p2": 0.1}
+
+    response = server_app.app.test_client().post("/api/ask", json={
+        "question": "What is new?", "library": "lib", "papers": papers, "max_workers": 4,
+    })
+
+    assert response.status_code == 200
+    responses = response.get_json()["responses"]
+    assert [r["answer"] for r in responses] == [f"What is new? @ {name}.pdf" for name in papers]
+    assert [r["paper"] for r in responses] == [f"Title of {name}" for name in papers]
+
+
+def test_one_failed_paper_does_not_fail_the_others(server_app, make_library):
+    make_library("lib", ["good", "bad", "also_good"])
+    server_app.reader.failures = {"bad"}
+
+    response = server_app.app.test_client().post("/api/ask", json={
+        "question": "q", "library": "lib", "papers": ["good", "bad", "missing", "also_good"],
+    })
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [r["success"] for r in body["responses"]] == [True, False, False, True]
+    assert "model error for bad" in body["responses"][1]["error"]
+    assert body["responses"][2]["error"] == "Paper folder not found"
+    assert body["responses"][3]["answer"] == "q @ also_good.pdf"
+    assert body["metadata"]["responses"] == [True, False, False, True]
+
+
+def test_non_numeric_options_are_rejected(server_app, make_library):
+    make_library("lib", ["p0"])
+    client = server_app.app.test_client()
+
+    for endpoint in ("/api/ask", "/api/ask/stream"):
+        for option, value in (("max_workers", "many"), ("top_n", "abc"), ("top_n", -1), ("max_workers", 1.5)):
+            response = client.post(endpoint, json={
+                "question": "q", "library": "lib", "papers": ["p0"], option: value,
+            })
+            assert response.status_code == 400, (endpoint, option, value)
+            assert option in response.get_json()["error"]
+    assert server_app.reader.calls == []
@@ -0,0 +1,67 @@
+import json
+
+
+def read_events(response):
+    """把 text/event-stream 响应体解析为 [(事件名, 数据)]"""
+    events = []
+    for block in response.get_data(as_text=True).split("\n\n"):
+        if not block.strip():
+            continue
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_stream_reports_each_paper_as_it_finishes(server_app, make_library):
+    make_library("lib", ["slow", "fast"])
+    server_app.reader.delays = {"slow": 0.3}
+
+    response = server_app.app.test_client().post("/api/ask/stream", json={
+        "question": "what is it", "library": "lib", "papers": ["slow", "fast"],
+    })
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    events = read_events(response)
+    names = [name for name, _ in events]
+    assert names[0] == "session" and names[-1] == "done"
+    assert events[0][1]["papers"] == ["slow", "fast"]
+    # 先完成的论文先推送，不等待其他论文
+    papers = [data for name, data in events if name == "paper"]
+    assert [p["folder"] for p in papers] == ["fast", "slow"]
+    for paper in papers:
+        chunks = [data["text"] for name, data in events if name == "chunk" and data["index"] == paper["index"]]
+        # 每篇论文的片段都在它的 paper 事件之前，拼起来就是完整回答
+        assert events.index(("paper", paper)) > max(
+            i for i, (name, data) in enumerate(events) if name == "chunk" and data["index"] == paper["index"]
+        )
+        assert "".join(chunks) == paper["answer"] == f"what is it @ {paper['folder']}.pdf"
+    done = events[-1][1]
+    assert done["metadata"]["papers"] == ["slow", "fast"]
+    assert done["metadata"]["responses"] == [True, True]
+
+
+def test_stream_reports_failed_papers_without_stopping(server_app, make_library):
+    make_library("lib", ["good", "bad"])
+    server_app.reader.failures = {"bad"}
+
+    response = server_app.app.test_client().post("/api/ask/stream", json={
+        "question": "q", "library": "lib", "papers": ["bad", "missing", "good"],
+    })
+
+    events = read_events(response)
+    papers = {data["folder"]: data for name, data in events if name == "paper"}
+    assert papers["bad"]["success"] is False
+    assert "model error for bad" in papers["bad"]["error"]
+    assert papers["missing"]["error"] == "Paper folder not found"
+    assert papers["good"]["answer"] == "q @ good.pdf"
+    assert events[-1][0] == "done"
+    assert events[-1][1]["metadata"]["responses"] == [False, False, True]
+
+
+def test_stream_validates_the_request(server_app, make_library):
+    make_library("lib", ["p0"])
+    client = server_app.app.test_client()
+
+    assert client.post("/api/ask/stream", json={"library": "lib", "papers": ["p0"]}).status_code == 400
+    assert client.post("/api/ask/stream", json={"question": "q", "library": "nope"}).status_code == 404
@@ -0,0 +1,83 @@
+import os
+import shutil
+
+import pytest
+
+from storage.blob_store import BlobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(str(tmp_path / "blobs"))
+
+
+def write_pdf(path, content=b"%PDF-1.4 paper"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
+
+
+def test_gc_removes_blob_after_last_reference_deleted(store, tmp_path):
+    first = write_pdf(str(tmp_path / "lib1" / "p" / "p.pdf"))
+    second = write_pdf(str(tmp_path / "lib2" / "p" / "p.pdf"))
+    digest = store.add_file(first)
+    store.add_file(second)
+    os.remove(first)
+    assert store.gc() == 0
+    os.remove(second)
+    assert store.gc() == 1
+    assert not os.path.exists(store.blob_path(digest))
+
+
+def test_gc_keeps_copied_blobs(store, tmp_path, monkeypatch):
+    # 跨文件系统时无法硬链接，文献库中的文件是复制出来的，链接数都是 1
+    def no_link(src, dest):
+        raise OSError("cross-device link")
+
+    monkeypatch.setattr(os, "link", no_link)
+    first = write_pdf(str(tmp_path / "lib1" / "p" / "p.pdf"))
+    digest = store.add_file(first)
+    second = str(tmp_path / "lib2" / "p" / "p.pdf")
+    os.makedirs(os.path.dirname(second))
+    assert store.link_into(digest, second)
+    assert os.stat(store.blob_path(digest)).st_nlink == 1
+
+    assert store.gc() == 0
+    assert os.path.exists(store.blob_path(digest))
+    shutil.rmtree(tmp_path / "lib1")
+    shutil.rmtree(tmp_path / "lib2")
+    assert store.gc() == 1
+
+
+def test_gc_drops_reference_replaced_by_other_content(store, tmp_path):
+    path = write_pdf(str(tmp_path / "lib" / "p" / "p.pdf"))
+    digest = store.add_file(path)
+    os.remove(path)
+    write_pdf(path, b"%PDF-1.4 a different, longer paper")
+    assert store.gc() == 1
+    assert not os.path.exists(store.blob_path(digest))
+
+
+def test_gc_drops_reference_replaced_by_same_size_content(store, tmp_path):
+    path = write_pdf(str(tmp_path / "lib" / "p" / "p.pdf"), b"%PDF-1.4 first")
+    digest = store.add_file(path)
+    os.remove(path)
+    write_pdf(path, b"%PDF-1.4 other")
+    assert store.gc() == 1
+    assert not os.path.exists(store.blob_path(digest))
+
+
+def test_gc_under_only_checks_blobs_referenced_there(store, tmp_path):
+    kept = write_pdf(str(tmp_path / "lib1" / "p" / "p.pdf"), b"%PDF-1.4 kept")
+    deleted = write_pdf(str(tmp_path / "lib2" / "p" / "p.pdf"), b"%PDF-1.4 deleted")
+    kept_digest = store.add_file(kept)
+    deleted_digest = store.add_file(deleted)
+    os.remove(kept)
+    shutil.rmtree(tmp_path / "lib2")
+
+    assert store.gc(str(tmp_path / "lib2")) == 1
+    assert not os.path.exists(store.blob_path(deleted_digest))
+    # lib1 下的 blob 留给下一次针对 lib1 或完整的 gc
+    assert os.path.exists(store.blob_path(kept_digest))
+    assert store.gc() == 1
@@ -0,0 +1,116 @@
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from storage.bulk_upload import (
+    BulkUpload, HashingFile, UploadTooLarge, ADDED, FAILED, SKIPPED,
+)
+
+MB = 1024 * 1024
+
+
+def pdf(name, size=100):
+    body = f"%PDF-1.4 {name} ".encode()
+    return body + b"x" * max(0, size - len(body))
+
+
+def tar_bytes(members):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as archive:
+        for name, data in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def zip_bytes(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in members:
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+class Unseekable(io.RawIOBase):
+    """模拟直接读取的请求体"""
+
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        return self._data.read(size)
+
+
+@pytest.fixture
+def make_upload(tmp_path):
+    library = tmp_path / "library"
+    library.mkdir()
+
+    def make(**kwargs):
+        return BulkUpload(str(library), str(tmp_path / "staging"), **kwargs)
+
+    return make
+
+
+def test_hashing_file_marks_oversize_instead_of_raising(tmp_path):
+    staged = HashingFile(str(tmp_path / "a.part"), max_size=10)
+    staged.write(b"%PDF-1.4")
+    staged.write(b"x" * 10)
+    assert staged.rejected == "File exceeds 0 MB"
+    staged.discard()
+    assert not os.path.exists(staged.path)
+
+
+def test_oversize_multipart_pdf_fails_alone(make_upload):
+    upload = make_upload(max_file_size=MB)
+    big = upload.stream_factory(filename="big.pdf")
+    big.write(pdf("big", 2 * MB))
+    small = upload.stream_factory(filename="small.pdf")
+    small.write(pdf("small"))
+    upload.add_upload("big.pdf", big)
+    upload.add_upload("small.pdf", small)
+    upload.cleanup()
+    assert [(r["name"], r["status"]) for r in upload.results] == [
+        ("big.pdf", FAILED), ("small.pdf", ADDED),
+    ]
+    assert upload.results[0]["error"] == "File exceeds 1 MB"
+
+
+def test_oversize_archive_member_fails_alone(make_upload):
+    upload = make_upload(max_file_size=MB)
+    data = tar_bytes([("big.pdf", pdf("big", 2 * MB)), ("ok.pdf", pdf("ok"))])
+    upload.add_upload("batch.tar", Unseekable(data))
+    assert [r["status"] for r in upload.results] == [FAILED, ADDED]
+
+
+def test_file_limit_counts_only_pdfs(make_upload):
+    upload = make_upload(max_files=2)
+    data = zip_bytes([("a.txt", b"a"), ("b.txt", b"b"), ("a.pdf", pdf("a")), ("b.pdf", pdf("b"))])
+    upload.add_upload("batch.zip", io.BytesIO(data))
+    assert [r["status"] for r in upload.results] == [SKIPPED, SKIPPED, ADDED, ADDED]
+    upload.add_upload("c.pdf", io.BytesIO(pdf("c")))
+    assert upload.results[-1]["status"] == FAILED
+
+
+def test_total_size_limit_stops_raw_zip_body(make_upload):
+    upload = make_upload(max_total_size=MB)
+    data = zip_bytes([(f"{i}.pdf", os.urandom(MB // 2)) for i in range(4)])
+    with pytest.raises(UploadTooLarge):
+        upload.add_upload("batch.zip", Unseekable(data))
+    upload.cleanup()
+    assert os.listdir(upload.staging_dir) == []
+
+
+def test_total_size_limit_counts_extracted_members(make_upload):
+    upload = make_upload(max_file_size=MB, max_total_size=MB)
+    data = tar_bytes([(f"{i}.pdf", pdf(str(i), MB // 2)) for i in range(4)])
+    with pytest.raises(UploadTooLarge):
+        upload.add_upload("batch.tar", Unseekable(data))
+    assert [r["status"] for r in upload.results] == [ADDED, ADDED]
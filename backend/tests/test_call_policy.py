@@ -0,0 +1,306 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from readers.call_policy import (
+    CallPolicy, CircuitBreaker, CallDeadlineExceeded, CircuitOpenError, TransientError,
+    MODEL_CALL_HEDGES,
+)
+from readers.scheduler import ModelScheduler
+
+
+class FakeClock:
+    """只在 sleep 时前进的时钟"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class MaxRng:
+    """总是取退避区间的上限，使等待时间可以预测"""
+
+    def uniform(self, low, high):
+        return high
+
+
+class StubFunc:
+    """按顺序返回或抛出 outcomes 中的结果，记录调用次数"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            outcome = self.outcomes[min(self.calls, len(self.outcomes) - 1)]
+            self.calls += 1
+        if callable(outcome):
+            outcome = outcome()
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def make_policy(clock=None, **kwargs):
+    clock = clock or FakeClock()
+    kwargs.setdefault("breaker", CircuitBreaker(threshold=0))
+    sleep = getattr(clock, "sleep", time.sleep)
+    return CallPolicy(sleep=sleep, clock=clock, rng=MaxRng(), workers=4, **kwargs)
+
+
+def slow(result, seconds):
+    def run():
+        time.sleep(seconds)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return run
+
+
+def blocked(event, result="late"):
+    def run():
+        event.wait(5)
+        return result
+    return run
+
+
+def test_retries_transient_errors_with_exponential_backoff():
+    clock = FakeClock()
+    policy = make_policy(clock, retries=3, backoff=1.0, max_backoff=3.0)
+    func = StubFunc(TransientError("503"), TransientError("503"), TransientError("503"), "ok")
+    assert policy.call(func, hedge=False) == "ok"
+    assert func.calls == 4
+    assert clock.sleeps == [1.0, 2.0, 3.0]
+
+
+def test_gives_up_after_retries():
+    clock = FakeClock()
+    policy = make_policy(clock, retries=2)
+    func = StubFunc(TransientError("503"))
+    with pytest.raises(TransientError):
+        policy.call(func, hedge=False)
+    assert func.calls == 3
+
+
+def test_does_not_retry_permanent_errors():
+    clock = FakeClock()
+    policy = make_policy(clock, retries=3)
+    func = StubFunc(ValueError("bad request"), "ok")
+    with pytest.raises(ValueError):
+        policy.call(func, hedge=False)
+    assert func.calls == 1
+    assert clock.sleeps == []
+
+
+def test_deadline_stops_retries():
+    clock = FakeClock()
+    policy = make_policy(clock, retries=5, backoff=4.0, deadline=10.0)
+    func = StubFunc(TransientError("503"))
+    with pytest.raises(TransientError):
+        policy.call(func, hedge=False)
+    # 4 秒后重试一次，下一次需要再等 8 秒，超过 10 秒的时限
+    assert func.calls == 2
+    assert clock.sleeps == [4.0]
+
+
+def test_attempt_timeout_raises_deadline_exceeded():
+    release = threading.Event()
+    policy = make_policy(clock=time.monotonic, retries=0, attempt_timeout=0.05)
+    try:
+        with pytest.raises(CallDeadlineExceeded):
+            policy.call(StubFunc(blocked(release)), hedge=False)
+        assert policy._abandoned == 1
+    finally:
+        release.set()
+        policy.close()
+
+
+def make_hedging_policy(**kwargs):
+    policy = make_policy(clock=time.monotonic, hedge=True, hedge_min_samples=1, **kwargs)
+    policy.latencies.add(0.02)
+    return policy
+
+
+def test_hedge_wins_when_primary_is_slow():
+    release = threading.Event()
+    policy = make_hedging_policy(retries=0)
+    won = MODEL_CALL_HEDGES.value(outcome="won")
+    func = StubFunc(blocked(release, "primary"), "hedge")
+    try:
+        assert policy.call(func) == "hedge"
+        assert func.calls == 2
+        assert MODEL_CALL_HEDGES.value(outcome="won") == won + 1
+    finally:
+        release.set()
+        policy.close()
+
+
+def test_primary_wins_over_slower_hedge():
+    release = threading.Event()
+    policy = make_hedging_policy(retries=0)
+    lost = MODEL_CALL_HEDGES.value(outcome="lost")
+    func = StubFunc(slow("primary", 0.1), blocked(release, "hedge"))
+    try:
+        assert policy.call(func) == "primary"
+        assert func.calls == 2
+        assert MODEL_CALL_HEDGES.value(outcome="lost") == lost + 1
+    finally:
+        release.set()
+        policy.close()
+
+
+def test_hedge_result_used_when_primary_fails_after_hedge_sent():
+    clock_calls = []
+
+    def clock():
+        clock_calls.append(1)
+        return time.monotonic()
+
+    policy = make_policy(clock=clock, retries=0, hedge=True, hedge_min_samples=1)
+    policy.latencies.add(0.02)
+    func = StubFunc(slow(TransientError("reset"), 0.1), slow("hedge", 0.3))
+    try:
+        assert policy.call(func) == "hedge"
+        assert func.calls == 2
+        # 第一个请求失败后只等待对冲请求，不会反复轮询
+        assert len(clock_calls) < 50
+    finally:
+        policy.close()
+
+
+def test_raises_first_error_when_primary_and_hedge_fail():
+    policy = make_hedging_policy(retries=0)
+    func = StubFunc(slow(TransientError("primary"), 0.1), slow(TransientError("hedge"), 0.2))
+    try:
+        with pytest.raises(TransientError, match="primary"):
+            policy.call(func)
+    finally:
+        policy.close()
+
+
+def test_hedge_not_sent_without_free_scheduler_slot():
+    scheduler = ModelScheduler(max_concurrent=1)
+    policy = make_hedging_policy(retries=0, attempt_timeout=0.2, scheduler=scheduler)
+    func = StubFunc(slow("primary", 0.1), "hedge")
+    try:
+        with scheduler.slot("session", 100):
+            assert policy.call(func) == "primary"
+        assert func.calls == 1
+        assert scheduler.stats()["running"] == 0
+    finally:
+        policy.close()
+
+
+def test_hedge_slot_returned_when_hedge_finishes():
+    release = threading.Event()
+    scheduler = ModelScheduler(max_concurrent=2)
+    policy = make_hedging_policy(retries=0, scheduler=scheduler)
+    func = StubFunc(slow("primary", 0.1), blocked(release, "hedge"))
+    try:
+        with scheduler.slot("session", 100):
+            assert policy.call(func) == "primary"
+            # 落后的对冲请求仍在运行，名额尚未归还
+            assert scheduler.stats()["running"] == 2
+            release.set()
+            deadline = time.monotonic() + 2
+            while scheduler.stats()["running"] != 1 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert scheduler.stats()["running"] == 1
+    finally:
+        release.set()
+        policy.close()
+
+
+def test_breaker_opens_and_half_opens():
+    clock = FakeClock()
+    breaker = CircuitBreaker(threshold=2, cooldown=30, clock=clock)
+    policy = make_policy(clock, retries=0, breaker=breaker)
+    func = StubFunc(TransientError("503"))
+    for _ in range(2):
+        with pytest.raises(TransientError):
+            policy.call(func, hedge=False)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        policy.call(func, hedge=False)
+    assert func.calls == 2
+
+    clock.now += 30
+    assert breaker.state == "half-open"
+    # 试探调用失败后重新熔断
+    with pytest.raises(TransientError):
+        policy.call(func, hedge=False)
+    assert breaker.state == "open"
+
+    clock.now += 30
+    func.outcomes = ["ok"]
+    assert policy.call(func, hedge=False) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_breaker_allows_single_probe_while_half_open():
+    clock = FakeClock()
+    breaker = CircuitBreaker(threshold=1, cooldown=10, clock=clock)
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.allow()
+
+
+def test_permanent_errors_do_not_reset_failure_streak():
+    clock = FakeClock()
+    breaker = CircuitBreaker(threshold=2, cooldown=30, clock=clock)
+    policy = make_policy(clock, retries=0, breaker=breaker)
+    with pytest.raises(TransientError):
+        policy.call(StubFunc(TransientError("503")), hedge=False)
+    with pytest.raises(ValueError):
+        policy.call(StubFunc(ValueError("bad request")), hedge=False)
+    with pytest.raises(TransientError):
+        policy.call(StubFunc(TransientError("503")), hedge=False)
+    assert breaker.state == "open"
+
+
+def test_permanent_error_during_probe_keeps_breaker_half_open():
+    clock = FakeClock()
+    breaker = CircuitBreaker(threshold=1, cooldown=30, clock=clock)
+    policy = make_policy(clock, retries=0, breaker=breaker)
+    with pytest.raises(TransientError):
+        policy.call(StubFunc(TransientError("503")), hedge=False)
+    clock.now += 30
+    with pytest.raises(ValueError):
+        policy.call(StubFunc(ValueError("bad request")), hedge=False)
+    # 没有关闭熔断，但下一次调用可以重新试探
+    assert breaker.state == "half-open"
+    assert policy.call(StubFunc("ok"), hedge=False) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_async_permanent_error_leaves_breaker_open():
+    clock = FakeClock()
+    breaker = CircuitBreaker(threshold=1, cooldown=30, clock=clock)
+    policy = make_policy(clock, retries=0, breaker=breaker)
+
+    async def fail(exc):
+        raise exc
+
+    async def run():
+        with pytest.raises(TransientError):
+            await policy.acall(lambda: fail(TransientError("503")), hedge=False)
+        clock.now += 30
+        with pytest.raises(ValueError):
+            await policy.acall(lambda: fail(ValueError("bad request")), hedge=False)
+
+    asyncio.run(run())
+    assert breaker.state == "half-open"
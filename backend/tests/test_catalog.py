@@ -0,0 +1,85 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from storage.catalog import LibraryCatalog
+
+
+def add_paper(library_root, library, folder_name, title, size=10):
+    folder = os.path.join(library_root, library, folder_name)
+    os.makedirs(folder)
+    with open(os.path.join(folder, "info.json"), "w", encoding="utf-8") as f:
+        json.dump({"title": title, "entry_name": folder_name}, f)
+    with open(os.path.join(folder, f"{folder_name}.pdf"), "wb") as f:
+        f.write(b"x" * size)
+    return folder
+
+
+@pytest.fixture
+def library_root(tmp_path):
+    root = tmp_path / "libraries"
+    root.mkdir()
+    return str(root)
+
+
+@pytest.fixture
+def catalog(tmp_path, library_root):
+    return LibraryCatalog(str(tmp_path / "catalog.db"), library_root)
+
+
+def test_lists_libraries_and_pages_through_papers(catalog, library_root):
+    for i, title in enumerate(["Gamma rays", "alpha decay", "Beta 100% sure", "Delta_v"]):
+        add_paper(library_root, "physics", f"p{i}", title, size=10 * (i + 1))
+    os.makedirs(os.path.join(library_root, "empty"))
+
+    assert [(lib["name"], lib["count"]) for lib in catalog.list_libraries()] == [
+        ("empty", 0), ("physics", 4),
+    ]
+
+    papers, total = catalog.list_papers("physics", offset=1, limit=2)
+    assert total == 4
+    # 标题排序不区分大小写
+    assert [p["title"] for p in papers] == ["Beta 100% sure", "Delta_v"]
+    papers, _ = catalog.list_papers("physics", sort="size", order="desc", limit=1)
+    assert papers[0]["title"] == "Delta_v" and papers[0]["size"] == 40
+    # 未知的排序字段退回按标题排序
+    papers, _ = catalog.list_papers("physics", sort="title; DROP TABLE papers")
+    assert [p["entry_name"] for p in papers] == ["p1", "p2", "p3", "p0"]
+
+
+def test_title_search_treats_wildcards_literally(catalog, library_root):
+    for i, title in enumerate(["100% recall", "1000 samples", "snake_case", "snakes"]):
+        add_paper(library_root, "lib", f"p{i}", title)
+
+    assert [p["title"] for p in catalog.list_papers("lib", query="100%")[0]] == ["100% recall"]
+    assert [p["title"] for p in catalog.list_papers("lib", query="e_c")[0]] == ["snake_case"]
+    assert catalog.list_papers("lib", query="RECALL")[1] == 1
+
+
+def test_picks_up_changes_made_directly_on_disk(catalog, library_root):
+    add_paper(library_root, "lib", "p0", "First")
+    assert catalog.list_papers("lib")[1] == 1
+
+    # 绕过接口新增和删除论文文件夹，目录的修改时间变化后重新扫描
+    add_paper(library_root, "lib", "p1", "Second")
+    assert [p["title"] for p in catalog.list_papers("lib")[0]] == ["First", "Second"]
+    shutil.rmtree(os.path.join(library_root, "lib", "p0"))
+    assert [p["title"] for p in catalog.list_papers("lib")[0]] == ["Second"]
+
+    shutil.rmtree(os.path.join(library_root, "lib"))
+    assert catalog.list_libraries() == []
+
+
+def test_refresh_paper_reads_rewritten_info(catalog, library_root):
+    folder = add_paper(library_root, "lib", "p0", "Draft title")
+    catalog.list_papers("lib")
+    with open(os.path.join(folder, "info.json"), "w", encoding="utf-8") as f:
+        json.dump({"title": "Final title", "entry_name": "p0"}, f)
+
+    catalog.refresh_paper("lib", "p0")
+
+    assert catalog.list_papers("lib")[0][0]["title"] == "Final title"
+    catalog.remove_paper("lib", "p0")
+    assert catalog.list_papers("lib")[1] == 0
@@ -0,0 +1,138 @@
+import pytest
+
+from readers.context_cache import (
+    ContextCacheManager, ContextCacheUnavailable, FakeContextCacheBackend,
+)
+
+MODEL = "gemini-test"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / "paper.pdf"
+    path.write_bytes(b"%PDF-1.4 paper")
+    return str(path)
+
+
+def file_ref(pdf_path):
+    return "files/paper"
+
+
+def make_manager(backend, clock, **kwargs):
+    return ContextCacheManager(backend, ttl=600, refresh_margin=60, clock=clock, **kwargs)
+
+
+def test_reuses_cache_for_same_paper(clock, pdf_path):
+    backend = FakeContextCacheBackend(clock=clock)
+    manager = make_manager(backend, clock)
+    assert manager.generate("q1", pdf_path, MODEL, file_ref) == "q1 (files/paper)"
+    assert manager.generate("q2", pdf_path, MODEL, file_ref) == "q2 (files/paper)"
+    assert backend.created == 1
+
+
+def test_refreshes_cache_close_to_expiry(clock, pdf_path):
+    backend = FakeContextCacheBackend(clock=clock)
+    manager = make_manager(backend, clock)
+    manager.generate("q1", pdf_path, MODEL, file_ref)
+    clock.now += 550
+    manager.generate("q2", pdf_path, MODEL, file_ref)
+    assert backend.created == 1
+    clock.now += 550
+    manager.generate("q3", pdf_path, MODEL, file_ref)
+    assert backend.created == 1
+
+
+def test_recreates_expired_cache(clock, pdf_path):
+    backend = FakeContextCacheBackend(clock=clock)
+    manager = make_manager(backend, clock)
+    manager.generate("q1", pdf_path, MODEL, file_ref)
+    clock.now += 601
+    manager.generate("q2", pdf_path, MODEL, file_ref)
+    assert backend.created == 2
+
+
+def test_recreates_cache_missing_on_refresh(clock, pdf_path):
+    backend = FakeContextCacheBackend(clock=clock)
+    manager = make_manager(backend, clock)
+    manager.generate("q1", pdf_path, MODEL, file_ref)
+    backend.caches.clear()
+    clock.now += 550
+    assert manager.generate("q2", pdf_path, MODEL, file_ref) == "q2 (files/paper)"
+    assert backend.created == 2
+    assert len(backend.caches) == 1
+
+
+def test_deletes_old_cache_when_refresh_fails(clock, pdf_path):
+    class FailingRefresh(FakeContextCacheBackend):
+        def refresh(self, name, ttl):
+            raise RuntimeError("internal error")
+
+    backend = FailingRefresh(clock=clock)
+    manager = make_manager(backend, clock)
+    manager.generate("q1", pdf_path, MODEL, file_ref)
+    clock.now += 550
+    manager.generate("q2", pdf_path, MODEL, file_ref)
+    assert backend.created == 2
+    assert len(backend.caches) == 1
+
+
+def test_recreates_cache_missing_on_generate(clock, pdf_path):
+    backend = FakeContextCacheBackend(clock=clock)
+    manager = make_manager(backend, clock)
+    manager.generate("q1", pdf_path, MODEL, file_ref)
+    backend.caches.clear()
+    assert manager.generate("q2", pdf_path, MODEL, file_ref) == "q2 (files/paper)"
+    assert backend.created == 2
+
+
+def test_other_generate_errors_keep_cache(clock, pdf_path):
+    calls = []
+
+    def answer(question, ref):
+        calls.append(question)
+        if question == "busy":
+            raise RuntimeError("429 resource exhausted")
+        return question
+
+    backend = FakeContextCacheBackend(answer=answer, clock=clock)
+    manager = make_manager(backend, clock)
+    manager.generate("q1", pdf_path, MODEL, file_ref)
+    with pytest.raises(RuntimeError):
+        manager.generate("busy", pdf_path, MODEL, file_ref)
+    assert calls == ["q1", "busy"]
+    assert backend.created == 1
+    assert manager.generate("q2", pdf_path, MODEL, file_ref) == "q2"
+
+
+def test_remembers_papers_that_cannot_be_cached(clock, pdf_path):
+    backend = FakeContextCacheBackend(clock=clock, min_size=1000)
+    manager = make_manager(backend, clock, unavailable_ttl=300)
+    for _ in range(3):
+        with pytest.raises(ContextCacheUnavailable):
+            manager.generate("q", pdf_path, MODEL, file_ref)
+    assert backend.create_attempts == 1
+    clock.now += 301
+    with pytest.raises(ContextCacheUnavailable):
+        manager.generate("q", pdf_path, MODEL, file_ref)
+    assert backend.create_attempts == 2
+
+
+def test_close_deletes_caches(clock, pdf_path):
+    backend = FakeContextCacheBackend(clock=clock)
+    manager = make_manager(backend, clock)
+    manager.generate("q1", pdf_path, MODEL, file_ref)
+    manager.close()
+    assert backend.caches == {}
@@ -0,0 +1,107 @@
+import asyncio
+import re
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from retrieval import main, async_main
+from retrieval.async_http_client import AsyncHTTPClient
+
+CONTENT = bytes(range(256)) * 64
+
+
+class PdfServer(ThreadingHTTPServer):
+    """按 Range 返回 CONTENT 的一部分；range_offset 不为 0 时模拟返回错误起点的 206"""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), PdfHandler)
+        self.range_offset = 0
+        self.ranges = []
+
+
+class PdfHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        range_header = self.headers.get("Range")
+        self.server.ranges.append(range_header)
+        if range_header is None:
+            self.send_response(200)
+            body = CONTENT
+        else:
+            start = int(re.match(r"bytes=(\d+)-", range_header).group(1)) + self.server.range_offset
+            body = CONTENT[start:]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(CONTENT) - 1}/{len(CONTENT)}")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = PdfServer()
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=["sync", "async"])
+def download(request):
+    """同一组用例分别跑同步和异步的 download_pdf"""
+    if request.param == "sync":
+        return main.download_pdf
+
+    def run(pdf_url, pdf_path):
+        async def go():
+            client = AsyncHTTPClient()
+            try:
+                return await async_main.download_pdf(client, pdf_url, pdf_path)
+            finally:
+                await client.aclose()
+
+        return asyncio.run(go())
+
+    return run
+
+
+def write_part(pdf_path, data):
+    with open(pdf_path + ".part", "wb") as f:
+        f.write(data)
+
+
+def test_resumes_from_part_file(server, download, tmp_path):
+    pdf_path = str(tmp_path / "paper.pdf")
+    write_part(pdf_path, CONTENT[:1000])
+
+    assert download(f"http://127.0.0.1:{server.server_port}/paper.pdf", pdf_path)
+
+    assert open(pdf_path, "rb").read() == CONTENT
+    assert server.ranges == ["bytes=1000-"]
+
+
+def test_mismatched_range_restarts_without_range(server, download, tmp_path):
+    server.range_offset = 24
+    pdf_path = str(tmp_path / "paper.pdf")
+    write_part(pdf_path, b"garbage" * 100)
+
+    assert download(f"http://127.0.0.1:{server.server_port}/paper.pdf", pdf_path)
+
+    # 错位的 206 响应体不能写进文件，丢弃 .part 后重新完整下载
+    assert open(pdf_path, "rb").read() == CONTENT
+    assert server.ranges == ["bytes=700-", None]
+
+
+def test_plan_download_only_restarts_on_200():
+    assert main.plan_download(200, {"content-length": "10"}, 5) == (main.DOWNLOAD_RESTART, 10)
+    assert main.plan_download(206, {"Content-Range": "bytes 5-9/10", "content-length": "5"}, 5) == (
+        main.DOWNLOAD_APPEND,
+        10,
+    )
+    assert main.plan_download(206, {"Content-Range": "bytes 0-9/10"}, 5) == (main.DOWNLOAD_RETRY, None)
+    assert main.plan_download(416, {}, 10) == (main.DOWNLOAD_COMPLETE, 10)
+    assert main.plan_download(404, {}, 0) == (main.DOWNLOAD_FAILED, None)
@@ -0,0 +1,56 @@
+import pytest
+
+from readers.call_policy import TransientError
+from readers.fake_reader import FakePDFReader
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    path = tmp_path / "paper.pdf"
+    path.write_bytes(b"%PDF-1.4 fake reader")
+    return str(path)
+
+
+def test_answers_are_deterministic_and_sized(pdf, tmp_path):
+    reader = FakePDFReader(latency=0, output_size=300)
+    answer = reader.ask_pdf("q", pdf)
+
+    assert len(answer) == 300
+    # 同一问题和同样内容的 PDF 总是得到相同回答，不受 seed 和文件路径影响
+    copy = tmp_path / "copy.pdf"
+    copy.write_bytes(b"%PDF-1.4 fake reader")
+    assert FakePDFReader(latency=0, output_size=300, seed=7).ask_pdf("q", str(copy)) == answer
+    assert reader.ask_pdf("another question", pdf) != answer
+
+
+def test_stream_and_batch_agree_with_single_answers(pdf):
+    reader = FakePDFReader(latency=0, output_size=100)
+    chunks = list(reader.ask_pdf_stream("q", pdf, chunks=4))
+
+    assert len(chunks) == 4
+    assert "".join(chunks) == reader.ask_pdf("q", pdf)
+    assert reader.ask_pdf_batch(["q", "r"], pdf) == [reader.ask_pdf("q", pdf), reader.ask_pdf("r", pdf)]
+
+
+def test_latency_follows_configuration(pdf, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr("readers.fake_reader.time.sleep", sleeps.append)
+    reader = FakePDFReader(latency=0.5, jitter=0.2)
+
+    for _ in range(20):
+        reader.ask_pdf("q", pdf)
+
+    assert all(0.4 <= delay <= 0.6 for delay in sleeps)
+    assert len(set(sleeps)) > 1
+
+
+def test_error_rate_fails_calls(pdf):
+    reader = FakePDFReader(latency=0, error_rate=1.0)
+
+    # 失败按可重试的错误抛出，交给 CallPolicy 处理
+    with pytest.raises(TransientError):
+        reader.ask_pdf("q", pdf)
+    with pytest.raises(TransientError):
+        reader.ask_pdf_batch(["q", "r"], pdf)
+    with pytest.raises(TransientError):
+        list(reader.ask_pdf_stream("q", pdf))
@@ -0,0 +1,45 @@
+import pytest
+
+from storage.history_index import HistoryIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = HistoryIndex(str(tmp_path / "history.db"))
+    for i in range(5):
+        index.add_session({
+            "id": f"s{i}",
+            "library": "lib",
+            "question": f"question {i}",
+            "timestamp": f"2026-01-0{i + 1}T00:00:00",
+            "papers": ["p"],
+            "responses": [True],
+        }, ["p_response.md"])
+    return index
+
+
+def test_pages_follow_cursor(index):
+    page, cursor = index.list_sessions(limit=2)
+    assert [s["id"] for s in page] == ["s4", "s3"]
+    page, cursor = index.list_sessions(cursor=cursor, limit=2)
+    assert [s["id"] for s in page] == ["s2", "s1"]
+    page, cursor = index.list_sessions(cursor=cursor, limit=2)
+    assert [s["id"] for s in page] == ["s0"]
+    assert cursor is None
+
+
+def test_without_limit_returns_all(index):
+    sessions, cursor = index.list_sessions()
+    assert len(sessions) == 5
+    assert cursor is None
+
+
+@pytest.mark.parametrize("limit", [0, -1])
+def test_rejects_non_positive_limit(index, limit):
+    with pytest.raises(ValueError):
+        index.list_sessions(limit=limit)
+
+
+def test_rejects_invalid_cursor(index):
+    with pytest.raises(ValueError):
+        index.list_sessions(cursor="not a cursor", limit=2)
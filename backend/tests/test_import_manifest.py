@@ -0,0 +1,96 @@
+import os
+import shutil
+from types import SimpleNamespace
+
+from retrieval import main
+from storage.import_manifest import ImportManifest
+
+DESCS = [
+    "https://arxiv.org/abs/2401.00001",
+    "Known Paper",
+    "Unknown Paper",
+    "https://example.com/paper.pdf",
+    "https://arxiv.org/abs/2401.00003",
+    "https://arxiv.org/abs/2401.00004",
+]
+
+
+class FakeArxiv:
+    """替换网络访问：00003 查不到元数据也取不到标题，00004 的 PDF 下载失败"""
+
+    def __init__(self, monkeypatch):
+        self.downloads = []
+        self.broken_downloads = {"2401.00004"}
+        monkeypatch.setattr(main, "search_papers_by_keyword", self.search)
+        monkeypatch.setattr(main, "resolve_metadata", self.resolve_metadata)
+        monkeypatch.setattr(main, "get_paper_title_from_arxiv", lambda url: None)
+        monkeypatch.setattr(main, "download_pdf", self.download_pdf)
+
+    def search(self, title, limit=None, cache=None):
+        if title == "Known Paper":
+            return [SimpleNamespace(arxiv_link="https://arxiv.org/abs/2401.00002", summary="found")]
+        return []
+
+    def resolve_metadata(self, arxiv_ids, cache=None):
+        return {
+            arxiv_id: {"title": f"Paper {arxiv_id}", "authors": ["A"], "version": "v1", "abstract": "abs"}
+            for arxiv_id in arxiv_ids
+            if arxiv_id != "2401.00003"
+        }
+
+    def download_pdf(self, pdf_url, pdf_path, *args, **kwargs):
+        arxiv_id = main.get_arxiv_id(pdf_url)
+        self.downloads.append(arxiv_id)
+        if arxiv_id in self.broken_downloads:
+            return False
+        with open(pdf_path, "wb") as f:
+            f.write(b"%PDF " + arxiv_id.encode())
+        return True
+
+
+def test_failed_lines_do_not_abort_the_import(tmp_path, monkeypatch):
+    fake = FakeArxiv(monkeypatch)
+    manifest = ImportManifest(str(tmp_path / "imports.db"))
+    library = str(tmp_path / "lib")
+
+    added = main.import_papers(DESCS, library, manifest=manifest, import_id="first")
+    manifest.finish("first")
+
+    assert sorted(paper["title"] for paper in added) == ["Paper 2401.00001", "Paper 2401.00002"]
+    progress = manifest.progress("first")
+    assert progress["status"] == "succeeded"
+    assert progress["total"] == 6 and progress["done"] == 6
+    assert progress["counts"] == {"done": 2, "failed": 4}
+    stages = {failure["desc"]: failure["stage"] for failure in progress["failed"]}
+    assert stages == {
+        "Unknown Paper": "search",
+        "https://example.com/paper.pdf": "resolve",
+        "https://arxiv.org/abs/2401.00003": "metadata",
+        "https://arxiv.org/abs/2401.00004": "download",
+    }
+    assert manifest.get("lib", "Known Paper")["arxiv_url"] == "https://arxiv.org/abs/2401.00002"
+    assert sorted(fake.downloads) == ["2401.00001", "2401.00002", "2401.00004"]
+
+
+def test_rerun_skips_finished_lines_and_retries_failures(tmp_path, monkeypatch):
+    fake = FakeArxiv(monkeypatch)
+    manifest = ImportManifest(str(tmp_path / "imports.db"))
+    library = str(tmp_path / "lib")
+    main.import_papers(DESCS, library, manifest=manifest, import_id="first")
+    manifest.finish("first")
+
+    # 删除一篇已导入的论文，修好下载，再导入同样的内容
+    shutil.rmtree(os.path.join(library, manifest.get("lib", DESCS[0])["entry_name"]))
+    fake.broken_downloads.clear()
+    fake.downloads.clear()
+    added = main.import_papers(DESCS, library, manifest=manifest, import_id="second")
+    manifest.finish("second")
+
+    assert sorted(paper["title"] for paper in added) == ["Paper 2401.00001", "Paper 2401.00004"]
+    assert sorted(fake.downloads) == ["2401.00001", "2401.00004"]
+    assert manifest.progress("second")["counts"] == {"done": 3, "failed": 3}
+    # 结束时保存的统计不受之后导入的影响
+    assert manifest.progress("first")["counts"] == {"done": 2, "failed": 4}
+    assert [item["id"] for item in manifest.list_imports("lib")] == ["second", "first"]
+    assert "failed" not in manifest.list_imports("lib")[0]
+    assert manifest.progress("missing") is None
@@ -0,0 +1,102 @@
+import threading
+import time
+
+from jobs.manager import JobManager, QUEUED, SUCCEEDED
+
+
+def wait_for(manager, job_id, status, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if job["status"] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job did not reach {status}: {manager.get(job_id)}")
+
+
+def counting_handler(started, total=20):
+    def handler(job):
+        started.set()
+        for i in range(job.state.get("next", 0), total):
+            job.check_cancelled()
+            time.sleep(0.01)
+            job.checkpoint(done=i + 1, total=total, next=i + 1)
+        return total
+
+    return handler
+
+
+def test_workers_start_only_on_request(tmp_path):
+    manager = JobManager(str(tmp_path), workers=1)
+    started = threading.Event()
+    manager.register("count", counting_handler(started))
+    job = manager.submit("count", {})
+
+    assert not started.wait(0.1)
+    assert manager.get(job["id"])["status"] == QUEUED
+
+    manager.start()
+    try:
+        assert wait_for(manager, job["id"], SUCCEEDED)["result"] == 20
+    finally:
+        manager.stop()
+
+
+def test_stop_requeues_running_job_and_start_resumes_it(tmp_path):
+    started = threading.Event()
+    manager = JobManager(str(tmp_path), workers=1)
+    manager.register("count", counting_handler(started))
+    job = manager.submit("count", {})
+    manager.start()
+    assert started.wait(5)
+    time.sleep(0.05)
+    manager.stop()
+
+    interrupted = manager.get(job["id"])
+    assert interrupted["status"] == QUEUED
+    assert 0 < interrupted["progress"]["done"] < 20
+
+    # 新的进程从任务文件恢复，从断点继续
+    restarted = JobManager(str(tmp_path), workers=1)
+    restarted.register("count", counting_handler(threading.Event()))
+    restarted.start()
+    try:
+        finished = wait_for(restarted, job["id"], SUCCEEDED)
+    finally:
+        restarted.stop()
+    assert finished["progress"] == {"done": 20, "total": 20}
+
+
+def test_items_are_appended_and_replayed_after_restart(tmp_path):
+    release = threading.Event()
+    manager = JobManager(str(tmp_path), workers=1)
+
+    def handler(job):
+        for i in range(3):
+            job.add_item("results", str(i), {"answer": i}, done=i + 1)
+        release.wait(5)
+        job.check_cancelled()
+        return sorted(job.state["results"])
+
+    manager.register("collect", handler)
+    job = manager.submit("collect", {})
+    manager.start()
+    deadline = time.monotonic() + 5
+    while manager.get(job["id"])["progress"]["done"] != 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    # 断点只追加到日志，任务文件本身没有被重写
+    log_lines = (tmp_path / f"{job['id']}.log").read_text(encoding="utf-8").splitlines()
+    assert len(log_lines) == 3
+    # 模拟进程在这里退出后重新启动：从任务文件和日志恢复断点
+    restored = JobManager(str(tmp_path), workers=0)
+    restored.start()
+    assert restored.get(job["id"])["state"]["results"] == {str(i): {"answer": i} for i in range(3)}
+    assert restored.get(job["id"])["progress"]["done"] == 3
+
+    release.set()
+    finished = wait_for(manager, job["id"], SUCCEEDED)
+    manager.stop()
+    assert finished["result"] == ["0", "1", "2"]
+    # 结束时合并进任务文件并删除日志
+    assert not (tmp_path / f"{job['id']}.log").exists()
@@ -0,0 +1,62 @@
+import csv
+import io
+import time
+
+from readers.gemini_reader import parse_batch_answers
+
+
+def test_parse_batch_answers_pads_and_drops_bad_entries():
+    assert parse_batch_answers('["a", "b"]', 2) == ["a", "b"]
+    assert parse_batch_answers('["a"]', 3) == ["a", None, None]
+    assert parse_batch_answers('["a", "  ", 3, "d", "extra"]', 4) == ["a", None, None, "d"]
+    assert parse_batch_answers('{"answer": "a"}', 2) == [None, None]
+    assert parse_batch_answers("not json", 2) == [None, None]
+    assert parse_batch_answers(None, 1) == [None]
+
+
+def wait_for_job(client, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/jobs/{job_id}").get_json()
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_matrix_answers_every_question_for_every_paper(server_app, make_library):
+    make_library("lib", ["p0", "p1"])
+    server_app.job_manager.start()
+    client = server_app.app.test_client()
+    questions = ["What is the task?", "Which datasets?", "What is the main result?"]
+
+    response = client.post("/api/ask/matrix", json={
+        "questions": questions + ["  "], "library": "lib", "papers": ["p0", "p1"], "questions_per_call": 2,
+    })
+
+    assert response.status_code == 202
+    matrix_id = response.get_json()["matrix_id"]
+    assert wait_for_job(client, matrix_id)["status"] == "succeeded"
+    # 每篇论文的三个问题按每次两个合并提问
+    for pdf_name in ("p0.pdf", "p1.pdf"):
+        assert [batch for name, batch in server_app.reader.batches if name == pdf_name] == [
+            questions[:2], questions[2:],
+        ]
+
+    matrix = client.get(f"/api/ask/matrix/{matrix_id}").get_json()
+    assert matrix["questions"] == questions
+    assert [paper["title"] for paper in matrix["papers"]] == ["Title of p0", "Title of p1"]
+    assert matrix["answers"] == [[f"{q} @ p0.pdf", f"{q} @ p1.pdf"] for q in questions]
+
+    rows = list(csv.reader(io.StringIO(client.get(f"/api/ask/matrix/{matrix_id}?format=csv").get_data(as_text=True))))
+    assert rows[0] == ["question", "Title of p0", "Title of p1"]
+    assert rows[3] == [questions[2], f"{questions[2]} @ p0.pdf", f"{questions[2]} @ p1.pdf"]
+
+
+def test_matrix_requires_questions_and_papers(server_app, make_library):
+    make_library("lib", ["p0"])
+    client = server_app.app.test_client()
+
+    assert client.post("/api/ask/matrix", json={"questions": [" "], "library": "lib", "papers": ["p0"]}).status_code == 400
+    assert client.post("/api/ask/matrix", json={"questions": ["q"], "library": "lib", "papers": []}).status_code == 400
+    assert client.get("/api/ask/matrix/unknown").status_code == 404
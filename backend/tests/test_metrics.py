@@ -0,0 +1,79 @@
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from monitoring import metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = metrics.Registry()
+    histogram = registry.histogram("demo_seconds", "Demo", ["stage"], buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.7, 5):
+        histogram.observe(value, stage='a "quoted"\nstage')
+
+    lines = registry.render().splitlines()
+    labels = 'stage="a \\"quoted\\"\\nstage"'
+    assert f'demo_seconds_bucket{{{labels},le="0.1"}} 1' in lines
+    assert f'demo_seconds_bucket{{{labels},le="1"}} 3' in lines
+    assert f'demo_seconds_bucket{{{labels},le="+Inf"}} 4' in lines
+    assert f"demo_seconds_count{{{labels}}} 4" in lines
+    assert f"demo_seconds_sum{{{labels}}} 6.25" in lines
+
+
+def timed_in_thread():
+    with metrics.timed("test.thread"):
+        pass
+
+
+def test_timed_records_spans_and_errors_on_the_current_trace():
+    trace, token = metrics.start_trace("test")
+    try:
+        errors_before = metrics.STAGE_ERRORS.value(stage="test.fail")
+        with metrics.timed("test.ok"):
+            pass
+        with pytest.raises(ValueError):
+            with metrics.timed("test.fail"):
+                raise ValueError()
+        # bind 让线程池中的调用记录到同一个 trace
+        thread = threading.Thread(target=metrics.bind(timed_in_thread))
+        thread.start()
+        thread.join()
+        metrics.record_usage("m", SimpleNamespace(prompt_token_count=10, candidates_token_count=3))
+        metrics.record_usage("m", SimpleNamespace(prompt_token_count=5, cached_content_token_count=None))
+    finally:
+        metrics.end_trace(token)
+
+    record = trace.to_dict()
+    stages = [span["stage"] for span in record["spans"]]
+    assert stages == ["test.ok", "test.fail", "test.thread"]
+    assert record["spans"][1]["error"] == "ValueError"
+    assert metrics.STAGE_ERRORS.value(stage="test.fail") == errors_before + 1
+    assert record["tokens"] == {"input": 15, "output": 3}
+    assert metrics.current_trace() is None
+
+
+def test_request_trace_and_metrics_endpoint(server_app, make_library, tmp_path, monkeypatch):
+    make_library("lib", ["p0", "p1"])
+    trace_file = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(server_app, "trace_log", metrics.TraceLog(str(trace_file)))
+    client = server_app.app.test_client()
+
+    response = client.post("/api/ask", json={"question": "q", "library": "lib", "papers": ["p0", "p1"]},
+                           headers={"X-Trace": "1"})
+    response.close()
+
+    traces = [json.loads(line) for line in trace_file.read_text(encoding="utf-8").splitlines()]
+    assert [t["id"] for t in traces] == [response.headers["X-Trace-Id"]]
+    assert traces[0]["endpoint"] == "/api/ask" and traces[0]["status"] == 200
+    # 两篇论文在线程池中的模型调用都记录在请求的 trace 上
+    assert [span["stage"] for span in traces[0]["spans"]].count("ask.model") == 2
+
+    # 不带 X-Trace 请求头的请求不记录 trace
+    client.get("/api/libraries").close()
+    assert len(trace_file.read_text(encoding="utf-8").splitlines()) == 1
+
+    body = client.get("/metrics").get_data(as_text=True)
+    assert 'askpapers_http_request_seconds_count{method="POST",endpoint="/api/ask",status="200"}' in body
+    assert 'askpapers_stage_seconds_count{stage="ask.model"}' in body
@@ -0,0 +1,53 @@
+import pytest
+
+from readers.pdf_text import needs_full_pdf, chunk_pages
+
+# 论文十问，都可以只用正文回答
+TEN_QUESTIONS = [
+    "论文试图解决什么问题？",
+    "这是否是一个新的问题？",
+    "这篇文章要验证一个什么科学假设？",
+    "有哪些相关研究？如何归类？谁是这一课题在领域内值得关注的研究员？",
+    "论文中提到的解决方案之关键是什么？",
+    "论文中的实验是如何设计的？",
+    "用于定量评估的数据集是什么？代码有没有开源？",
+    "论文中的实验及结果有没有很好地支持需要验证的科学假设？",
+    "这篇论文到底有什么贡献？",
+    "下一步呢？有什么工作可以继续深入？",
+]
+
+
+@pytest.mark.parametrize("question", TEN_QUESTIONS)
+def test_ten_questions_use_text_chunks(question):
+    assert not needs_full_pdf(question)
+
+
+@pytest.mark.parametrize("question", [
+    "作者的意图是什么？这项工作代表了什么方向？",
+    "论文如何构建地图？",
+    "What problem does the paper try to solve?",
+])
+def test_words_containing_figure_characters_use_text_chunks(question):
+    assert not needs_full_pdf(question)
+
+
+@pytest.mark.parametrize("question", [
+    "图3展示了什么？",
+    "第二张图说明了什么？",
+    "表 2 中的结果如何？",
+    "请解释论文中的示意图",
+    "总结所有图表的结论",
+    "表格里的最好结果是多少？",
+    "公式 (4) 是如何推导的？",
+    "What does Figure 2 show?",
+    "Summarize Fig. 3",
+    "Which row of Table 1 is best?",
+])
+def test_visual_questions_need_full_pdf(question):
+    assert needs_full_pdf(question)
+
+
+def test_chunk_pages_records_page_numbers():
+    chunks = chunk_pages(["a" * 50, "b" * 50], chunk_chars=40, overlap=10)
+    assert [chunk["page"] for chunk in chunks] == [1, 1, 2, 2]
+    assert all(len(chunk["text"]) <= 40 for chunk in chunks)
@@ -0,0 +1,128 @@
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from retrieval import main
+from storage.readme_cache import ReadmeCache
+
+REPO = "owner/repo"
+
+
+class ReadmeServer(ThreadingHTTPServer):
+    """模拟 raw.githubusercontent.com：files 为 {分支: README 内容}，ETag 随内容变化"""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), ReadmeHandler)
+        self.files = {}
+        self.requests = []
+
+
+class ReadmeHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        # /owner/repo/refs/heads/<branch>/README.md
+        branch = self.path.split("/")[-2]
+        self.server.requests.append((branch, self.headers.get("If-None-Match")))
+        body = self.server.files.get(branch)
+        if body is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        etag = f'"{abs(hash(body))}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        data = body.encode()
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = ReadmeServer()
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    monkeypatch.setattr(main, "GITHUB_RAW_URL", f"http://127.0.0.1:{server.server_port}")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ReadmeCache(str(tmp_path / "readmes.db"))
+
+
+MAIN_PAPER = "https://arxiv.org/abs/2401.00001"
+MASTER_PAPER = "https://arxiv.org/abs/2402.00002"
+
+
+def test_prefers_main_when_both_branches_link_papers(server, cache):
+    server.files = {"main": f"see {MAIN_PAPER}", "master": f"see {MASTER_PAPER}"}
+    assert main.get_arxiv_url_from_github(REPO, cache) == [MAIN_PAPER]
+    assert cache.get(REPO)["branch"] == "main"
+
+
+def test_falls_back_to_branch_with_paper_links(server, cache):
+    server.files = {"main": "no links here", "master": f"see {MASTER_PAPER}"}
+    assert main.get_arxiv_url_from_github(REPO, cache) == [MASTER_PAPER]
+    assert cache.get(REPO)["branch"] == "master"
+
+
+def test_remembers_readme_without_links(server, cache):
+    server.files = {"master": "no links here"}
+    assert main.get_arxiv_url_from_github(REPO, cache) is None
+    cached = cache.get(REPO)
+    assert cached["branch"] == "master"
+    assert cached["arxiv_urls"] is None
+
+
+def test_unchanged_readme_revalidated_with_304(server, cache):
+    server.files = {"main": f"see {MAIN_PAPER}"}
+    main.get_arxiv_url_from_github(REPO, cache)
+    etag = cache.get(REPO)["etag"]
+    server.requests.clear()
+
+    assert main.get_arxiv_url_from_github(REPO, cache) == [MAIN_PAPER]
+    # 只对缓存的分支发一次条件请求
+    assert server.requests == [("main", etag)]
+
+
+def test_changed_readme_updates_cache(server, cache):
+    server.files = {"main": f"see {MAIN_PAPER}"}
+    main.get_arxiv_url_from_github(REPO, cache)
+    old_etag = cache.get(REPO)["etag"]
+    server.files["main"] = f"moved to {MASTER_PAPER}"
+    server.requests.clear()
+
+    assert main.get_arxiv_url_from_github(REPO, cache) == [MASTER_PAPER]
+    assert server.requests == [("main", old_etag)]
+    cached = cache.get(REPO)
+    assert cached["arxiv_urls"] == [MASTER_PAPER]
+    assert cached["etag"] != old_etag
+
+
+def test_missing_cached_branch_reprobes(server, cache):
+    server.files = {"main": f"see {MAIN_PAPER}"}
+    main.get_arxiv_url_from_github(REPO, cache)
+    server.files = {"master": f"see {MASTER_PAPER}"}
+    server.requests.clear()
+
+    assert main.get_arxiv_url_from_github(REPO, cache) == [MASTER_PAPER]
+    assert server.requests[0][0] == "main"
+    assert sorted(branch for branch, _ in server.requests[1:]) == ["main", "master"]
+    assert cache.get(REPO)["branch"] == "master"
+
+
+def test_network_error_keeps_cached_links(cache):
+    cache.put(REPO, "main", '"etag"', None, [MAIN_PAPER])
+    assert main.revalidate_readme(REPO, cache.get(REPO), None, cache) == [MAIN_PAPER]
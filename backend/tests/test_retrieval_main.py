@@ -0,0 +1,42 @@
+import json
+
+from retrieval.main import Paper, assign_entry_names, get_arxiv_id
+
+LONG_PREFIX = "Attention Is All You Need But Only For Very Long Titles"
+
+
+def paper(title, arxiv_id):
+    return Paper(title=title, arxiv_url=f"https://arxiv.org/abs/{arxiv_id}")
+
+
+def test_get_arxiv_id_strips_version():
+    assert get_arxiv_id("https://arxiv.org/abs/1706.03762v5") == "1706.03762"
+    assert get_arxiv_id("https://arxiv.org/pdf/hep-th/9901001v2.pdf") == "hep-th/9901001"
+    assert get_arxiv_id(None) is None
+
+
+def test_entry_names_deduplicated_within_batch(tmp_path):
+    papers = [
+        paper(LONG_PREFIX + " Part One", "2401.00001"),
+        paper(LONG_PREFIX + " Part Two", "2401.00002"),
+        paper("Short Title", "hep-th/9901001"),
+    ]
+    assign_entry_names(papers, str(tmp_path))
+    names = [p.entry_name for p in papers]
+    assert len(set(names)) == 3
+    assert names[1] == names[0] + "_2401.00002"
+    assert names[2] == "Short_Title"
+
+
+def test_entry_name_avoids_folder_of_other_paper(tmp_path):
+    folder = tmp_path / "Short_Title"
+    folder.mkdir()
+    (folder / "info.json").write_text(json.dumps({"arxiv_url": "https://arxiv.org/abs/2401.00001v1"}))
+
+    same = paper("Short Title", "2401.00001")
+    other = paper("Short Title", "hep-th/9901001")
+    assign_entry_names([same], str(tmp_path))
+    assign_entry_names([other], str(tmp_path))
+    # 同一篇论文沿用已有文件夹（导入时按已存在跳过），另一篇论文换用带 ID 的名字
+    assert same.entry_name == "Short_Title"
+    assert other.entry_name == "Short_Title_hep-th_9901001"
@@ -0,0 +1,71 @@
+import threading
+
+import pytest
+
+from readers.scheduler import ModelScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def acquire_in_thread(scheduler, session, cost):
+    admitted = threading.Event()
+
+    def run():
+        scheduler.acquire(session, cost)
+        admitted.set()
+
+    threading.Thread(target=run, daemon=True).start()
+    return admitted
+
+
+def wait_queued(scheduler, count):
+    for _ in range(500):
+        if scheduler.stats()["queued"] == count:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError(f"expected {count} queued calls: {scheduler.stats()}")
+
+
+def test_small_call_passes_call_over_tpm_budget(clock):
+    scheduler = ModelScheduler(max_concurrent=4, tpm=1000, clock=clock)
+    scheduler.acquire("busy", 900)
+    # idle 会话用量更少，排在最前，但剩余预算放不下它
+    large = acquire_in_thread(scheduler, "idle", 500)
+    wait_queued(scheduler, 1)
+    small = acquire_in_thread(scheduler, "busy", 50)
+
+    assert small.wait(2)
+    assert not large.is_set()
+
+    clock.now = 61
+    scheduler.release()
+    assert large.wait(2)
+
+
+def test_aged_call_is_not_bypassed(clock):
+    scheduler = ModelScheduler(max_concurrent=4, tpm=1000, clock=clock, max_bypass_wait=10)
+    scheduler.acquire("busy", 900)
+    large = acquire_in_thread(scheduler, "idle", 500)
+    wait_queued(scheduler, 1)
+    clock.now = 11
+    small = acquire_in_thread(scheduler, "busy", 50)
+    wait_queued(scheduler, 2)
+
+    # 大调用已等待超过 max_bypass_wait，剩余预算留给它
+    assert not small.wait(0.2)
+
+    clock.now = 61
+    scheduler.release()
+    assert large.wait(2)
+    assert small.wait(2)
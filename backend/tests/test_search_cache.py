@@ -0,0 +1,108 @@
+from datetime import datetime, timezone
+
+from retrieval import cool_paper
+from storage.search_cache import SearchCache
+
+
+def feed_xml(count):
+    entries = "".join(
+        f"""
+        <entry>
+          <id>https://papers.cool/arxiv/2401.0000{i}</id>
+          <title>Paper {i}</title>
+          <updated>2024-01-0{i + 1}T00:00:00Z</updated>
+          <author><name>Author {i}</name></author>
+          <link href="https://papers.cool/arxiv/2401.0000{i}"/>
+          <summary>Summary {i}</summary>
+        </entry>"""
+        for i in range(count)
+    )
+    return f'<feed xmlns="http://www.w3.org/2005/Atom">{entries}</feed>'.encode()
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, body, chunk_size=64):
+        self.body = body
+        self.chunk_size = chunk_size
+        self.chunks_read = 0
+
+    def iter_content(self, _size):
+        for start in range(0, len(self.body), self.chunk_size):
+            self.chunks_read += 1
+            yield self.body[start:start + self.chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+        self.requests = 0
+
+    def get(self, url, **kwargs):
+        self.requests += 1
+        return self.response
+
+
+def test_cache_normalizes_queries_and_keys_by_limit(tmp_path):
+    cache = SearchCache(str(tmp_path / "search.db"))
+    cache.put("Attention  Is All\tYou Need", [{"title": "hit"}], limit=1)
+
+    assert cache.get("attention is all you need", 1) == [{"title": "hit"}]
+    assert cache.get("attention is all you need", 5) is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1, "negative_entries": 0}
+
+
+def test_negative_entries_and_expiry(tmp_path):
+    cache = SearchCache(str(tmp_path / "search.db"), ttl=60, negative_ttl=0)
+    cache.put("nothing here", [])
+    cache.put("something", [{"title": "hit"}])
+
+    # 负缓存的保留时间为 0，立即过期
+    assert cache.get("nothing here") is None
+    assert cache.get("something") == [{"title": "hit"}]
+
+
+def test_oldest_entries_are_evicted(tmp_path):
+    cache = SearchCache(str(tmp_path / "search.db"), max_entries=2)
+    cache.put("a", [1])
+    cache.put("b", [2])
+    cache.get("a")
+    cache.put("c", [3])
+
+    assert cache.get("b") is None
+    assert cache.get("a") == [1]
+    assert cache.get("c") == [3]
+
+
+def test_feed_parser_stops_after_limit():
+    parser = cool_paper.FeedParser(limit=2)
+    assert parser.feed(feed_xml(5)) is True
+    papers = parser.close()
+
+    assert [paper.title for paper in papers] == ["Paper 0", "Paper 1"]
+    assert papers[0].updated == datetime(2024, 1, 1, tzinfo=timezone.utc)
+    assert papers[0].arxiv_link == "https://arxiv.org/abs/2401.00000"
+    assert len(cool_paper.parse_feed(feed_xml(3))) == 3
+
+
+def test_search_reads_until_top_hit_and_uses_cache(tmp_path, monkeypatch):
+    body = feed_xml(5)
+    response = FakeResponse(body)
+    session = FakeSession(response)
+    monkeypatch.setattr(cool_paper.http_client, "get_session", lambda: session)
+    cache = SearchCache(str(tmp_path / "search.db"))
+
+    papers = cool_paper.search_papers_by_keyword("Some Title", limit=1, cache=cache)
+    assert [paper.title for paper in papers] == ["Paper 0"]
+    assert response.chunks_read < len(body) // response.chunk_size
+
+    again = cool_paper.search_papers_by_keyword("some   title", limit=1, cache=cache)
+    assert again == papers
+    assert session.requests == 1
@@ -0,0 +1,71 @@
+import json
+import os
+
+import pytest
+
+from storage.catalog import LibraryCatalog
+from storage.search_index import LibrarySearchIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = LibrarySearchIndex(str(tmp_path / "search.db"))
+    index.index_paper("lib", "attention", title="Attention is all you need",
+                      summary="A sequence transduction model based on attention.")
+    index.index_paper("lib", "resnet", title="Deep residual learning for image recognition",
+                      summary="Residual networks ease the training of deep networks.")
+    index.index_paper("lib", "survey", title="A survey of vision models",
+                      text="We compare convolutional and attention based image models.")
+    return index
+
+
+def test_ranks_title_matches_first(index):
+    results = index.search("lib", "attention")
+    assert [folder for folder, _, _ in results] == ["attention", "survey"]
+    assert results[0][1] == "Attention is all you need"
+    assert results[0][2] > results[1][2] > 0
+    assert index.search("lib", "the of and") == []
+
+
+def test_limits_and_filters_candidates(index):
+    assert [f for f, _, _ in index.search("lib", "image attention", limit=1)] == ["survey"]
+    results = index.search("lib", "attention", folders={"resnet", "survey"})
+    assert [folder for folder, _, _ in results] == ["survey"]
+
+
+def test_reindexing_and_removal(index):
+    index.index_paper("lib", "resnet", title="Residual attention networks")
+    index.index_paper("other", "attention", title="Unrelated title")
+
+    assert "resnet" in [f for f, _, _ in index.search("lib", "attention")]
+    # 重新索引后旧的词不再命中，其他文献库不受影响
+    assert index.search("lib", "recognition") == []
+    assert [f for f, _, _ in index.search("other", "attention")] == []
+
+    index.remove_paper("lib", "attention")
+    assert index.indexed_folders("lib") == {"resnet", "survey"}
+    index.remove_library("lib")
+    assert index.indexed_folders("lib") == set()
+    assert index.indexed_folders("other") == {"attention"}
+
+
+def test_ask_top_n_questions_only_the_best_matches(server_app, make_library, tmp_path, monkeypatch):
+    library_path = make_library("lib", ["attention", "resnet", "survey"])
+    summaries = {
+        "attention": "Transformers replace recurrence with self-attention.",
+        "resnet": "Residual connections make very deep networks trainable.",
+        "survey": "An overview of self-attention in vision transformers.",
+    }
+    for folder_name, summary in summaries.items():
+        with open(os.path.join(library_path, folder_name, "info.json"), "w", encoding="utf-8") as f:
+            json.dump({"title": folder_name, "entry_name": folder_name, "summary": summary}, f)
+    monkeypatch.setattr(server_app, "catalog", LibraryCatalog(str(tmp_path / "catalog.db"), server_app.LIBRARY_ROOT))
+    monkeypatch.setattr(server_app, "search_index", LibrarySearchIndex(str(tmp_path / "search.db")))
+
+    response = server_app.app.test_client().post("/api/ask", json={
+        "question": "How do transformers use self-attention?", "library": "lib", "top_n": 2,
+    })
+
+    assert response.status_code == 200
+    assert sorted(r["paper"] for r in response.get_json()["responses"]) == ["attention", "survey"]
+    assert sorted(folder for _, folder in server_app.reader.calls) == ["attention", "survey"]
@@ -0,0 +1,79 @@
+import json
+
+from retrieval.main import get_arxiv_id
+from storage.title_index import ArxivTitleIndex, normalize_title
+
+
+def write_snapshot(path, records):
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    return str(path)
+
+
+RECORDS = [
+    {"id": "1706.03762", "title": "Attention Is All\n  You Need", "update_date": "2023-08-02"},
+    {"id": "1810.04805", "title": "BERT: Pre-training of Deep Bidirectional Transformers for "
+                                  "Language Understanding", "update_date": "2019-05-24"},
+    {"id": "hep-th/9901001", "title": "Strings on $AdS_5$ and the Caf\\'e Conjecture",
+     "update_date": "2009-10-07"},
+    {"id": "2001.00001", "title": "", "update_date": "2020-01-01"},
+]
+
+
+def test_normalize_title_folds_case_accents_and_markup():
+    assert normalize_title("Café: A $\\alpha$-Study!") == "cafe a alpha study"
+    assert normalize_title("Caf\\'e") == "cafe"
+
+
+def test_exact_lookup_ignores_styling(tmp_path):
+    index = ArxivTitleIndex(str(tmp_path / "titles.db"))
+    assert index.load_snapshot(write_snapshot(tmp_path / "snapshot.jsonl", RECORDS)) == 3
+
+    assert index.lookup("attention is all you need")["arxiv_id"] == "1706.03762"
+    match = index.lookup("BERT: Pretraining of deep bidirectional transformers for language understanding")
+    assert match == {
+        "arxiv_id": "1810.04805",
+        "title": RECORDS[1]["title"],
+        "score": 1.0,
+    }
+    assert index.lookup("Strings on AdS5 and the Café Conjecture")["arxiv_id"] == "hep-th/9901001"
+    assert index.lookup("!!!") is None
+    assert index.stats() == {"papers": 3, "max_updated": "2023-08-02"}
+
+
+def test_fuzzy_lookup_tolerates_one_typo(tmp_path):
+    snapshot = write_snapshot(tmp_path / "snapshot.jsonl", RECORDS)
+    index = ArxivTitleIndex(str(tmp_path / "titles.db"))
+    index.load_snapshot(snapshot)
+
+    match = index.lookup("BERT: Pre-training of Deep Bidirectionl Transformers for Language Understanding")
+    assert match["arxiv_id"] == "1810.04805"
+    assert 0.9 <= match["score"] < 1.0
+    assert index.lookup("A completely different paper about graphs") is None
+
+    strict = ArxivTitleIndex(str(tmp_path / "titles.db"), fuzzy=False)
+    assert strict.lookup("BERT: Pre-training of Deep Bidirectionl Transformers for Language Understanding") is None
+
+
+def test_incremental_update_skips_older_records(tmp_path):
+    index = ArxivTitleIndex(str(tmp_path / "titles.db"))
+    index.load_snapshot(write_snapshot(tmp_path / "snapshot.jsonl", RECORDS))
+
+    delta = write_snapshot(tmp_path / "delta.jsonl", [
+        {"id": "1706.03762", "title": "Attention Is All You Need (v7)", "update_date": "2024-01-01"},
+        {"id": "1512.03385", "title": "Deep Residual Learning for Image Recognition",
+         "update_date": "2015-12-10"},
+    ])
+    assert index.load_snapshot(delta, incremental=True) == 1
+
+    assert index.lookup("Attention Is All You Need (v7)")["arxiv_id"] == "1706.03762"
+    assert index.lookup("Deep Residual Learning for Image Recognition") is None
+    assert index.stats() == {"papers": 3, "max_updated": "2024-01-01"}
+
+
+def test_get_arxiv_id_keeps_old_style_archive():
+    assert get_arxiv_id("https://arxiv.org/abs/hep-th/9901001v2") == "hep-th/9901001"
+    assert get_arxiv_id("https://arxiv.org/pdf/1706.03762v7.pdf") == "1706.03762"
+    assert get_arxiv_id("https://arxiv.org/abs/1706.03762/") == "1706.03762"
+    assert get_arxiv_id("") is None
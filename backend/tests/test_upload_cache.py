@@ -0,0 +1,95 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from google.genai import types
+
+from readers.upload_cache import UploadCache
+
+
+class FakeUploader:
+    """记录上传次数，返回带过期时间的文件引用"""
+
+    def __init__(self, ttl=timedelta(hours=48), delay=0):
+        self.ttl = ttl
+        self.delay = delay
+        self.uploads = []
+        self._lock = threading.Lock()
+
+    def __call__(self, pdf_path):
+        time.sleep(self.delay)
+        with self._lock:
+            self.uploads.append(pdf_path)
+            index = len(self.uploads)
+        return types.File(
+            name=f"files/{index}",
+            uri=f"https://example.invalid/files/{index}",
+            mime_type="application/pdf",
+            expiration_time=datetime.now(timezone.utc) + self.ttl,
+        )
+
+
+@pytest.fixture
+def pdfs(tmp_path):
+    paths = {}
+    for name, content in (("a", b"%PDF-1.4 same"), ("copy", b"%PDF-1.4 same"), ("b", b"%PDF-1.4 other")):
+        path = tmp_path / f"{name}.pdf"
+        path.write_bytes(content)
+        paths[name] = str(path)
+    return paths
+
+
+def test_same_content_is_uploaded_once(tmp_path, pdfs):
+    cache = UploadCache(str(tmp_path / "cache" / "uploads.json"))
+    upload = FakeUploader()
+
+    first = cache.get_or_upload(pdfs["a"], upload)
+    # 内容相同的另一个文件直接复用引用
+    second = cache.get_or_upload(pdfs["copy"], upload)
+    other = cache.get_or_upload(pdfs["b"], upload)
+
+    assert upload.uploads == [pdfs["a"], pdfs["b"]]
+    assert (second.name, second.uri) == (first.name, first.uri)
+    assert other.name != first.name
+
+
+def test_references_survive_a_restart(tmp_path, pdfs):
+    cache_file = str(tmp_path / "uploads.json")
+    upload = FakeUploader()
+    first = UploadCache(cache_file).get_or_upload(pdfs["a"], upload)
+
+    reused = UploadCache(cache_file).get_or_upload(pdfs["a"], upload)
+
+    assert len(upload.uploads) == 1
+    assert reused.uri == first.uri
+
+
+def test_concurrent_requests_share_one_upload(tmp_path, pdfs):
+    cache = UploadCache(str(tmp_path / "uploads.json"))
+    upload = FakeUploader(delay=0.1)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_upload(pdfs["a"], upload)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(upload.uploads) == 1
+    assert {ref.uri for ref in results} == {results[0].uri}
+
+
+def test_expiring_and_invalidated_references_are_uploaded_again(tmp_path, pdfs):
+    cache = UploadCache(str(tmp_path / "uploads.json"))
+    # 只剩几分钟有效期的引用不再复用
+    cache.get_or_upload(pdfs["a"], FakeUploader(ttl=timedelta(minutes=5)))
+    upload = FakeUploader()
+    cache.get_or_upload(pdfs["a"], upload)
+    assert len(upload.uploads) == 1
+
+    cache.invalidate(pdfs["a"])
+    cache.get_or_upload(pdfs["a"], upload)
+    assert len(upload.uploads) == 2
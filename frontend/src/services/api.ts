@@ -35,6 +35,39 @@ interface SessionDetail extends HistorySession {
   // 可能还有其他字段
 }
 
+interface AskStreamEvent {
+  event: 'session' | 'chunk' | 'paper' | 'done';
+  data: any;
+}
+
+// 解析 text/event-stream 响应，每收到一个完整事件就回调一次
+async function readEventStream(response: Response, onEvent: (event: AskStreamEvent) => void) {
+  if (!response.ok || !response.body) {
+    throw new Error(`Request failed: ${response.status}`)
+  }
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    let boundary = buffer.indexOf('\n\n')
+    while (boundary !== -1) {
+      const block = buffer.slice(0, boundary)
+      buffer = buffer.slice(boundary + 2)
+      let event = 'message'
+      let data = ''
+      for (const line of block.split('\n')) {
+        if (line.startsWith('event: ')) event = line.slice(7)
+        else if (line.startsWith('data: ')) data += line.slice(6)
+      }
+      if (data) onEvent({ event: event as AskStreamEvent['event'], data: JSON.parse(data) })
+      boundary = buffer.indexOf('\n\n')
+    }
+  }
+}
+
 const apiClient = axios.create({
   baseURL: API_BASE_URL,
   headers: {
@@ -82,6 +115,14 @@ export default {
       question: question
     })
   },
+  // 流式问答：每篇论文完成时立即回调，无需等待所有论文
+  askQuestionStream(libraryName: string, papers: string[], question: string, onEvent: (event: AskStreamEvent) => void): Promise<void> {
+    return fetch(`${API_BASE_URL}/ask/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ library: libraryName, papers: papers, question: question })
+    }).then(response => readEventStream(response, onEvent))
+  },
   
   // 历史记录相关
   getHistory(): Promise<AxiosResponse<HistorySession[]>> {